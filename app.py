@@ -1,14 +1,38 @@
-from flask import Flask, render_template, request, flash
+from flask import Flask, Response, render_template, request, flash, jsonify, stream_with_context
 import hmac
 import binascii
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SubmitField, TextAreaField
 from wtforms.validators import DataRequired, Optional, Length, ValidationError
 from blake2_implementation import BLAKE2b, BLAKE2s, blake2b, blake2s
+import blake2_argon2
+import blake2_bulk
+import blake2_tune
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'  # Change this in production
 
+# Argon2id defaults for /api/argon2 (use `python blake2_argon2.py calibrate` to pick them)
+app.config['ARGON2_TIME_COST'] = blake2_argon2.DEFAULT_TIME_COST
+app.config['ARGON2_MEMORY_COST'] = blake2_argon2.DEFAULT_MEMORY_COST
+app.config['ARGON2_PARALLELISM'] = blake2_argon2.DEFAULT_PARALLELISM
+# Upper bounds on client-requested costs, so a request cannot tie up a worker;
+# with the pure-Python BLAKE2b the caps together take a few seconds per hash
+app.config['ARGON2_MAX_TIME_COST'] = 4
+app.config['ARGON2_MAX_MEMORY_COST'] = 2048
+app.config['ARGON2_MAX_PARALLELISM'] = 4
+# Upper bounds on the tag and salt lengths of PHC strings sent to /api/argon2/verify
+app.config['ARGON2_MAX_TAG_LENGTH'] = 64
+app.config['ARGON2_MAX_SALT_LENGTH'] = 64
+
+# Upload read size and hashing threads of /api/verify/bulk, from the host tuning
+# profile (`python blake2_tune.py calibrate`); a profile from another Python
+# version or CPU count is recalibrated here
+app.config['BLAKE2_BUFFER_SIZE'] = blake2_tune.tuned('buffer_size', recalibrate=True)
+app.config['BLAKE2_THREAD_WORKERS'] = blake2_tune.tuned('thread_workers')
+# Upper bound on file parts per /api/verify/bulk request
+app.config['BULK_VERIFY_MAX_FILES'] = 10000
+
 def validate_blake2_key(form, field):
     if field.data:
         key_bytes = field.data.encode('utf-8')
@@ -195,5 +219,92 @@ def index():
                          original_text=original_text, hash_info=hash_info, 
                          verification_result=verification_result)
 
+def _argon2_cost(payload, name):
+    """Read an optional Argon2 cost from a JSON payload, bounded by the app config"""
+    value = payload.get(name, app.config[f'ARGON2_{name.upper()}'])
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    if value > app.config[f'ARGON2_MAX_{name.upper()}']:
+        raise ValueError(f"{name} must be at most {app.config[f'ARGON2_MAX_{name.upper()}']}")
+    return value
+
+def _argon2_length(params, name):
+    """Reject a parsed PHC tag or salt longer than the app config allows"""
+    limit = app.config[f'ARGON2_MAX_{name.upper()}_LENGTH']
+    if len(params[name]) > limit:
+        raise ValueError(f"{name} must be at most {limit} bytes")
+
+@app.route('/api/argon2/hash', methods=['POST'])
+def api_argon2_hash():
+    """Hash a password with Argon2id: {"password": ..., optional "time_cost", "memory_cost", "parallelism"}"""
+    payload = request.get_json(silent=True) or {}
+    password = payload.get('password')
+    if not isinstance(password, str) or not password:
+        return jsonify({'error': 'password is required'}), 400
+    try:
+        time_cost = _argon2_cost(payload, 'time_cost')
+        memory_cost = _argon2_cost(payload, 'memory_cost')
+        parallelism = _argon2_cost(payload, 'parallelism')
+        encoded = blake2_argon2.hash_password(password, time_cost, memory_cost, parallelism)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'hash': encoded,
+        'algorithm': 'ARGON2ID',
+        'time_cost': time_cost,
+        'memory_cost': memory_cost,
+        'parallelism': parallelism
+    })
+
+@app.route('/api/argon2/verify', methods=['POST'])
+def api_argon2_verify():
+    """Verify a password against a PHC string: {"hash": ..., "password": ...}"""
+    payload = request.get_json(silent=True) or {}
+    encoded = payload.get('hash')
+    password = payload.get('password')
+    if not isinstance(encoded, str) or not isinstance(password, str):
+        return jsonify({'error': 'hash and password are required'}), 400
+    try:
+        params = blake2_argon2.parse_encoded(encoded)
+        for name in ('time_cost', 'memory_cost', 'parallelism'):
+            _argon2_cost(params, name)
+        for name in ('tag', 'salt'):
+            _argon2_length(params, name)
+        is_valid = blake2_argon2.verify_password(encoded, password)
+    except (ValueError, KeyError) as e:
+        return jsonify({'error': f'Invalid Argon2 hash: {e}'}), 400
+    return jsonify({'is_valid': is_valid})
+
+@app.route('/api/verify/bulk', methods=['POST'])
+def api_verify_bulk():
+    """
+    Verify many uploaded files against a manifest in one streaming pass
+    
+    multipart/form-data with a "manifest" part (sent first unless digest_size
+    is given) and any number of file parts; query parameters: algorithm
+    (blake2b or blake2s), digest_size, format (ndjson or sse; SSE is also
+    chosen by Accept: text/event-stream).
+    Per-file results are streamed as each file finishes, then a summary.
+    """
+    if request.mimetype != 'multipart/form-data' or 'boundary' not in request.mimetype_params:
+        return jsonify({'error': 'multipart/form-data upload required'}), 400
+    algorithm = request.args.get('algorithm', 'blake2b')
+    if algorithm not in ('blake2b', 'blake2s'):
+        return jsonify({'error': 'algorithm must be blake2b or blake2s'}), 400
+    digest_size = request.args.get('digest_size', type=int)
+    if digest_size is not None and not 1 <= digest_size <= (64 if algorithm == 'blake2b' else 32):
+        return jsonify({'error': f'Invalid digest size for {algorithm}'}), 400
+    
+    use_sse = request.args.get('format') == 'sse' or (
+        request.args.get('format') is None and request.accept_mimetypes.best == 'text/event-stream')
+    formatter = blake2_bulk.format_sse if use_sse else blake2_bulk.format_ndjson
+    results = blake2_bulk.verify_upload(
+        request.stream, request.mimetype_params['boundary'], algorithm, digest_size,
+        workers=app.config['BLAKE2_THREAD_WORKERS'], chunk_size=app.config['BLAKE2_BUFFER_SIZE'],
+        max_files=app.config['BULK_VERIFY_MAX_FILES'])
+    return Response(stream_with_context(formatter(record) for record in results),
+                    mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
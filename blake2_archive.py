@@ -0,0 +1,295 @@
+"""
+Hash Archive Members Without Extraction
+Streams every regular file inside a .tar (optionally .gz, .bz2, .xz or .zst
+compressed) or .zip archive through BLAKE2b/BLAKE2s and writes a per-member
+manifest in the format of blake2_manifest.py. Tar decompression runs on a
+background thread that overlaps with hashing; zip members are hashed in
+parallel worker processes through random access.
+Usage: python blake2_archive.py [options] ARCHIVE...
+"""
+
+import argparse
+import contextlib
+import os
+import queue
+import sys
+import tarfile
+import threading
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from blake2_implementation import BLAKE2b, BLAKE2s
+from blake2_manifest import format_line
+from blake2_stream import hash_stream, DEFAULT_CHUNK_SIZE, DEFAULT_READAHEAD_BUFFERS
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": 'tar.gz',
+    b"BZh": 'tar.bz2',
+    b"\xfd7zXZ\x00": 'tar.xz',
+    ZSTD_MAGIC: 'tar.zst',
+}
+
+# Zip members are grouped into tasks of roughly this many bytes per worker call
+ZIP_TASK_BYTES = 8 << 20
+
+MemberDigest = namedtuple('MemberDigest', ['name', 'size', 'digest', 'error'])
+MemberDigest.__doc__ = """Result for one archive member: hex digest, or None and an error message"""
+
+
+def new_hasher(algorithm='blake2b', digest_size=None, key=b"", salt=b"", person=b""):
+    """Fresh BLAKE2b/BLAKE2s instance with the usual default digest sizes"""
+    if algorithm not in ('blake2b', 'blake2s'):
+        raise ValueError("Algorithm must be 'blake2b' or 'blake2s'")
+    hasher_class = BLAKE2b if algorithm == 'blake2b' else BLAKE2s
+    return hasher_class(digest_size or (64 if algorithm == 'blake2b' else 32), key, salt, person)
+
+
+def archive_format(path):
+    """
+    Detect the archive format from its contents
+
+    Returns:
+        'zip', 'tar', 'tar.gz', 'tar.bz2', 'tar.xz' or 'tar.zst'
+
+    Raises:
+        ValueError: if the file is not a supported archive
+    """
+    if zipfile.is_zipfile(path):
+        return 'zip'
+    with open(path, 'rb') as f:
+        head = f.read(512)
+    for magic, name in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return name
+    if head[257:262] == b"ustar" or tarfile.is_tarfile(path):
+        return 'tar'
+    raise ValueError(f"{path}: not a tar or zip archive")
+
+
+@contextlib.contextmanager
+def open_tar_stream(path):
+    """Open a (compressed) tar archive for sequential, streaming reads"""
+    with contextlib.ExitStack() as stack:
+        raw = stack.enter_context(open(path, 'rb'))
+        if raw.read(4) == ZSTD_MAGIC:
+            raw.seek(0)
+            if zstd is not None:
+                source = stack.enter_context(zstd.ZstdFile(raw))
+            elif zstandard is not None:
+                source = stack.enter_context(zstandard.ZstdDecompressor().stream_reader(raw))
+            else:
+                raise ValueError(f"{path}: zstd support needs Python 3.14 or the 'zstandard' package")
+            yield stack.enter_context(tarfile.open(fileobj=source, mode='r|'))
+        else:
+            raw.seek(0)
+            yield stack.enter_context(tarfile.open(fileobj=raw, mode='r|*'))
+
+
+def hash_tar_members(path, template, buffer_size=DEFAULT_CHUNK_SIZE, buffers=DEFAULT_READAHEAD_BUFFERS):
+    """
+    Hash the regular files of a tar archive in one sequential pass
+
+    A background thread decompresses and reads members into a ring of
+    reusable buffers while this thread hashes them, so decompression (which
+    releases the GIL in zlib, bz2 and lzma) overlaps with hashing.
+
+    Args:
+        path: Archive path
+        template: Initialized hasher; each member is hashed from a copy
+        buffer_size: Bytes per buffer
+        buffers: Buffers in the ring
+
+    Yields:
+        MemberDigest in archive order
+    """
+    ring = [bytearray(buffer_size) for _ in range(max(2, buffers))]
+    views = [memoryview(buffer) for buffer in ring]
+    free = queue.Queue()
+    events = queue.Queue()
+    for index in range(len(ring)):
+        free.put(index)
+
+    def producer():
+        try:
+            with open_tar_stream(path) as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    events.put(('member', member.name, member.size))
+                    source = archive.extractfile(member)
+                    while True:
+                        index = free.get()
+                        if index is None:
+                            return
+                        count = source.readinto(ring[index])
+                        if not count:
+                            free.put(index)
+                            break
+                        events.put(('data', index, count))
+                    events.put(('end', None, None))
+            events.put(('done', None, None))
+        except BaseException as e:
+            events.put(('error', e, None))
+
+    thread = threading.Thread(target=producer, name='blake2-archive-reader', daemon=True)
+    thread.start()
+    try:
+        hasher = name = size = None
+        while True:
+            kind, first, second = events.get()
+            if kind == 'data':
+                hasher.update(views[first][:second])
+                free.put(first)
+            elif kind == 'member':
+                hasher, name, size = template.copy(), first, second
+            elif kind == 'end':
+                yield MemberDigest(name, size, hasher.hexdigest(), None)
+            elif kind == 'done':
+                return
+            else:
+                raise first
+    finally:
+        # Stop the reader if the caller stopped early, then wait for it
+        free.put(None)
+        thread.join()
+
+
+def _hash_zip_task(path, indexes, params, buffer_size):
+    """Worker: hash zip members (by index in the central directory) with random access"""
+    template = new_hasher(*params)
+    results = []
+    with zipfile.ZipFile(path) as archive:
+        infos = archive.infolist()
+        for index in indexes:
+            info = infos[index]
+            hasher = template.copy()
+            try:
+                with archive.open(info) as source:
+                    hash_stream(source, hasher, max(4096, min(buffer_size, info.file_size + 1)))
+                results.append(MemberDigest(info.filename, info.file_size, hasher.hexdigest(), None))
+            except (RuntimeError, ValueError, OSError, zipfile.BadZipFile) as e:
+                # Encrypted members, unsupported methods and CRC errors stay per member
+                results.append(MemberDigest(info.filename, info.file_size, None, str(e)))
+    return results
+
+
+def _zip_tasks(infos, task_bytes):
+    """Group member indexes into consecutive tasks of about task_bytes"""
+    task, size = [], 0
+    for index, info in enumerate(infos):
+        if info.is_dir():
+            continue
+        task.append(index)
+        size += info.file_size
+        if size >= task_bytes:
+            yield task
+            task, size = [], 0
+    if task:
+        yield task
+
+
+def hash_zip_members(path, params, workers=None, buffer_size=DEFAULT_CHUNK_SIZE, task_bytes=ZIP_TASK_BYTES):
+    """
+    Hash the files of a zip archive, independent members in parallel
+
+    Args:
+        path: Archive path
+        params: (algorithm, digest_size, key, salt, person)
+        workers: Worker processes (default: CPU count; 1 hashes in-process)
+        task_bytes: Approximate uncompressed bytes per worker task
+
+    Yields:
+        MemberDigest in central-directory order
+    """
+    with zipfile.ZipFile(path) as archive:
+        infos = archive.infolist()
+    tasks = list(_zip_tasks(infos, task_bytes))
+    workers = min(workers or os.cpu_count() or 1, max(1, len(tasks)))
+
+    if workers == 1:
+        for task in tasks:
+            yield from _hash_zip_task(path, task, params, buffer_size)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_hash_zip_task, path, task, params, buffer_size) for task in tasks]
+        for future in futures:
+            yield from future.result()
+
+
+def hash_archive(path, algorithm='blake2b', digest_size=None, key=b"", salt=b"", person=b"",
+                 workers=None, buffer_size=DEFAULT_CHUNK_SIZE, buffers=DEFAULT_READAHEAD_BUFFERS):
+    """
+    Hash every regular file inside an archive without extracting it
+
+    Args:
+        path: .tar, .tar.gz, .tar.bz2, .tar.xz, .tar.zst or .zip file
+        algorithm: 'blake2b' or 'blake2s'
+        digest_size, key, salt, person: BLAKE2 parameters
+        workers: Worker processes for zip archives
+        buffer_size: Bytes per read
+        buffers: Read-ahead buffers for tar archives
+
+    Yields:
+        MemberDigest per member, in archive order
+    """
+    params = (algorithm, digest_size, key, salt, person)
+    template = new_hasher(*params)  # validates the parameters before any work starts
+    if archive_format(path) == 'zip':
+        yield from hash_zip_members(path, params, workers, buffer_size)
+    else:
+        yield from hash_tar_members(path, template, buffer_size, buffers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hash the members of tar/zip archives without extraction')
+    parser.add_argument('archives', nargs='+', help='Archives to hash')
+    parser.add_argument('-a', '--algorithm', choices=['blake2b', 'blake2s'], default='blake2b')
+    parser.add_argument('-s', '--size', type=int, help='Digest size in bytes')
+    parser.add_argument('-k', '--key', default='', help='Key for keyed hashing')
+    parser.add_argument('--salt', default='', help='Salt value')
+    parser.add_argument('--person', default='', help='Personalization string')
+    parser.add_argument('-w', '--workers', type=int, help='Worker processes for zip archives')
+    parser.add_argument('-o', '--output', help='Write the manifest here instead of stdout')
+    parser.add_argument('--prefix', action='store_true',
+                        help='Prefix member names with the archive path (useful with several archives)')
+    args = parser.parse_args()
+
+    status = 0
+    out = open(args.output, 'w', encoding='utf-8', errors='surrogateescape', newline='\n') \
+        if args.output else sys.stdout
+    try:
+        for archive in args.archives:
+            results = hash_archive(archive, args.algorithm, args.size, args.key.encode('utf-8'),
+                                   args.salt.encode('utf-8'), args.person.encode('utf-8'), args.workers)
+            for member in results:
+                name = f"{archive}/{member.name}" if args.prefix else member.name
+                if member.digest is None:
+                    print(f"Error: {archive}: {member.name}: {member.error}", file=sys.stderr)
+                    status = 1
+                else:
+                    out.write(format_line(bytes.fromhex(member.digest), member.size, name))
+    except (OSError, ValueError, tarfile.TarError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        if args.output:
+            out.close()
+    return status
+
+
+if __name__ == "__main__":
+    exit(main())
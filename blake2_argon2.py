@@ -0,0 +1,573 @@
+"""
+Argon2 Password Hashing Built on the Custom BLAKE2b
+Implements Argon2d, Argon2i and Argon2id (version 0x13) as specified in
+RFC 9106: Argon2 Memory-Hard Function for Password Hashing and Proof-of-Work Applications
+Usage: python blake2_argon2.py {hash,verify,calibrate} [options]
+"""
+
+import argparse
+import base64
+import getpass
+import hmac
+import os
+import secrets
+import struct
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+from blake2_implementation import BLAKE2b
+
+
+ARGON2_VERSION = 0x13
+ARGON2D, ARGON2I, ARGON2ID = 0, 1, 2
+TYPE_NAMES = {ARGON2D: 'argon2d', ARGON2I: 'argon2i', ARGON2ID: 'argon2id'}
+
+BLOCK_WORDS = 128          # 1 KiB block = 128 64-bit words
+SYNC_POINTS = 4            # slices per pass
+
+MASK32 = 0xFFFFFFFF
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# Defaults are sized for this pure-Python BLAKE2b (a fraction of a second per
+# hash); the RFC 9106 section 4 options (e.g. t=3, m=64 MiB, p=4) take minutes
+# here, so use `calibrate` to pick the largest costs a host can afford
+DEFAULT_TIME_COST = 2
+DEFAULT_MEMORY_COST = 512       # KiB
+DEFAULT_PARALLELISM = 1
+# Memory ceiling searched by calibrate()
+CALIBRATE_MAX_MEMORY_COST = 65536   # KiB
+DEFAULT_TAG_LENGTH = 32
+DEFAULT_SALT_LENGTH = 16
+
+
+def _le32(value):
+    return struct.pack('<I', value)
+
+
+def blake2b_long(data, length):
+    """
+    Variable-length hash function H' of RFC 9106 section 3.3
+
+    Args:
+        data: Input bytes
+        length: Output length in bytes (at least 1)
+
+    Returns:
+        Digest of the requested length
+    """
+    prefixed = _le32(length) + data
+    if length <= 64:
+        hasher = BLAKE2b(length)
+        hasher.update(prefixed)
+        return hasher.digest()
+
+    # r = ceil(length / 32) - 2 full 64-byte hashes contribute 32 bytes each
+    rounds = -(-length // 32) - 2
+    hasher = BLAKE2b(64)
+    hasher.update(prefixed)
+    v = hasher.digest()
+    output = [v[:32]]
+    for _ in range(rounds - 1):
+        hasher = BLAKE2b(64)
+        hasher.update(v)
+        v = hasher.digest()
+        output.append(v[:32])
+    hasher = BLAKE2b(length - 32 * rounds)
+    hasher.update(v)
+    output.append(hasher.digest())
+    return b"".join(output)
+
+
+def _build_permutation_schedule():
+    """
+    Precompute the (a, b, c, d) word indices of every GB call in one block
+    compression: P on the 8 rows, then P on the 8 columns of 16-byte registers
+    """
+    def round_quads(w):
+        return [
+            (w[0], w[4], w[8], w[12]), (w[1], w[5], w[9], w[13]),
+            (w[2], w[6], w[10], w[14]), (w[3], w[7], w[11], w[15]),
+            (w[0], w[5], w[10], w[15]), (w[1], w[6], w[11], w[12]),
+            (w[2], w[7], w[8], w[13]), (w[3], w[4], w[9], w[14]),
+        ]
+
+    schedule = []
+    for row in range(8):
+        schedule.extend(round_quads([16 * row + k for k in range(16)]))
+    for column in range(8):
+        words = []
+        for row in range(8):
+            words += [16 * row + 2 * column, 16 * row + 2 * column + 1]
+        schedule.extend(round_quads(words))
+    return tuple(schedule)
+
+
+PERMUTATION_SCHEDULE = _build_permutation_schedule()
+
+
+def compress_blocks(x, y):
+    """
+    Argon2 compression function G(X, Y) on two 128-word blocks
+
+    Returns:
+        (Z XOR R, R) where R = X XOR Y and Z is R after the BlaMka rounds;
+        callers that need the version 0x13 XOR with the old block apply it
+        themselves.
+    """
+    r = [a ^ b for a, b in zip(x, y)]
+    v = list(r)
+    for a, b, c, d in PERMUTATION_SCHEDULE:
+        va = v[a]
+        vb = v[b]
+        vc = v[c]
+        vd = v[d]
+        va = (va + vb + 2 * (va & MASK32) * (vb & MASK32)) & MASK64
+        vd ^= va
+        vd = ((vd >> 32) | (vd << 32)) & MASK64
+        vc = (vc + vd + 2 * (vc & MASK32) * (vd & MASK32)) & MASK64
+        vb ^= vc
+        vb = ((vb >> 24) | (vb << 40)) & MASK64
+        va = (va + vb + 2 * (va & MASK32) * (vb & MASK32)) & MASK64
+        vd ^= va
+        vd = ((vd >> 16) | (vd << 48)) & MASK64
+        vc = (vc + vd + 2 * (vc & MASK32) * (vd & MASK32)) & MASK64
+        vb ^= vc
+        vb = ((vb >> 63) | (vb << 1)) & MASK64
+        v[a] = va
+        v[b] = vb
+        v[c] = vc
+        v[d] = vd
+    return [z ^ w for z, w in zip(v, r)], r
+
+
+ZERO_BLOCK = [0] * BLOCK_WORDS
+
+
+class _Instance:
+    """Geometry and parameters of one Argon2 computation, shared by all segment workers"""
+
+    def __init__(self, lanes, memory_blocks, passes, variant):
+        self.lanes = lanes
+        self.memory_blocks = memory_blocks
+        self.passes = passes
+        self.variant = variant
+        self.lane_length = memory_blocks // lanes
+        self.segment_length = self.lane_length // SYNC_POINTS
+
+
+def _index_alpha(inst, pass_number, slice_number, index, j1, same_lane):
+    """Map the pseudo-random J1 to a reference block index within the lane (RFC 9106 3.4.2)"""
+    if pass_number == 0:
+        if slice_number == 0:
+            area = index - 1
+        elif same_lane:
+            area = slice_number * inst.segment_length + index - 1
+        else:
+            area = slice_number * inst.segment_length + (-1 if index == 0 else 0)
+    else:
+        if same_lane:
+            area = inst.lane_length - inst.segment_length + index - 1
+        else:
+            area = inst.lane_length - inst.segment_length + (-1 if index == 0 else 0)
+
+    relative = (j1 * j1) >> 32
+    relative = area - 1 - ((area * relative) >> 32)
+
+    start = 0
+    if pass_number != 0 and slice_number != SYNC_POINTS - 1:
+        start = (slice_number + 1) * inst.segment_length
+    return (start + relative) % inst.lane_length
+
+
+def _fill_segment(memory, inst, pass_number, lane, slice_number):
+    """
+    Compute one segment (lane, slice) of one pass in place
+
+    Args:
+        memory: Flat memoryview of 'Q' words holding all blocks
+    """
+    data_independent = (inst.variant == ARGON2I or
+                        (inst.variant == ARGON2ID and pass_number == 0 and slice_number < SYNC_POINTS // 2))
+
+    address_block = None
+    input_block = None
+    if data_independent:
+        input_block = [0] * BLOCK_WORDS
+        input_block[0:6] = [pass_number, lane, slice_number, inst.memory_blocks, inst.passes, inst.variant]
+
+    def next_addresses():
+        input_block[6] += 1
+        first, _ = compress_blocks(ZERO_BLOCK, input_block)
+        second, _ = compress_blocks(ZERO_BLOCK, first)
+        return second
+
+    start_index = 0
+    if pass_number == 0 and slice_number == 0:
+        start_index = 2
+        if data_independent:
+            address_block = next_addresses()
+
+    lane_length = inst.lane_length
+    current = lane * lane_length + slice_number * inst.segment_length + start_index
+    previous = current - 1 if current % lane_length else current + lane_length - 1
+    prev_block = memory[previous * BLOCK_WORDS:(previous + 1) * BLOCK_WORDS].tolist()
+
+    for index in range(start_index, inst.segment_length):
+        if current % lane_length == 1:
+            previous = current - 1
+
+        if data_independent:
+            if index % BLOCK_WORDS == 0:
+                address_block = next_addresses()
+            pseudo_random = address_block[index % BLOCK_WORDS]
+        else:
+            pseudo_random = prev_block[0]
+
+        ref_lane = (pseudo_random >> 32) % inst.lanes
+        if pass_number == 0 and slice_number == 0:
+            ref_lane = lane
+        ref_index = _index_alpha(inst, pass_number, slice_number, index,
+                                 pseudo_random & MASK32, ref_lane == lane)
+        ref_offset = (ref_lane * lane_length + ref_index) * BLOCK_WORDS
+        ref_block = memory[ref_offset:ref_offset + BLOCK_WORDS].tolist()
+
+        new_block, _ = compress_blocks(prev_block, ref_block)
+        offset = current * BLOCK_WORDS
+        if pass_number != 0:
+            old_block = memory[offset:offset + BLOCK_WORDS].tolist()
+            new_block = [a ^ b for a, b in zip(new_block, old_block)]
+        memory[offset:offset + BLOCK_WORDS] = array('Q', new_block)
+
+        prev_block = new_block
+        previous = current
+        current += 1
+
+
+def _fill_segment_shared(name, lanes, memory_blocks, passes, variant, pass_number, lane, slice_number):
+    """Process-pool worker: attach to the shared memory and fill one segment"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        memory = shm.buf.cast('Q')
+        try:
+            _fill_segment(memory, _Instance(lanes, memory_blocks, passes, variant),
+                          pass_number, lane, slice_number)
+        finally:
+            memory.release()
+    finally:
+        shm.close()
+
+
+def argon2_hash(password, salt, time_cost=DEFAULT_TIME_COST, memory_cost=DEFAULT_MEMORY_COST,
+                parallelism=DEFAULT_PARALLELISM, tag_length=DEFAULT_TAG_LENGTH, secret=b"",
+                associated_data=b"", variant=ARGON2ID, executor=None, workers=None):
+    """
+    Compute a raw Argon2 tag
+
+    Args:
+        password: Password bytes
+        salt: Salt bytes (at least 8)
+        time_cost: Number of passes t (at least 1)
+        memory_cost: Memory size m in KiB (at least 8 * parallelism)
+        parallelism: Number of lanes p
+        tag_length: Output length in bytes (at least 4)
+        secret: Optional secret value K
+        associated_data: Optional associated data X
+        variant: ARGON2D, ARGON2I or ARGON2ID
+        executor: None to fill lanes sequentially, 'thread' for a thread pool
+            (parallel on free-threaded Python) or 'process' for a process pool
+            over shared memory
+        workers: Pool size (default: parallelism)
+
+    Returns:
+        Tag as bytes
+    """
+    if variant not in TYPE_NAMES:
+        raise ValueError("Variant must be ARGON2D, ARGON2I or ARGON2ID")
+    if not 1 <= parallelism <= 0xFFFFFF:
+        raise ValueError("Parallelism must be between 1 and 2**24 - 1")
+    if len(salt) < 8:
+        raise ValueError("Salt must be at least 8 bytes")
+    if tag_length < 4:
+        raise ValueError("Tag length must be at least 4 bytes")
+    if time_cost < 1:
+        raise ValueError("Time cost must be at least 1")
+    if memory_cost < 8 * parallelism:
+        raise ValueError("Memory cost must be at least 8 * parallelism KiB")
+    if executor not in (None, 'thread', 'process'):
+        raise ValueError("Executor must be None, 'thread' or 'process'")
+
+    h0_hasher = BLAKE2b(64)
+    h0_hasher.update(b"".join([
+        _le32(parallelism), _le32(tag_length), _le32(memory_cost), _le32(time_cost),
+        _le32(ARGON2_VERSION), _le32(variant),
+        _le32(len(password)), password, _le32(len(salt)), salt,
+        _le32(len(secret)), secret, _le32(len(associated_data)), associated_data,
+    ]))
+    h0 = h0_hasher.digest()
+
+    memory_blocks = 4 * parallelism * (memory_cost // (4 * parallelism))
+    inst = _Instance(parallelism, memory_blocks, time_cost, variant)
+
+    shm = None
+    if executor == 'process':
+        shm = shared_memory.SharedMemory(create=True, size=memory_blocks * 1024)
+        memory = shm.buf.cast('Q')
+    else:
+        memory = memoryview(bytearray(memory_blocks * 1024)).cast('Q')
+
+    pool = None
+    try:
+        # First two blocks of every lane come straight from H0
+        for lane in range(parallelism):
+            for column in range(2):
+                block = blake2b_long(h0 + _le32(column) + _le32(lane), 1024)
+                offset = (lane * inst.lane_length + column) * BLOCK_WORDS
+                memory[offset:offset + BLOCK_WORDS] = array('Q', struct.unpack('<128Q', block))
+
+        if executor == 'thread':
+            pool = ThreadPoolExecutor(max_workers=workers or parallelism)
+        elif executor == 'process':
+            pool = ProcessPoolExecutor(max_workers=workers or parallelism)
+
+        for pass_number in range(time_cost):
+            for slice_number in range(SYNC_POINTS):
+                # Lanes within a slice are independent; slices are sync points
+                if pool is None:
+                    for lane in range(parallelism):
+                        _fill_segment(memory, inst, pass_number, lane, slice_number)
+                elif executor == 'thread':
+                    futures = [pool.submit(_fill_segment, memory, inst, pass_number, lane, slice_number)
+                               for lane in range(parallelism)]
+                    for future in futures:
+                        future.result()
+                else:
+                    futures = [pool.submit(_fill_segment_shared, shm.name, parallelism, memory_blocks,
+                                           time_cost, variant, pass_number, lane, slice_number)
+                               for lane in range(parallelism)]
+                    for future in futures:
+                        future.result()
+
+        final = [0] * BLOCK_WORDS
+        for lane in range(parallelism):
+            offset = (lane * inst.lane_length + inst.lane_length - 1) * BLOCK_WORDS
+            final = [a ^ b for a, b in zip(final, memory[offset:offset + BLOCK_WORDS].tolist())]
+        return blake2b_long(struct.pack('<128Q', *final), tag_length)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        memory.release()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def argon2id(password, salt, time_cost=DEFAULT_TIME_COST, memory_cost=DEFAULT_MEMORY_COST,
+             parallelism=DEFAULT_PARALLELISM, tag_length=DEFAULT_TAG_LENGTH, secret=b"",
+             associated_data=b"", executor=None, workers=None):
+    """Convenience function for a raw Argon2id tag (see argon2_hash for the arguments)"""
+    return argon2_hash(password, salt, time_cost, memory_cost, parallelism, tag_length,
+                       secret, associated_data, ARGON2ID, executor, workers)
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def hash_password(password, time_cost=DEFAULT_TIME_COST, memory_cost=DEFAULT_MEMORY_COST,
+                  parallelism=DEFAULT_PARALLELISM, tag_length=DEFAULT_TAG_LENGTH,
+                  salt_length=DEFAULT_SALT_LENGTH, executor=None):
+    """
+    Hash a password with Argon2id and a random salt
+
+    Args:
+        password: Password as str (UTF-8 encoded) or bytes
+
+    Returns:
+        PHC-format string, e.g. $argon2id$v=19$m=512,t=2,p=1$<salt>$<tag>
+    """
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    salt = secrets.token_bytes(salt_length)
+    tag = argon2id(password, salt, time_cost, memory_cost, parallelism, tag_length, executor=executor)
+    return (f"$argon2id$v={ARGON2_VERSION}$m={memory_cost},t={time_cost},p={parallelism}"
+            f"${_b64encode(salt)}${_b64encode(tag)}")
+
+
+def parse_encoded(encoded):
+    """
+    Parse a PHC-format Argon2 string
+
+    Returns:
+        Dict with variant, memory_cost, time_cost, parallelism, salt and tag
+    """
+    parts = encoded.split('$')
+    if len(parts) != 6 or parts[0] != '':
+        raise ValueError("Not a PHC-format Argon2 hash")
+    _, name, version, params, salt, tag = parts
+    variants = {v: k for k, v in TYPE_NAMES.items()}
+    if name not in variants:
+        raise ValueError(f"Unknown Argon2 variant '{name}'")
+    if version != f"v={ARGON2_VERSION}":
+        raise ValueError("Only Argon2 version 19 (0x13) is supported")
+    fields = dict(item.split('=', 1) for item in params.split(','))
+    return {
+        'variant': variants[name],
+        'memory_cost': int(fields['m']),
+        'time_cost': int(fields['t']),
+        'parallelism': int(fields['p']),
+        'salt': _b64decode(salt),
+        'tag': _b64decode(tag),
+    }
+
+
+def verify_password(encoded, password, executor=None):
+    """
+    Check a password against a PHC-format Argon2 string in constant time
+
+    Returns:
+        True if the password matches
+    """
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    params = parse_encoded(encoded)
+    tag = argon2_hash(password, params['salt'], params['time_cost'], params['memory_cost'],
+                      params['parallelism'], len(params['tag']), variant=params['variant'],
+                      executor=executor)
+    return hmac.compare_digest(tag, params['tag'])
+
+
+def calibrate(target_seconds=0.5, parallelism=DEFAULT_PARALLELISM, max_memory_cost=CALIBRATE_MAX_MEMORY_COST,
+              min_time_cost=1, executor=None, verbose=False):
+    """
+    Pick Argon2id costs that take about target_seconds on this host
+
+    Memory is preferred over passes: the memory cost grows up to
+    max_memory_cost, and only then are extra passes added.
+
+    Args:
+        target_seconds: Desired latency of one hash
+        parallelism: Number of lanes
+        max_memory_cost: Upper bound on memory in KiB
+        min_time_cost: Lower bound on passes
+        executor: Executor used for the measurements (see argon2_hash)
+        verbose: Print each measurement
+
+    Returns:
+        Dict with time_cost, memory_cost, parallelism and measured seconds
+    """
+    def measure(time_cost, memory_cost):
+        start = time.perf_counter()
+        argon2id(b"calibration", b"calibration-salt", time_cost, memory_cost, parallelism, executor=executor)
+        elapsed = time.perf_counter() - start
+        if verbose:
+            print(f"  t={time_cost} m={memory_cost} KiB p={parallelism}: {elapsed:.3f} s")
+        return elapsed
+
+    # Probe with a small instance to estimate the cost of one block per pass
+    probe_memory = max(8 * parallelism, min(max_memory_cost, 256 * parallelism))
+    per_block = measure(min_time_cost, probe_memory) / (probe_memory * min_time_cost)
+
+    budget = target_seconds / per_block
+    unit = 4 * parallelism
+    memory_cost = max(8 * parallelism, min(max_memory_cost, int(budget / min_time_cost) // unit * unit))
+    time_cost = max(min_time_cost, int(budget // memory_cost))
+
+    seconds = measure(time_cost, memory_cost)
+    # One correction step from the real measurement
+    if seconds > target_seconds * 1.25 and time_cost > min_time_cost:
+        time_cost = max(min_time_cost, int(time_cost * target_seconds / seconds))
+        seconds = measure(time_cost, memory_cost)
+    elif seconds > target_seconds * 1.25:
+        memory_cost = max(8 * parallelism, int(memory_cost * target_seconds / seconds) // unit * unit)
+        seconds = measure(time_cost, memory_cost)
+
+    return {'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism,
+            'seconds': seconds}
+
+
+# RFC 9106 section 5 test vectors
+RFC9106_VECTORS = [
+    (ARGON2D, "512b391b6f1162975371d30919734294f868e3be3984f3c1a13a4db9fabe4acb"),
+    (ARGON2I, "c814d9d1dc7f37aa13f0d77f2494bda1c8de6b016dd388d29952a4c4672b6ce8"),
+    (ARGON2ID, "0d640df58d78766c08c037a34a8b53c9d01ef0452d75b65eb52520e96b01e659"),
+]
+
+
+def test_argon2_implementation(executor=None):
+    """Check the RFC 9106 test vectors (m=32 KiB, t=3, p=4, 32-byte tag)"""
+    print("Testing Argon2 Implementation (RFC 9106 vectors)")
+    print("=" * 50)
+    all_pass = True
+    for variant, expected in RFC9106_VECTORS:
+        tag = argon2_hash(b"\x01" * 32, b"\x02" * 16, time_cost=3, memory_cost=32, parallelism=4,
+                          tag_length=32, secret=b"\x03" * 8, associated_data=b"\x04" * 12,
+                          variant=variant, executor=executor).hex()
+        passed = tag == expected
+        all_pass = all_pass and passed
+        print(f"{TYPE_NAMES[variant]}: {'PASS' if passed else 'FAIL'}")
+        print(f"Expected: {expected}")
+        print(f"Got:      {tag}")
+        print()
+    return all_pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Argon2id password hashing on the custom BLAKE2b')
+    parser.add_argument('--executor', choices=['thread', 'process'],
+                        help='Fill lanes on a thread or process pool (default: sequential)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    hash_parser = subparsers.add_parser('hash', help='Hash a password (prompted if not given)')
+    hash_parser.add_argument('password', nargs='?')
+    hash_parser.add_argument('-t', '--time-cost', type=int, default=DEFAULT_TIME_COST)
+    hash_parser.add_argument('-m', '--memory-cost', type=int, default=DEFAULT_MEMORY_COST, help='KiB')
+    hash_parser.add_argument('-p', '--parallelism', type=int, default=DEFAULT_PARALLELISM)
+    hash_parser.add_argument('-l', '--tag-length', type=int, default=DEFAULT_TAG_LENGTH)
+
+    verify_parser = subparsers.add_parser('verify', help='Verify a password against a PHC string')
+    verify_parser.add_argument('encoded')
+    verify_parser.add_argument('password', nargs='?')
+
+    calibrate_parser = subparsers.add_parser('calibrate', help='Pick costs for a target latency')
+    calibrate_parser.add_argument('-T', '--target', type=float, default=0.5, help='Seconds (default: 0.5)')
+    calibrate_parser.add_argument('-p', '--parallelism', type=int, default=DEFAULT_PARALLELISM)
+    calibrate_parser.add_argument('--max-memory', type=int, default=CALIBRATE_MAX_MEMORY_COST, help='KiB')
+
+    subparsers.add_parser('test', help='Check the RFC 9106 test vectors')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'hash':
+            password = args.password if args.password is not None else getpass.getpass()
+            print(hash_password(password, args.time_cost, args.memory_cost, args.parallelism,
+                                args.tag_length, executor=args.executor))
+            return 0
+        if args.command == 'verify':
+            password = args.password if args.password is not None else getpass.getpass()
+            if verify_password(args.encoded, password, executor=args.executor):
+                print("✓ Password matches")
+                return 0
+            print("✗ Password does not match")
+            return 1
+        if args.command == 'calibrate':
+            print(f"Calibrating for {args.target:.3f} s on {os.cpu_count()} CPU(s)")
+            result = calibrate(args.target, args.parallelism, args.max_memory,
+                               executor=args.executor, verbose=True)
+            print(f"\nRecommended: -t {result['time_cost']} -m {result['memory_cost']} "
+                  f"-p {result['parallelism']} ({result['seconds']:.3f} s)")
+            return 0
+        return 0 if test_argon2_implementation(args.executor) else 1
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
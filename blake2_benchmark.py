@@ -0,0 +1,316 @@
+"""
+Benchmarks for the BLAKE2 Implementation
+Usage: python blake2_benchmark.py [benchmark ...]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from blake2_implementation import HashPool, MacContext, blake2b, blake2s, blake2b_batch, hash_many_threaded
+from blake2_hll import HyperLogLog, DEFAULT_KEY as HLL_KEY, HLL_PERSON, evaluate as evaluate_hll
+from blake2_minhash import evaluate as evaluate_minhash
+from blake2_partition import Partitioner, SHARD_PERSON, jump_hash
+
+
+def _rate(count, seconds):
+    """Operations per second, guarding against a zero-length timing"""
+    return count / seconds if seconds > 0 else float('inf')
+
+
+def bench_mac(messages=2000, message_size=64, algorithm='blake2b'):
+    """
+    Compare MAC throughput of the per-call keyed path with MacContext
+
+    Args:
+        messages: Number of messages to sign
+        message_size: Size of each message in bytes
+        algorithm: 'blake2b' or 'blake2s'
+
+    Returns:
+        Dict with messages/second for both paths
+    """
+    key = os.urandom(32)
+    batch = [os.urandom(message_size) for _ in range(messages)]
+    keyed_hash = blake2b if algorithm == 'blake2b' else blake2s
+
+    start = time.perf_counter()
+    per_call = [keyed_hash(message, key=key) for message in batch]
+    per_call_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    context = MacContext(key, algorithm)
+    batched = context.sign_many(batch)
+    context_time = time.perf_counter() - start
+
+    if per_call != batched:
+        raise AssertionError("MacContext tags differ from the per-call keyed path")
+
+    result = {
+        'per_call': _rate(messages, per_call_time),
+        'mac_context': _rate(messages, context_time),
+    }
+
+    print(f"MAC ({algorithm}, {messages} x {message_size} bytes)")
+    print(f"  per-call keyed hash: {result['per_call']:10.0f} msg/s")
+    print(f"  MacContext:          {result['mac_context']:10.0f} msg/s "
+          f"({result['mac_context'] / result['per_call']:.2f}x)")
+    return result
+
+
+def bench_hashpool(buffers=4, buffer_size=256 * 1024, workers=None):
+    """
+    Compare hashing large in-memory buffers in one process, on a HashPool
+    (shared memory) and on a plain process pool (buffers pickled to workers)
+
+    Returns:
+        Dict with MB/s for each path
+    """
+    workers = workers or os.cpu_count() or 1
+    batch = [os.urandom(buffer_size) for _ in range(buffers)]
+    total = buffers * buffer_size
+
+    start = time.perf_counter()
+    expected = [blake2b(data) for data in batch]
+    single_time = time.perf_counter() - start
+
+    with HashPool(workers=workers) as pool:
+        pool.submit(b"warm-up").result()
+        start = time.perf_counter()
+        shared = pool.hash_many(batch)
+        shared_time = time.perf_counter() - start
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pool.submit(blake2b, b"warm-up").result()
+        start = time.perf_counter()
+        pickled = list(pool.map(blake2b, batch))
+        pickled_time = time.perf_counter() - start
+
+    if shared != expected or pickled != expected:
+        raise AssertionError("Pool digests differ from single-process hashing")
+
+    result = {
+        'single_process': _rate(total, single_time) / 1e6,
+        'hash_pool': _rate(total, shared_time) / 1e6,
+        'pickled_pool': _rate(total, pickled_time) / 1e6,
+    }
+
+    print(f"Buffer hashing ({buffers} x {buffer_size} bytes, {workers} workers, {os.cpu_count()} CPUs)")
+    print(f"  single process:           {result['single_process']:8.2f} MB/s")
+    print(f"  HashPool (shared memory): {result['hash_pool']:8.2f} MB/s "
+          f"({result['hash_pool'] / result['single_process']:.2f}x)")
+    print(f"  process pool (pickled):   {result['pickled_pool']:8.2f} MB/s "
+          f"({result['pickled_pool'] / result['single_process']:.2f}x)")
+    return result
+
+
+def bench_hll(items=5000, precision=12, cardinalities=(100, 1000, 10000)):
+    """
+    Compare HyperLogLog hashing through per-call keyed blake2b() with the
+    batched sketch, then report estimate accuracy after a sharded merge
+
+    Returns:
+        Dict with items/second for both paths and the accuracy results
+    """
+    batch = [f"user:{i}" for i in range(items)]
+    sketch = HyperLogLog(precision)
+
+    start = time.perf_counter()
+    for item in batch:
+        blake2b(item.encode('utf-8'), 8, key=HLL_KEY, person=HLL_PERSON)
+    per_call_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sketch.update(batch)
+    sketch_time = time.perf_counter() - start
+
+    accuracy = evaluate_hll(cardinalities, precision)
+    result = {
+        'per_call': _rate(items, per_call_time),
+        'sketch': _rate(items, sketch_time),
+        'accuracy': accuracy['results'],
+    }
+
+    print(f"HyperLogLog ({items} items, precision {precision})")
+    print(f"  per-call keyed blake2b(): {result['per_call']:10.0f} items/s")
+    print(f"  HyperLogLog.update():     {result['sketch']:10.0f} items/s "
+          f"({result['sketch'] / result['per_call']:.2f}x)")
+    print(f"  accuracy (expected error {accuracy['expected_error']:.2%}):")
+    for row in accuracy['results']:
+        print(f"    {row['cardinality']:>8} distinct: estimate {row['estimate']:>8} "
+              f"({row['relative_error']:+.2%})")
+    return result
+
+
+def bench_minhash(documents=100, threshold=0.5):
+    """
+    MinHash/LSH indexing throughput and candidate recall/precision on a synthetic corpus
+
+    Returns:
+        The dict from blake2_minhash.evaluate
+    """
+    result = evaluate_minhash(documents, threshold=threshold)
+    print(f"MinHash/LSH ({documents} documents, similarity threshold {threshold})")
+    print(f"  indexing:  {result['docs_per_second']:10.1f} docs/s")
+    print(f"  recall:    {result['recall']:10.3f}")
+    print(f"  precision: {result['precision']:10.3f}")
+    return result
+
+
+def bench_partition(keys=5000, shards=64):
+    """
+    Compare shard assignment via per-call keyed blake2b() with Partitioner
+
+    Returns:
+        Dict with keys/second for both paths
+    """
+    secret = os.urandom(32)
+    batch = [f"user:{i}" for i in range(keys)]
+
+    start = time.perf_counter()
+    per_call = [jump_hash(int.from_bytes(blake2b(item.encode('utf-8'), 8, key=secret,
+                                                 person=SHARD_PERSON), 'little'), shards)
+                for item in batch]
+    per_call_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = Partitioner(secret, shards).shard_ids(batch)
+    partitioner_time = time.perf_counter() - start
+
+    if per_call != batched:
+        raise AssertionError("Partitioner shards differ from the per-call path")
+
+    result = {
+        'per_call': _rate(keys, per_call_time),
+        'partitioner': _rate(keys, partitioner_time),
+    }
+
+    print(f"Partitioning ({keys} keys, {shards} shards, jump hash)")
+    print(f"  per-call keyed blake2b(): {result['per_call']:10.0f} keys/s")
+    print(f"  Partitioner:              {result['partitioner']:10.0f} keys/s "
+          f"({result['partitioner'] / result['per_call']:.2f}x)")
+    return result
+
+
+def bench_threads(messages=400, message_size=1024, thread_counts=(1, 2, 4, 8)):
+    """
+    Measure hash_many_threaded scaling with the number of threads
+
+    On a GIL build throughput stays flat; on a free-threaded build it should
+    grow with the thread count up to the number of cores.
+
+    Returns:
+        Dict mapping thread count to messages/second
+    """
+    batch = [os.urandom(message_size) for _ in range(messages)]
+    gil_check = getattr(sys, '_is_gil_enabled', None)
+    gil = 'enabled' if gil_check is None or gil_check() else 'disabled (free-threaded)'
+
+    start = time.perf_counter()
+    expected = blake2b_batch(batch)
+    baseline = _rate(messages, time.perf_counter() - start)
+
+    print(f"Threaded hashing ({messages} x {message_size} bytes, GIL {gil}, {os.cpu_count()} CPUs)")
+    print(f"  single thread, no pool: {baseline:10.0f} msg/s")
+    result = {}
+    for threads in thread_counts:
+        start = time.perf_counter()
+        digests = hash_many_threaded(batch, workers=threads)
+        result[threads] = _rate(messages, time.perf_counter() - start)
+        if digests != expected:
+            raise AssertionError("Threaded digests differ from the single-threaded path")
+        print(f"  {threads:2d} thread(s):           {result[threads]:10.0f} msg/s "
+              f"({result[threads] / baseline:.2f}x)")
+    return result
+
+
+def bench_daemon(files=200, file_size=100, workers=2):
+    """
+    Compare per-file overhead of one CLI process per file with the daemon client
+
+    Starts a private daemon on a temporary socket for the duration of the run.
+
+    Returns:
+        Dict with milliseconds per file for each path
+    """
+    from blake2_client import DaemonClient, DaemonUnavailable
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(files):
+            path = os.path.join(tmp, f"file{i}")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(file_size))
+            paths.append(path)
+
+        cli_runs = min(files, 10)
+        start = time.perf_counter()
+        for path in paths[:cli_runs]:
+            subprocess.run([sys.executable, os.path.join(here, 'blake2_cli.py'), '-f', path],
+                           check=True, stdout=subprocess.DEVNULL)
+        cli_ms = (time.perf_counter() - start) * 1000 / cli_runs
+
+        socket_path = os.path.join(tmp, 'daemon.sock')
+        daemon = subprocess.Popen([sys.executable, os.path.join(here, 'blake2_daemon.py'),
+                                   '--socket', socket_path, '--workers', str(workers)],
+                                  stdout=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 10
+            while True:
+                try:
+                    client = DaemonClient(socket_path)
+                    break
+                except DaemonUnavailable:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.05)
+            with client:
+                start = time.perf_counter()
+                for path in paths:
+                    client.hash_file(path)
+                daemon_ms = (time.perf_counter() - start) * 1000 / files
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+    print(f"Per-file overhead ({file_size}-byte files)")
+    print(f"  blake2_cli.py per file: {cli_ms:8.3f} ms")
+    print(f"  daemon client:          {daemon_ms:8.3f} ms ({cli_ms / daemon_ms:.0f}x faster)")
+    return {'cli': cli_ms, 'daemon': daemon_ms}
+
+
+BENCHMARKS = {
+    'daemon': bench_daemon,
+    'hashpool': bench_hashpool,
+    'hll': bench_hll,
+    'mac': bench_mac,
+    'minhash': bench_minhash,
+    'partition': bench_partition,
+    'threads': bench_threads,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BLAKE2 Benchmarks')
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                       help=f"Benchmarks to run: {', '.join(sorted(BENCHMARKS))} (default: all)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        BENCHMARKS[name]()
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,234 @@
+"""
+Bulk Upload Verification
+Verifies a multipart upload of many files against a manifest of expected
+digests in a single streaming pass: every file part is fed chunk by chunk to
+a hasher running on a worker thread (through a small bounded queue, so no
+file is ever buffered whole), and a result is produced as soon as each file
+has been hashed. Used by the /api/verify/bulk endpoint of app.py.
+
+The manifest part (named "manifest", as a field or a file) may be JSON
+({"name": "hex", ...}), b2sum output ("hex  name") or a blake2_manifest text
+manifest ("hex size path"); names are matched against upload filenames.
+"""
+
+import hmac
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from werkzeug.sansio.multipart import MultipartDecoder, Data, Epilogue, Field, File, NeedData
+
+from blake2_archive import new_hasher
+from blake2_manifest import parse_line
+from blake2_stream import DEFAULT_CHUNK_SIZE
+
+
+MANIFEST_FIELD = 'manifest'
+MAX_MANIFEST_BYTES = 16 << 20
+# Chunks waiting per file; bounds memory to about (workers + 1) * depth * chunk
+QUEUE_DEPTH = 8
+
+
+def parse_manifest(text):
+    """
+    Parse expected digests
+
+    Returns:
+        Dict mapping file name to lowercase hex digest
+
+    Raises:
+        ValueError: if a line or the JSON document is malformed
+    """
+    stripped = text.strip()
+    if stripped.startswith('{'):
+        document = json.loads(stripped)
+        if not all(isinstance(value, str) for value in document.values()):
+            raise ValueError("Manifest JSON must map file names to hex digests")
+        expected = {name: value.lower() for name, value in document.items()}
+    else:
+        expected = {}
+        for number, line in enumerate(text.splitlines(), 1):
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split(' ', 2)
+            if len(fields) == 3 and fields[1].isdigit():
+                digest, _, name = parse_line(line)
+                expected[name] = digest.hex()
+            elif len(fields) >= 2:
+                digest, name = line.split(None, 1)
+                expected[name[1:] if name.startswith('*') else name] = digest.lower()
+            else:
+                raise ValueError(f"Manifest line {number} is not 'digest  name'")
+    for name, digest in expected.items():
+        try:
+            bytes.fromhex(digest)
+        except ValueError:
+            raise ValueError(f"Manifest digest for {name!r} is not hexadecimal") from None
+    return expected
+
+
+def _hash_part(chunks, hasher):
+    """Worker: hash the chunks of one part until the None sentinel"""
+    start = time.perf_counter()
+    size = 0
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        hasher.update(chunk)
+        size += len(chunk)
+    return hasher.hexdigest(), size, time.perf_counter() - start
+
+
+def _result(name, actual, size, seconds, expected):
+    digest = expected.get(name)
+    if digest is None:
+        status = 'unexpected'
+    elif len(actual) != len(digest):
+        # Hashed at another digest size; equal content would still differ
+        status = 'unverifiable'
+    elif hmac.compare_digest(actual, digest):
+        status = 'ok'
+    else:
+        status = 'mismatch'
+    return {'file': name, 'status': status, 'size': size, 'expected': digest, 'actual': actual,
+            'seconds': round(seconds, 3)}
+
+
+def verify_upload(stream, boundary, algorithm='blake2b', digest_size=None, workers=None,
+                  chunk_size=DEFAULT_CHUNK_SIZE, max_files=None, manifest=None):
+    """
+    Verify a streamed multipart body against expected digests
+
+    The manifest part must precede the file parts unless digest_size is
+    given (its digest length sets the digest size); results for files that
+    finish before the manifest has arrived are then held back until it is
+    parsed.
+
+    Args:
+        stream: Readable request body
+        boundary: Multipart boundary (bytes or str)
+        algorithm: 'blake2b' or 'blake2s'
+        digest_size: Digest size in bytes (default: the manifest's, or the
+            algorithm maximum)
+        workers: Hashing threads (default: CPU count)
+        chunk_size: Bytes read from the body at a time
+        max_files: Reject uploads with more file parts than this
+        manifest: Expected digests as a dict, instead of a manifest part
+
+    Yields:
+        One dict per file ({"file", "status", "size", "expected", "actual",
+        "seconds"}, status 'ok', 'mismatch', 'unexpected' or 'unverifiable'
+        when the digest lengths differ), then
+        {"summary": {...}}; a malformed upload ends with {"error": ...}
+    """
+    if isinstance(boundary, str):
+        boundary = boundary.encode('latin-1')
+    decoder = MultipartDecoder(boundary, max_form_memory_size=MAX_MANIFEST_BYTES)
+    expected = dict(manifest) if manifest is not None else None
+    manifest_data = None
+    held = []          # results waiting for the manifest
+    running = {}       # future -> file name
+    current = None     # chunk queue of the file part being received
+    seen = set()
+    counts = {'ok': 0, 'mismatch': 0, 'unexpected': 0, 'unverifiable': 0}
+    files = 0
+
+    def finish(result):
+        counts[result['status']] += 1
+        return result
+
+    def collect(timeout):
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            actual, size, seconds = future.result()
+            if expected is None:
+                held.append((name, actual, size, seconds))
+            else:
+                yield finish(_result(name, actual, size, seconds, expected))
+
+    pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix='blake2-bulk')
+    try:
+        finished = False
+        while not finished:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                chunk = stream.read(chunk_size)
+                decoder.receive_data(chunk or None)
+                yield from collect(0)
+            elif isinstance(event, File) and event.name != MANIFEST_FIELD:
+                files += 1
+                if max_files is not None and files > max_files:
+                    yield {'error': f"Too many files (limit {max_files})"}
+                    return
+                size = digest_size
+                if size is None:
+                    if expected is None:
+                        yield {'error': "manifest must precede files or digest_size must be given"}
+                        return
+                    if expected:
+                        size = len(next(iter(expected.values()))) // 2
+                current = queue.Queue(maxsize=QUEUE_DEPTH)
+                seen.add(event.filename)
+                running[pool.submit(_hash_part, current, new_hasher(algorithm, size))] = event.filename
+            elif isinstance(event, (Field, File)):
+                # Other form fields are skipped
+                manifest_data = bytearray() if event.name == MANIFEST_FIELD else None
+            elif isinstance(event, Data):
+                if current is not None:
+                    if event.data:
+                        current.put(event.data)
+                    if not event.more_data:
+                        current.put(None)
+                        current = None
+                elif manifest_data is not None:
+                    manifest_data += event.data
+                    if len(manifest_data) > MAX_MANIFEST_BYTES:
+                        yield {'error': "Manifest too large"}
+                        return
+                    if not event.more_data:
+                        expected = parse_manifest(manifest_data.decode('utf-8', errors='surrogateescape'))
+                        manifest_data = None
+                        for name, actual, size, seconds in held:
+                            yield finish(_result(name, actual, size, seconds, expected))
+                        held.clear()
+            elif isinstance(event, Epilogue):
+                finished = True
+
+        while running:
+            yield from collect(None)
+        if expected is None:
+            yield {'error': "No manifest part in the upload"}
+            return
+        missing = sorted(name for name in expected if name not in seen)
+        yield {'summary': {
+            'files': files,
+            'passed': counts['ok'],
+            'mismatched': counts['mismatch'],
+            'unexpected': counts['unexpected'],
+            'unverifiable': counts['unverifiable'],
+            'missing': missing,
+            'ok': files == counts['ok'] and not missing,
+        }}
+    except ValueError as e:
+        yield {'error': str(e)}
+    finally:
+        # Unblock workers left waiting on an abandoned part
+        if current is not None:
+            while not current.empty():
+                current.get_nowait()
+            current.put_nowait(None)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def format_ndjson(record):
+    return json.dumps(record) + "\n"
+
+
+def format_sse(record):
+    """Server-sent event: 'result', 'summary' or 'error' with the record as data"""
+    event = 'summary' if 'summary' in record else 'error' if 'error' in record else 'result'
+    return f"event: {event}\ndata: {json.dumps(record)}\n\n"
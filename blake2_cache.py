@@ -0,0 +1,171 @@
+"""
+Persistent Hash Cache for the BLAKE2 CLI
+Maps (device, inode, size, mtime_ns, algorithm, params) to a previously computed
+digest so that unchanged files do not have to be rehashed on every run.
+The cache is a single SQLite database in WAL mode, which makes it safe to share
+between concurrently running CLI processes.
+"""
+
+import os
+import sqlite3
+import time
+
+from blake2_implementation import blake2b
+
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'blake2_cli', 'hashes.sqlite3'
+)
+
+# Entries that have not been used for this long are evicted (30 days)
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+
+def params_fingerprint(digest_size, key=b"", salt=b"", person=b""):
+    """
+    Build a stable fingerprint of the hashing parameters
+
+    The key is never stored in the cache; only a personalized BLAKE2b
+    digest of the parameters is kept.
+
+    Args:
+        digest_size: Output size in bytes
+        key: Key for keyed hashing
+        salt: Salt value
+        person: Personalization string
+
+    Returns:
+        Fingerprint as a hex string
+    """
+    encoded = bytes([digest_size, len(key), len(salt), len(person)]) + key + salt + person
+    return blake2b(encoded, digest_size=16, person=b"blake2-cli-cache").hex()
+
+
+class HashCache:
+    """
+    On-disk digest cache keyed by file identity and stat metadata
+
+    A row is only returned when device, inode, size and mtime_ns all match the
+    current stat of the file. A file whose size or mtime changed replaces its
+    old row on the next store, so stale digests are never served.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS digests (
+            device    INTEGER NOT NULL,
+            inode     INTEGER NOT NULL,
+            algorithm TEXT    NOT NULL,
+            params    TEXT    NOT NULL,
+            size      INTEGER NOT NULL,
+            mtime_ns  INTEGER NOT NULL,
+            digest    TEXT    NOT NULL,
+            path      TEXT    NOT NULL,
+            last_used REAL    NOT NULL,
+            PRIMARY KEY (device, inode, algorithm, params)
+        );
+        CREATE INDEX IF NOT EXISTS digests_last_used ON digests (last_used);
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_age=DEFAULT_MAX_AGE, timeout=30.0):
+        """
+        Open (and create if needed) the cache database
+
+        Args:
+            path: Location of the SQLite database file
+            max_age: Seconds after which unused entries are evicted
+            timeout: Seconds to wait for a lock held by another process
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_age = max_age
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def lookup(self, st, algorithm, params):
+        """
+        Look up the digest for a file
+
+        Args:
+            st: os.stat_result of the file
+            algorithm: 'blake2b' or 'blake2s'
+            params: Fingerprint from params_fingerprint()
+
+        Returns:
+            Hex digest, or None if there is no fresh entry
+        """
+        row = self.conn.execute(
+            'SELECT digest FROM digests WHERE device=? AND inode=? AND algorithm=? '
+            'AND params=? AND size=? AND mtime_ns=?',
+            (st.st_dev, st.st_ino, algorithm, params, st.st_size, st.st_mtime_ns)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.conn.execute(
+            'UPDATE digests SET last_used=? WHERE device=? AND inode=? AND algorithm=? AND params=?',
+            (time.time(), st.st_dev, st.st_ino, algorithm, params)
+        )
+        return row[0]
+
+    def store(self, st, algorithm, params, digest, path=""):
+        """
+        Record the digest for a file, replacing any stale entry for the same inode
+
+        Args:
+            st: os.stat_result of the file taken before it was read
+            algorithm: 'blake2b' or 'blake2s'
+            params: Fingerprint from params_fingerprint()
+            digest: Hex digest of the file contents
+            path: File path, kept for diagnostics only
+        """
+        now = time.time()
+        # A file modified within the mtime granularity window may change again
+        # without its mtime moving, so such digests are not worth trusting later
+        if now - st.st_mtime_ns / 1e9 < 2.0:
+            return
+
+        self.conn.execute(
+            'INSERT OR REPLACE INTO digests '
+            '(device, inode, algorithm, params, size, mtime_ns, digest, path, last_used) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (st.st_dev, st.st_ino, algorithm, params, st.st_size, st.st_mtime_ns,
+             digest, os.path.abspath(path) if path else "", now)
+        )
+        self.evict()
+
+    def evict(self, max_age=None):
+        """
+        Remove entries that have not been used recently
+
+        Args:
+            max_age: Seconds of inactivity before eviction (defaults to self.max_age)
+
+        Returns:
+            Number of entries removed
+        """
+        if max_age is None:
+            max_age = self.max_age
+        cursor = self.conn.execute('DELETE FROM digests WHERE last_used < ?',
+                                   (time.time() - max_age,))
+        return cursor.rowcount
+
+    def invalidate(self, st):
+        """Drop every cached digest for the file identified by st"""
+        self.conn.execute('DELETE FROM digests WHERE device=? AND inode=?',
+                          (st.st_dev, st.st_ino))
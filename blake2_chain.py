@@ -0,0 +1,396 @@
+"""
+Tamper-Evident Append-Only Hash-Chain Log
+Every entry's keyed BLAKE2b digest covers its sequence number, the previous
+entry's digest and its payload, with personalization for domain separation, so
+entries cannot be rewritten without the key. Signed checkpoints every N entries
+let verification run on independent segments in parallel, or resume from the
+last checkpoint.
+Usage: python blake2_chain.py -k KEY append LOG [ENTRY ...] [options]
+       python blake2_chain.py -k KEY {verify,verify-from-checkpoint} LOG [options]
+"""
+
+import argparse
+import fcntl
+import hmac
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from blake2_implementation import BLAKE2b
+
+
+DIGEST_SIZE = 32
+GENESIS_HASH = bytes(DIGEST_SIZE)
+DEFAULT_CHECKPOINT_INTERVAL = 10000
+
+ENTRY_PERSON = b"chain-entry"
+CHECKPOINT_PERSON = b"chain-checkpoint"
+
+
+def entry_hash(key, seq, prev_hash, payload):
+    """Digest of entry seq: keyed BLAKE2b-256(LE64(seq) || prev_hash || payload), person 'chain-entry'"""
+    hasher = BLAKE2b(DIGEST_SIZE, key=key, person=ENTRY_PERSON)
+    hasher.update(struct.pack('<Q', seq) + prev_hash + payload)
+    return hasher.digest()
+
+
+def checkpoint_tag(key, seq, offset, chain_hash):
+    """Keyed BLAKE2b signature binding a checkpoint's position to the chain hash"""
+    hasher = BLAKE2b(DIGEST_SIZE, key=key, person=CHECKPOINT_PERSON)
+    hasher.update(struct.pack('<QQ', seq, offset) + chain_hash)
+    return hasher.digest()
+
+
+def format_entry(seq, digest, payload):
+    """One log line: seq, hex digest and the JSON-encoded payload, tab separated"""
+    return f"{seq}\t{digest.hex()}\t{json.dumps(payload.decode('utf-8'))}\n".encode('utf-8')
+
+
+def parse_entry(line):
+    """
+    Split a log line into its fields
+
+    Returns:
+        (seq, stored digest, payload bytes)
+
+    Raises:
+        ValueError: if the line is malformed
+    """
+    seq, digest, payload = line.rstrip(b"\n").split(b"\t", 2)
+    return int(seq), bytes.fromhex(digest.decode('ascii')), json.loads(payload).encode('utf-8')
+
+
+def checkpoints_path(log_path):
+    return log_path + '.checkpoints'
+
+
+def _read_last_line(f, end):
+    """Read the last complete line ending at byte offset end, scanning backwards"""
+    position = end
+    tail = b""
+    while position > 0:
+        step = min(4096, position)
+        position -= step
+        f.seek(position)
+        tail = f.read(step) + tail
+        newline = tail.rfind(b"\n", 0, len(tail) - 1)
+        if newline != -1:
+            return tail[newline + 1:]
+    return tail
+
+
+class HashChainLog:
+    """
+    Append-only hash-chain log with signed checkpoints
+
+    Appends cost O(1): the last sequence number and digest are recovered from
+    the tail of the file, never by rereading the log. An exclusive flock makes
+    appends safe across processes.
+    """
+
+    def __init__(self, path, key, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, fsync=False):
+        """
+        Open (creating if needed) a log
+
+        Args:
+            path: Log file path; checkpoints go to path + '.checkpoints'
+            key: Entry and checkpoint signing key (1-64 bytes)
+            checkpoint_interval: Entries between checkpoints
+            fsync: Flush entries to stable storage on every append
+        """
+        if not 1 <= len(key) <= 64:
+            raise ValueError("Log key must be between 1 and 64 bytes")
+        self.path = path
+        self.key = key
+        self.checkpoint_interval = checkpoint_interval
+        self.fsync = fsync
+        self.file = open(path, 'a+b')
+        self.checkpoints = open(checkpoints_path(path), 'a+b')
+        self._known_size = -1
+        self.last_seq = 0
+        self.last_hash = GENESIS_HASH
+
+    def close(self):
+        self.file.close()
+        self.checkpoints.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _refresh_tail(self):
+        """Reload the last entry if another writer appended since we last looked"""
+        size = os.fstat(self.file.fileno()).st_size
+        if size == self._known_size:
+            return
+        if size == 0:
+            self.last_seq, self.last_hash = 0, GENESIS_HASH
+        else:
+            self.last_seq, self.last_hash, _ = parse_entry(_read_last_line(self.file, size))
+        self._known_size = size
+
+    def append(self, payload):
+        """
+        Append one entry
+
+        Args:
+            payload: Entry text (str) or UTF-8 bytes
+
+        Returns:
+            (sequence number, hex digest) of the new entry
+        """
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        payload.decode('utf-8')  # entries are stored as JSON strings
+
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        try:
+            self._refresh_tail()
+            seq = self.last_seq + 1
+            digest = entry_hash(self.key, seq, self.last_hash, payload)
+            self.file.seek(0, os.SEEK_END)
+            self.file.write(format_entry(seq, digest, payload))
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self._known_size = self.file.tell()
+            self.last_seq, self.last_hash = seq, digest
+
+            if seq % self.checkpoint_interval == 0:
+                self._write_checkpoint(seq, self._known_size, digest)
+        finally:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        return seq, digest.hex()
+
+    def checkpoint(self):
+        """Force a checkpoint at the current end of the log"""
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        try:
+            self._refresh_tail()
+            if self.last_seq:
+                self._write_checkpoint(self.last_seq, self._known_size, self.last_hash)
+        finally:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+    def _write_checkpoint(self, seq, offset, chain_hash):
+        record = {'seq': seq, 'offset': offset, 'hash': chain_hash.hex(),
+                  'tag': checkpoint_tag(self.key, seq, offset, chain_hash).hex()}
+        self.checkpoints.write((json.dumps(record) + "\n").encode('utf-8'))
+        self.checkpoints.flush()
+        if self.fsync:
+            os.fsync(self.checkpoints.fileno())
+
+
+def load_checkpoints(log_path, key):
+    """
+    Read and authenticate the checkpoints of a log
+
+    Returns:
+        (valid checkpoints sorted by seq, list of error strings)
+    """
+    valid = []
+    errors = []
+    path = checkpoints_path(log_path)
+    if not os.path.exists(path):
+        return valid, errors
+    with open(path, 'rb') as f:
+        for number, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+                seq, offset, chain_hash = record['seq'], record['offset'], bytes.fromhex(record['hash'])
+                tag = bytes.fromhex(record['tag'])
+            except (ValueError, KeyError, TypeError):
+                errors.append(f"checkpoint line {number}: malformed")
+                continue
+            if not hmac.compare_digest(checkpoint_tag(key, seq, offset, chain_hash), tag):
+                errors.append(f"checkpoint line {number} (seq {seq}): bad signature")
+                continue
+            if valid and (seq <= valid[-1]['seq'] or offset <= valid[-1]['offset']):
+                errors.append(f"checkpoint line {number} (seq {seq}): out of order")
+                continue
+            valid.append({'seq': seq, 'offset': offset, 'hash': chain_hash})
+    return valid, errors
+
+
+def verify_segment(log_path, key, start_offset, start_seq, prev_hash, end_offset=None):
+    """
+    Verify the entries between two byte offsets
+
+    Each entry is recomputed from the stored digest of its predecessor, so a
+    modified entry is reported on its own line instead of invalidating the
+    rest of the segment.
+
+    Args:
+        log_path: Log file
+        key: Entry signing key
+        start_offset: Offset of the first entry to check
+        start_seq: Sequence number of the entry before start_offset (0 at the start)
+        prev_hash: Digest of that entry
+        end_offset: Offset to stop at (default: end of file)
+
+    Returns:
+        (last seq, last stored digest, list of (seq or line offset, problem))
+    """
+    problems = []
+    seq = start_seq
+    resynced = False
+    with open(log_path, 'rb') as f:
+        position = start_offset
+        if start_offset:
+            # A signed offset that is no longer an entry boundary means bytes
+            # were inserted or removed earlier in the log; resynchronize
+            f.seek(start_offset - 1)
+            if f.read(1) != b"\n":
+                problems.append((start_seq, "checkpoint offset is not an entry boundary (log modified before it)"))
+                position += len(f.readline())
+                resynced = True
+        f.seek(position)
+        while end_offset is None or position < end_offset:
+            line = f.readline()
+            if not line:
+                break
+            line_offset = position
+            position += len(line)
+            if not line.endswith(b"\n"):
+                problems.append((f"offset {line_offset}", "truncated entry"))
+                break
+            try:
+                entry_seq, stored, payload = parse_entry(line)
+            except (ValueError, UnicodeDecodeError):
+                problems.append((f"offset {line_offset}", "malformed entry"))
+                seq += 1
+                continue
+            if resynced:
+                # The predecessor of the first entry after a resync is unknown:
+                # anchor on it and check the chain from there on
+                seq, prev_hash, resynced = entry_seq, stored, False
+                continue
+            if entry_seq != seq + 1:
+                problems.append((entry_seq, f"sequence gap (expected {seq + 1})"))
+            seq = entry_seq
+            if not hmac.compare_digest(entry_hash(key, entry_seq, prev_hash, payload), stored):
+                problems.append((entry_seq, "digest mismatch"))
+            prev_hash = stored
+    return seq, prev_hash, problems
+
+
+def verify_log(log_path, key, workers=None, from_checkpoint=False):
+    """
+    Verify a log, in parallel between checkpoints
+
+    Args:
+        log_path: Log file
+        key: Entry and checkpoint signing key
+        workers: Worker processes (default: CPU count)
+        from_checkpoint: Trust the latest valid checkpoint and verify only
+            the entries appended after it
+
+    Returns:
+        Dict with 'entries' checked, 'last_seq', 'checkpoints' used and
+        'problems' as (seq or location, description) pairs
+    """
+    checkpoints, problems = load_checkpoints(log_path, key)
+    problems = [("checkpoints", error) for error in problems]
+    if not os.path.exists(checkpoints_path(log_path)) and os.path.getsize(log_path):
+        # Every log written by HashChainLog has one, even before the first checkpoint
+        problems.append(("checkpoints", "checkpoints file missing"))
+
+    # Segment boundaries: (start offset, seq before it, hash before it)
+    starts = [(0, 0, GENESIS_HASH)] + [(c['offset'], c['seq'], c['hash']) for c in checkpoints]
+    if from_checkpoint:
+        starts = starts[-1:]
+    segments = [(start, end[0] if end else None) for start, end in
+                zip(starts, starts[1:] + [None])]
+
+    workers = workers or os.cpu_count() or 1
+    results = []
+    if workers == 1 or len(segments) == 1:
+        for (offset, seq, prev), end in segments:
+            results.append(verify_segment(log_path, key, offset, seq, prev, end))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(verify_segment, log_path, key, offset, seq, prev, end)
+                       for (offset, seq, prev), end in segments]
+            results = [future.result() for future in futures]
+
+    for index, (last_seq, last_hash, segment_problems) in enumerate(results):
+        problems.extend(segment_problems)
+        # Every segment except the last must end exactly at the next checkpoint
+        if index + 1 < len(segments):
+            _, next_seq, next_hash = starts[index + 1]
+            if last_seq != next_seq or not hmac.compare_digest(last_hash, next_hash):
+                problems.append((next_seq, "chain does not reach the signed checkpoint"))
+
+    first_seq = starts[0][1]
+    last_seq = results[-1][0] if results else first_seq
+    return {
+        'entries': last_seq - first_seq,
+        'last_seq': last_seq,
+        'checkpoints': len(checkpoints),
+        'problems': problems,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tamper-evident BLAKE2b hash-chain log')
+    parser.add_argument('-k', '--key', required=True, help='Entry and checkpoint signing key (UTF-8)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    append_parser = subparsers.add_parser('append', help='Append entries (arguments, or stdin lines)')
+    append_parser.add_argument('log')
+    append_parser.add_argument('entries', nargs='*', metavar='ENTRY',
+                               help='Entries to append (default: one per stdin line)')
+    append_parser.add_argument('-i', '--interval', type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                               help='Entries between checkpoints')
+    append_parser.add_argument('--checkpoint', action='store_true', help='Write a checkpoint afterwards')
+    append_parser.add_argument('--fsync', action='store_true', help='fsync every entry')
+
+    for name, description in (('verify', 'Verify the whole log, segments in parallel'),
+                              ('verify-from-checkpoint', 'Verify entries after the last checkpoint')):
+        verify_parser = subparsers.add_parser(name, help=description)
+        verify_parser.add_argument('log')
+        verify_parser.add_argument('-w', '--workers', type=int, help='Worker processes')
+
+    # Entries may come before or after the append options: argparse stops
+    # collecting them at the first option, so pick up the rest here
+    args, extras = parser.parse_known_args()
+    if extras:
+        unknown = [arg for arg in extras if arg.startswith('-')]
+        if args.command != 'append' or unknown:
+            parser.error(f"unrecognized arguments: {' '.join(unknown or extras)}")
+        args.entries += extras
+    key = args.key.encode('utf-8')
+
+    try:
+        if args.command == 'append':
+            with HashChainLog(args.log, key, args.interval, args.fsync) as log:
+                entries = args.entries or (line.rstrip("\n") for line in sys.stdin)
+                seq = digest = None
+                for entry in entries:
+                    seq, digest = log.append(entry)
+                if args.checkpoint:
+                    log.checkpoint()
+            if seq is not None:
+                print(f"Last entry: {seq} {digest}")
+            return 0
+
+        result = verify_log(args.log, key, args.workers, args.command == 'verify-from-checkpoint')
+        print(f"Entries verified: {result['entries']} (last seq {result['last_seq']}, "
+              f"{result['checkpoints']} valid checkpoint(s))")
+        if result['problems']:
+            for where, problem in result['problems']:
+                print(f"✗ {where}: {problem}")
+            return 1
+        print("✓ Chain intact")
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
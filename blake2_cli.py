@@ -4,30 +4,165 @@ Usage: python blake2_cli.py [options]
 """
 
 import argparse
+import io
+import os
 import sys
 from blake2_implementation import BLAKE2b, BLAKE2s
+from blake2_cache import HashCache, DEFAULT_CACHE_PATH, params_fingerprint
+from blake2_tune import tuned
+from blake2_stream import (hash_file_stable, tee_stream, print_progress, parse_size,
+                           format_pipeline_stats, DEFAULT_READAHEAD_BUFFERS)
+
+def tee(args, key, salt, person):
+    """--tee mode: copy stdin onward while hashing it, without a second read"""
+    if args.backend == 'hashlib':
+        import hashlib
+        hasher = getattr(hashlib, args.algorithm)(digest_size=args.size, key=key, salt=salt, person=person)
+    elif args.algorithm == 'blake2b':
+        hasher = BLAKE2b(digest_size=args.size, key=key, salt=salt, person=person)
+    else:
+        hasher = BLAKE2s(digest_size=args.size, key=key, salt=salt, person=person)
+    
+    # Unbuffered views of the standard streams avoid an extra copy per chunk
+    source = open(sys.stdin.fileno(), 'rb', buffering=0, closefd=False)
+    try:
+        sink = open(args.output, 'wb', buffering=0) if args.output else \
+            open(sys.stdout.fileno(), 'wb', buffering=0, closefd=False)
+        with sink:
+            _, stats = tee_stream(source, [sink], hasher, args.buffer_size, args.buffers,
+                                  print_progress if args.progress else None)
+    except BrokenPipeError:
+        print("Error: Output closed before the end of the input", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        source.close()
+    
+    line = f"{hasher.hexdigest()}  {args.output or '-'}"
+    if args.digest_file:
+        with open(args.digest_file, 'w') as f:
+            f.write(line + "\n")
+    else:
+        print(line, file=sys.stderr)
+    if args.io_stats:
+        print(format_pipeline_stats(stats), file=sys.stderr)
+    return 0
+
+def multi(args):
+    """--digest mode: compute every requested digest from one read of the input"""
+    from blake2_multidigest import multi_digest_stream, multi_digest_file, record_to_json
+    
+    # Each spec carries its own parameters; a global one would be silently ignored
+    ignored = [flag for flag, value in (('-s/--size', args.size), ('-k/--key', args.key),
+                                        ('--salt', args.salt), ('--person', args.person)) if value is not None]
+    if ignored:
+        print(f"Error: {', '.join(ignored)} cannot be combined with --digest; "
+              "put them in the spec instead, e.g. blake2b-256:key=K:salt=S:person=P", file=sys.stderr)
+        return 1
+    
+    mode = args.parallel or 'serial'
+    try:
+        if args.file:
+            source = args.file
+            record = multi_digest_file(args.file, args.digest, mode, buffer_size=args.buffer_size,
+                                       buffers=args.buffers)
+        elif args.text is not None:
+            source = None
+            data = args.text.encode('utf-8')
+            with io.BytesIO(data) as stream:
+                record = multi_digest_stream(stream, args.digest, mode, buffer_size=max(4096, len(data) + 1),
+                                             buffers=args.buffers)
+        else:
+            source = '-'
+            with open(sys.stdin.fileno(), 'rb', buffering=0, closefd=False) as stream:
+                record = multi_digest_stream(stream, args.digest, mode, buffer_size=args.buffer_size,
+                                             buffers=args.buffers)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    if args.json:
+        print(record_to_json(record, source))
+    else:
+        width = max(len(name) for name in record.digests)
+        for name, digest in record.digests.items():
+            print(f"{name:<{width}}  {digest}")
+        if args.io_stats:
+            rate = record.bytes_hashed / record.elapsed / (1 << 20) if record.elapsed else 0.0
+            print(f"{record.bytes_hashed} bytes in {record.elapsed:.2f}s ({rate:.2f} MiB/s, {mode})",
+                  file=sys.stderr)
+    
+    if args.verify:
+        expected = args.verify.lower().replace(' ', '').replace(':', '')
+        if expected in record.digests.values():
+            print("\n✓ VERIFICATION PASSED: Hash matches expected value")
+            return 0
+        print("\n✗ VERIFICATION FAILED: No computed digest matches the expected value")
+        return 1
+    return 0
 
 def main():
     parser = argparse.ArgumentParser(description='BLAKE2 Hash Calculator (Custom Implementation)')
     parser.add_argument('text', nargs='?', help='Text to hash (use -f for file input)')
     parser.add_argument('-f', '--file', help='File to hash')
+    parser.add_argument('--archive', metavar='ARCHIVE',
+                       help='Hash every member of a tar(.gz/.bz2/.xz/.zst) or zip archive without extracting it')
     parser.add_argument('-a', '--algorithm', choices=['blake2b', 'blake2s'], 
                        default='blake2b', help='Hash algorithm (default: blake2b)')
-    parser.add_argument('-s', '--size', type=int, help='Digest size in bytes (default: 64 for blake2b, 32 for blake2s)')
+    parser.add_argument('--tee', action='store_true',
+                       help='Copy stdin to stdout (or --output) while hashing it; the digest goes to stderr')
+    parser.add_argument('-o', '--output', help='With --tee: write the data to this file instead of stdout')
+    parser.add_argument('--digest-file', help='With --tee: write "digest  name" to this sidecar file instead of stderr')
+    parser.add_argument('--backend', choices=['custom', 'hashlib'], default='custom',
+                       help='With --tee: hash with this implementation (hashlib keeps pace with fast pipes)')
+    parser.add_argument('--digest', action='append', metavar='SPEC',
+                       help='Compute several digests in one read; repeat for each, e.g. blake2b-512, '
+                       'blake2s-256 or blake2b-256:key=secret:name=mac')
+    parser.add_argument('--parallel', choices=['thread', 'process'],
+                       help='With --digest: run the hashers on parallel threads or processes')
+    parser.add_argument('--json', action='store_true', help='With --digest: print the result as one JSON record')
+    parser.add_argument('-s', '--size', type=int, help='Digest size in bytes (default: 64 for blake2b, 32 for blake2s, '
+                       'or the size held by the --known index)')
     parser.add_argument('-k', '--key', help='Key for keyed hashing')
     parser.add_argument('--salt', help='Salt value')
     parser.add_argument('--person', help='Personalization string')
     parser.add_argument('-v', '--verify', help='Expected hash for verification')
+    parser.add_argument('--known', metavar='INDEX',
+                       help='Look the digest up in a known-file index built with blake2_known.py')
+    parser.add_argument('--cache', nargs='?', const=os.environ.get('BLAKE2_CACHE', DEFAULT_CACHE_PATH),
+                       metavar='PATH', help='Reuse digests of unchanged files from an on-disk cache '
+                       f'(default location: {DEFAULT_CACHE_PATH}, or $BLAKE2_CACHE)')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore --cache for this run')
+    parser.add_argument('--refresh', action='store_true',
+                       help='Rehash the file and overwrite its cache entry')
+    parser.add_argument('--progress', action='store_true',
+                       help='Report bytes hashed to stderr every GiB while hashing a file')
+    parser.add_argument('--buffers', type=int, default=tuned('buffers', recalibrate=True),
+                       help='Read-ahead buffers for files (default: from the tuning profile, else '
+                       f'{DEFAULT_READAHEAD_BUFFERS}; 1 disables read-ahead)')
+    parser.add_argument('--buffer-size', type=parse_size, default=tuned('buffer_size'),
+                       help='Bytes per read buffer, e.g. 256K or 4M (default: from the tuning profile, else 1M)')
+    parser.add_argument('--io-stats', action='store_true',
+                       help='Print read-ahead I/O wait versus compute time to stderr')
     
     args = parser.parse_args()
     
+    if args.digest:
+        return multi(args)
+    
+    file_stat = None
+    data = None
+    
     # Determine input data
-    if args.file:
+    if args.archive or args.tee:
+        pass
+    elif args.file:
         try:
-            with open(args.file, 'rb') as f:
-                data = f.read()
+            file_stat = os.stat(args.file)
             print(f"File: {args.file}")
-            print(f"Size: {len(data)} bytes")
+            print(f"Size: {file_stat.st_size} bytes")
         except FileNotFoundError:
             print(f"Error: File '{args.file}' not found")
             return 1
@@ -42,7 +177,15 @@ def main():
         parser.print_help()
         return 1
     
-    # Set default digest size
+    # Set default digest size; a known-file index fixes it to the size it holds
+    if args.size is None and args.known and args.algorithm == 'blake2b':
+        from blake2_known import KnownDigestIndex
+        try:
+            with KnownDigestIndex(args.known) as index:
+                args.size = index.digest_size
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
     if args.size is None:
         args.size = 64 if args.algorithm == 'blake2b' else 32
     
@@ -78,15 +221,54 @@ def main():
         print(f"Error: Personalization too long (max {max_person_size} bytes for {args.algorithm})")
         return 1
     
+    if args.tee:
+        return tee(args, key, salt, person)
+    
+    if args.archive:
+        from blake2_archive import hash_archive
+        status = 0
+        try:
+            for member in hash_archive(args.archive, args.algorithm, args.size, key, salt, person,
+                                       buffer_size=args.buffer_size, buffers=args.buffers):
+                if member.digest is None:
+                    print(f"Error: {member.name}: {member.error}", file=sys.stderr)
+                    status = 1
+                else:
+                    print(f"{member.digest}  {member.name}")
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        return status
+    
+    cache = None
     try:
-        # Create hasher and compute hash
-        if args.algorithm == 'blake2b':
-            hasher = BLAKE2b(digest_size=args.size, key=key, salt=salt, person=person)
-        else:
-            hasher = BLAKE2s(digest_size=args.size, key=key, salt=salt, person=person)
+        if args.cache and not args.no_cache and file_stat is not None:
+            cache = HashCache(args.cache)
+            params = params_fingerprint(args.size, key, salt, person)
         
-        hasher.update(data)
-        hash_result = hasher.hexdigest()
+        hash_result = None
+        if cache and not args.refresh:
+            hash_result = cache.lookup(file_stat, args.algorithm, params)
+        
+        if hash_result is None:
+            # Create hasher and compute hash
+            if args.algorithm == 'blake2b':
+                hasher = BLAKE2b(digest_size=args.size, key=key, salt=salt, person=person)
+            else:
+                hasher = BLAKE2s(digest_size=args.size, key=key, salt=salt, person=person)
+            
+            if data is None:
+                # Files are streamed in constant memory
+                file_stat = hash_file_stable(args.file, hasher, print_progress if args.progress else None,
+                                             args.buffers, args.buffer_size,
+                                             (lambda stats: print(format_pipeline_stats(stats), file=sys.stderr))
+                                             if args.io_stats else None)
+            else:
+                hasher.update(data)
+            hash_result = hasher.hexdigest()
+            
+            if cache and file_stat is not None:
+                cache.store(file_stat, args.algorithm, params, hash_result, args.file)
         
         # Display results
         print(f"\nAlgorithm: {args.algorithm.upper()}")
@@ -100,6 +282,17 @@ def main():
         
         print(f"\nHash: {hash_result}")
         
+        if args.known:
+            from blake2_known import KnownDigestIndex
+            with KnownDigestIndex(args.known) as index:
+                if args.algorithm != 'blake2b' or index.digest_size != args.size:
+                    print(f"Error: {args.known} holds {index.digest_size}-byte BLAKE2b digests")
+                    return 1
+                if not index.lookup(hash_result):
+                    print(f"\n✗ UNKNOWN: Digest not found in {args.known}")
+                    return 1
+                print(f"\n✓ KNOWN: Digest found in {args.known}")
+        
         # Verification if requested
         if args.verify:
             expected = args.verify.lower().replace(' ', '').replace(':', '')
@@ -119,6 +312,9 @@ def main():
     except Exception as e:
         print(f"Error: {e}")
         return 1
+    finally:
+        if cache:
+            cache.close()
 
 if __name__ == "__main__":
     exit(main())
@@ -0,0 +1,179 @@
+"""
+Thin Client for the BLAKE2 Hashing Daemon
+Sends open file descriptors to blake2_daemon.py over a Unix domain socket and
+falls back to hashing in-process when no daemon is running. Only the standard
+library is imported up front so that startup stays cheap.
+Usage: python blake2_client.py [options] FILE...
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+DEFAULT_SOCKET_PATH = os.environ.get('BLAKE2_DAEMON_SOCKET') or os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR') or '/tmp', f'blake2d-{os.getuid()}.sock'
+)
+
+# Largest request or response datagram
+MAX_MESSAGE = 65536
+
+
+class DaemonUnavailable(Exception):
+    """Raised when no daemon is listening on the socket"""
+
+
+class DaemonClient:
+    """
+    Connection to a running BLAKE2 daemon
+
+    One connection can carry any number of requests; requests on a single
+    connection are answered in order by the same worker.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+        """
+        Connect to the daemon
+
+        Raises:
+            DaemonUnavailable: if nothing is listening on socket_path
+        """
+        if not hasattr(socket, 'SOCK_SEQPACKET') or not hasattr(socket, 'send_fds'):
+            raise DaemonUnavailable("Unix SOCK_SEQPACKET sockets are not supported on this platform")
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            self.sock.close()
+            raise DaemonUnavailable(f"No daemon listening on {socket_path}") from e
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def request(self, message, fds=()):
+        """Send one JSON request (with optional file descriptors) and return the response"""
+        socket.send_fds(self.sock, [json.dumps(message).encode('utf-8')], list(fds))
+        response = self.sock.recv(MAX_MESSAGE)
+        if not response:
+            raise ConnectionError("Daemon closed the connection")
+        return json.loads(response)
+
+    def ping(self):
+        """Return the pid of the worker that answered"""
+        return self.request({'op': 'ping'})['pid']
+
+    def hash_file(self, path, algorithm='blake2b', digest_size=None, key=b"", salt=b"", person=b"",
+                  send_fd=True):
+        """
+        Hash a file in the daemon
+
+        Args:
+            path: File to hash
+            send_fd: Pass an open descriptor (works across mount namespaces and
+                for files the daemon could not open by name); otherwise send
+                the absolute path
+
+        Returns:
+            (hex digest, size in bytes)
+        """
+        message = {'op': 'hash', 'algorithm': algorithm, 'digest_size': digest_size,
+                   'key': key.hex(), 'salt': salt.hex(), 'person': person.hex()}
+        if send_fd:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                response = self.request(message, [fd])
+            finally:
+                os.close(fd)
+        else:
+            message['path'] = os.path.abspath(path)
+            response = self.request(message)
+        if not response.get('ok'):
+            raise OSError(response.get('error', 'Daemon request failed'))
+        return response['digest'], response['size']
+
+
+def hash_file_local(path, algorithm='blake2b', digest_size=None, key=b"", salt=b"", person=b""):
+    """In-process fallback with the same result shape as DaemonClient.hash_file"""
+    from blake2_implementation import BLAKE2b, BLAKE2s
+    from blake2_stream import hash_stream, fit_buffers, DEFAULT_CHUNK_SIZE
+
+    hasher_class = BLAKE2b if algorithm == 'blake2b' else BLAKE2s
+    hasher = hasher_class(digest_size or (64 if algorithm == 'blake2b' else 32), key, salt, person)
+    with open(path, 'rb') as f:
+        chunk_size, _ = fit_buffers(os.fstat(f.fileno()), DEFAULT_CHUNK_SIZE)
+        final = []
+        hash_stream(f, hasher, chunk_size, progress=final.append)
+    return hasher.hexdigest(), final[-1].bytes_hashed
+
+
+def hash_files(paths, algorithm='blake2b', digest_size=None, key=b"", salt=b"", person=b"",
+               socket_path=DEFAULT_SOCKET_PATH, fallback=True):
+    """
+    Hash files through the daemon, or in-process if it is not running
+
+    Yields:
+        (path, hex digest or None, size or error message) per path, in order
+    """
+    try:
+        client = DaemonClient(socket_path)
+    except DaemonUnavailable:
+        if not fallback:
+            raise
+        client = None
+
+    try:
+        for path in paths:
+            try:
+                if client is not None:
+                    digest, size = client.hash_file(path, algorithm, digest_size, key, salt, person)
+                else:
+                    digest, size = hash_file_local(path, algorithm, digest_size, key, salt, person)
+                yield path, digest, size
+            except (OSError, ValueError) as e:
+                yield path, None, str(e)
+    finally:
+        if client is not None:
+            client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hash files via the BLAKE2 daemon')
+    parser.add_argument('files', nargs='+', help='Files to hash')
+    parser.add_argument('-a', '--algorithm', choices=['blake2b', 'blake2s'], default='blake2b')
+    parser.add_argument('-s', '--size', type=int, help='Digest size in bytes')
+    parser.add_argument('-k', '--key', default='', help='Key for keyed hashing')
+    parser.add_argument('--salt', default='', help='Salt value')
+    parser.add_argument('--person', default='', help='Personalization string')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='Daemon socket path')
+    parser.add_argument('--no-fallback', action='store_true',
+                        help='Fail instead of hashing in-process when the daemon is not running')
+    args = parser.parse_args()
+
+    status = 0
+    try:
+        results = hash_files(args.files, args.algorithm, args.size, args.key.encode('utf-8'),
+                             args.salt.encode('utf-8'), args.person.encode('utf-8'),
+                             args.socket, not args.no_fallback)
+        for path, digest, detail in results:
+            if digest is None:
+                print(f"Error: {path}: {detail}", file=sys.stderr)
+                status = 1
+            else:
+                print(f"{digest}  {path}")
+    except DaemonUnavailable as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return status
+
+
+if __name__ == "__main__":
+    exit(main())
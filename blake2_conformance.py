@@ -0,0 +1,357 @@
+"""
+Differential Conformance Harness for the BLAKE2 Implementation
+Generates randomized cases and checks every entry point against hashlib.
+Usage: python blake2_conformance.py [--cases N] [--workers N] [--seed N]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from blake2_implementation import (
+    BLAKE2b, BLAKE2s, MacContext, blake2b, blake2s, blake2b_batch, blake2s_batch
+)
+
+
+LIMITS = {
+    # algorithm: (max digest size, max key, max salt, max person, block size)
+    'blake2b': (64, 64, 16, 16, 128),
+    'blake2s': (32, 32, 8, 8, 64),
+}
+
+TEXT_ALPHABET = (string.ascii_letters + string.digits).encode('ascii')
+
+
+def _random_bytes(rng, length, text):
+    """Random bytes, restricted to ASCII letters and digits when text is True"""
+    if text:
+        return bytes(rng.choice(TEXT_ALPHABET) for _ in range(length))
+    return rng.randbytes(length)
+
+
+def generate_case(rng, max_length=1024):
+    """
+    Generate one randomized test case
+
+    Roughly a quarter of the cases use ASCII-only data and parameters so that
+    they can also be fed through the text-based CLI and Flask entry points.
+
+    Returns:
+        Case dict with algorithm, data, digest_size, key, salt, person and
+        chunks (the sizes of successive update() calls)
+    """
+    algorithm = rng.choice(['blake2b', 'blake2s'])
+    max_digest, max_key, max_salt, max_person, block_size = LIMITS[algorithm]
+    text = rng.random() < 0.25
+
+    # Bias lengths towards block boundaries, where padding bugs live
+    if rng.random() < 0.3:
+        length = max(0, rng.randint(0, max_length // block_size) * block_size + rng.randint(-1, 1))
+    else:
+        length = rng.randint(0, max_length)
+
+    data = _random_bytes(rng, length, text)
+    chunks = []
+    remaining = length
+    while remaining:
+        size = rng.randint(1, remaining) if rng.random() < 0.5 else min(remaining, rng.choice([1, block_size, 4096]))
+        chunks.append(size)
+        remaining -= size
+
+    def optional_param(limit):
+        return _random_bytes(rng, rng.randint(1, limit), text) if rng.random() < 0.4 else b""
+
+    return {
+        'algorithm': algorithm,
+        'data': data,
+        'digest_size': rng.randint(1, max_digest),
+        'key': optional_param(max_key),
+        'salt': optional_param(max_salt),
+        'person': optional_param(max_person),
+        'chunks': chunks,
+    }
+
+
+def reference_digest(case):
+    """Compute the expected digest with hashlib"""
+    reference = hashlib.blake2b if case['algorithm'] == 'blake2b' else hashlib.blake2s
+    return reference(case['data'], digest_size=case['digest_size'], key=case['key'],
+                     salt=case['salt'], person=case['person']).digest()
+
+
+def _is_text_case(case):
+    """True if every byte field is plain ASCII usable on a command line or web form"""
+    fields = (case['data'], case['key'], case['salt'], case['person'])
+    return all(all(byte in TEXT_ALPHABET for byte in field) for field in fields)
+
+
+def _params(case):
+    return case['digest_size'], case['key'], case['salt'], case['person']
+
+
+def run_class(case):
+    """BLAKE2b/BLAKE2s classes fed in the case's update() chunks"""
+    hasher_class = BLAKE2b if case['algorithm'] == 'blake2b' else BLAKE2s
+    hasher = hasher_class(*_params(case))
+    view = memoryview(case['data'])
+    offset = 0
+    for size in case['chunks']:
+        hasher.update(bytes(view[offset:offset + size]))
+        offset += size
+    return hasher.digest()
+
+
+def run_copy(case):
+    """Hasher cloned with copy() halfway through the chunk sequence"""
+    hasher_class = BLAKE2b if case['algorithm'] == 'blake2b' else BLAKE2s
+    hasher = hasher_class(*_params(case))
+    middle = len(case['chunks']) // 2
+    offset = 0
+    for index, size in enumerate(case['chunks']):
+        if index == middle:
+            original = hasher
+            hasher = hasher.copy()
+            original.update(b"\xff")  # must not leak into the clone
+        hasher.update(case['data'][offset:offset + size])
+        offset += size
+    return hasher.digest()
+
+
+def run_function(case):
+    """blake2b()/blake2s() convenience functions"""
+    function = blake2b if case['algorithm'] == 'blake2b' else blake2s
+    return function(case['data'], *_params(case))
+
+
+def run_batch(case):
+    """blake2b_batch()/blake2s_batch() with the case surrounded by other messages"""
+    function = blake2b_batch if case['algorithm'] == 'blake2b' else blake2s_batch
+    return function([b"", case['data'], b"x" * 200], *_params(case))[1]
+
+
+def run_mac(case):
+    """MacContext for keyed cases"""
+    if not case['key']:
+        return None
+    context = MacContext(case['key'], case['algorithm'], case['digest_size'],
+                         case['salt'], case['person'])
+    return context.sign(case['data'])
+
+
+def run_cli(case):
+    """blake2_cli.main() on a temporary file, for ASCII-only cases"""
+    if not _is_text_case(case):
+        return None
+    import blake2_cli
+
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(case['data'])
+    argv = ['blake2_cli.py', '-f', f.name, '-a', case['algorithm'], '-s', str(case['digest_size'])]
+    for flag, value in (('-k', case['key']), ('--salt', case['salt']), ('--person', case['person'])):
+        if value:
+            argv += [flag, value.decode('ascii')]
+
+    output = io.StringIO()
+    saved_argv = sys.argv
+    try:
+        sys.argv = argv
+        with contextlib.redirect_stdout(output):
+            status = blake2_cli.main()
+    finally:
+        sys.argv = saved_argv
+        os.unlink(f.name)
+    if status != 0:
+        raise RuntimeError(f"CLI exited with status {status}: {output.getvalue().strip()}")
+    for line in output.getvalue().splitlines():
+        if line.startswith('Hash: '):
+            return bytes.fromhex(line[len('Hash: '):])
+    raise RuntimeError("CLI printed no hash")
+
+
+def run_flask(case):
+    """app.generate_blake2_hash for ASCII-only cases it can express (no person, fitting salt)"""
+    if not _is_text_case(case) or case['person']:
+        return None
+    try:
+        import app
+    except ImportError:
+        return None
+
+    hash_type = case['algorithm'] + ('_keyed' if case['key'] else '')
+    result = app.generate_blake2_hash(case['data'].decode('ascii'), hash_type, case['digest_size'],
+                                      case['key'].decode('ascii'), case['salt'].decode('ascii'))
+    return bytes.fromhex(result['hash'])
+
+
+ENTRY_POINTS = {
+    'class': run_class,
+    'copy': run_copy,
+    'function': run_function,
+    'batch': run_batch,
+    'mac': run_mac,
+    'cli': run_cli,
+    'flask': run_flask,
+}
+
+
+def check_case(case, entry_points):
+    """
+    Run a case through the given entry points
+
+    Returns:
+        List of (entry point, got, expected) for every mismatch or exception
+    """
+    expected = reference_digest(case)
+    mismatches = []
+    for name in entry_points:
+        try:
+            got = ENTRY_POINTS[name](case)
+        except Exception as e:
+            got = f"{type(e).__name__}: {e}"
+        if got is not None and got != expected:
+            mismatches.append((name, got, expected))
+    return mismatches
+
+
+def _run_chunk(seed, count, max_length, entry_points):
+    """Worker: generate and check count cases from one seed"""
+    rng = random.Random(seed)
+    failures = []
+    for _ in range(count):
+        case = generate_case(rng, max_length)
+        for name, got, expected in check_case(case, entry_points):
+            failures.append((case, name))
+    return count, failures
+
+
+def shrink_case(case, entry_point):
+    """
+    Greedily reduce a failing case while it keeps failing the same entry point
+
+    Tries, in order: fewer data bytes, a single update() chunk, shorter
+    key/salt/person and a smaller digest size.
+    """
+    def fails(candidate):
+        return any(name == entry_point for name, _, _ in check_case(candidate, [entry_point]))
+
+    def with_data(candidate, data):
+        return dict(candidate, data=data, chunks=[len(data)] if data else [])
+
+    best = case
+    if len(best['chunks']) > 1 and fails(with_data(best, best['data'])):
+        best = with_data(best, best['data'])
+
+    changed = True
+    while changed:
+        changed = False
+        candidates = []
+        data = best['data']
+        for cut in (len(data) // 2, 1):
+            if cut and len(data) >= cut:
+                candidates.append(with_data(best, data[:-cut]))
+                candidates.append(with_data(best, data[cut:]))
+        if data:
+            candidates.append(with_data(best, bytes(len(data))))
+        for field in ('key', 'salt', 'person'):
+            value = best[field]
+            if value:
+                candidates.append(dict(best, **{field: b""}))
+                candidates.append(dict(best, **{field: value[:len(value) // 2]}))
+        if best['digest_size'] > 1:
+            candidates.append(dict(best, digest_size=best['digest_size'] // 2))
+
+        for candidate in candidates:
+            if candidate != best and fails(candidate):
+                best = candidate
+                changed = True
+                break
+    return best
+
+
+def format_case(case):
+    """Render a case for a failure report"""
+    return (f"{case['algorithm']}(data={case['data'].hex() or '<empty>'} [{len(case['data'])} bytes], "
+            f"digest_size={case['digest_size']}, key={case['key'].hex()}, salt={case['salt'].hex()}, "
+            f"person={case['person'].hex()}, chunks={case['chunks']})")
+
+
+def run_harness(cases=100000, workers=None, seed=None, max_length=1024,
+                entry_points=None, chunk_size=500):
+    """
+    Run the differential harness across a process pool
+
+    Args:
+        cases: Total number of randomized cases (the budget)
+        workers: Worker processes (default: CPU count)
+        seed: Base seed for reproducible runs (default: random)
+        max_length: Maximum data length in bytes
+        entry_points: Names from ENTRY_POINTS to check (default: all)
+        chunk_size: Cases per worker task
+
+    Returns:
+        List of (shrunk case, entry point) for distinct failures
+    """
+    workers = workers or os.cpu_count() or 1
+    seed = random.SystemRandom().getrandbits(32) if seed is None else seed
+    entry_points = list(entry_points or ENTRY_POINTS)
+
+    print(f"Running {cases:,} cases on {workers} worker(s), seed {seed}")
+    print(f"Entry points: {', '.join(entry_points)}")
+
+    done = 0
+    failures = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = [pool.submit(_run_chunk, seed + index, min(chunk_size, cases - offset), max_length, entry_points)
+                 for index, offset in enumerate(range(0, cases, chunk_size))]
+        for task in tasks:
+            count, chunk_failures = task.result()
+            done += count
+            failures.extend(chunk_failures)
+    elapsed = time.perf_counter() - start
+    print(f"Checked {done:,} cases in {elapsed:.1f} s ({done / elapsed:,.0f} cases/s)")
+
+    shrunk = []
+    seen = set()
+    for case, name in failures:
+        if name in seen:
+            continue
+        seen.add(name)
+        shrunk.append((shrink_case(case, name), name))
+
+    if not failures:
+        print("All entry points match hashlib")
+    else:
+        print(f"{len(failures)} failing case(s); minimal example per entry point:")
+        for case, name in shrunk:
+            print(f"\n[{name}] {format_case(case)}")
+            for _, got, expected in check_case(case, [name]):
+                print(f"  expected: {expected.hex()}")
+                print(f"  got:      {got.hex() if isinstance(got, bytes) else got}")
+    return shrunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BLAKE2 differential conformance harness')
+    parser.add_argument('-n', '--cases', type=int, default=100000, help='Number of cases (default: 100000)')
+    parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, help='Base seed for a reproducible run')
+    parser.add_argument('--max-length', type=int, default=1024, help='Maximum data length (default: 1024)')
+    parser.add_argument('-e', '--entry-point', action='append', choices=sorted(ENTRY_POINTS),
+                       help='Entry point to check (repeatable, default: all)')
+    args = parser.parse_args()
+
+    failures = run_harness(args.cases, args.workers, args.seed, args.max_length, args.entry_point)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    exit(main())
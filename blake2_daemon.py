@@ -0,0 +1,238 @@
+"""
+Persistent BLAKE2 Hashing Daemon
+Keeps warmed-up BLAKE2b/BLAKE2s engines in a pool of pre-forked worker processes
+that accept requests on a Unix domain socket, removing interpreter startup and
+import cost from every hash. Clients pass open file descriptors (SCM_RIGHTS) or
+paths, so file data never crosses the socket. See blake2_client.py for the client.
+Usage: python blake2_daemon.py [--socket PATH] [--workers N]
+"""
+
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import stat
+import sys
+import time
+
+from blake2_implementation import BLAKE2b, BLAKE2s
+from blake2_stream import hash_stream, fit_buffers, DEFAULT_CHUNK_SIZE
+from blake2_client import DEFAULT_SOCKET_PATH, MAX_MESSAGE
+
+
+# Parameter combinations whose initial state is kept ready for copy()
+MAX_TEMPLATES = 64
+# Pause before replacing a worker that exited, so a crash loop cannot spin
+RESPAWN_DELAY = 0.5
+
+
+class EngineCache:
+    """
+    Initialized hashers keyed by their parameters
+
+    Each request copies a template instead of rebuilding the parameter block
+    (and, for keyed hashing, the key block) from scratch.
+    """
+
+    def __init__(self, limit=MAX_TEMPLATES):
+        self.limit = limit
+        self.templates = {}
+
+    def new_hasher(self, algorithm, digest_size, key, salt, person):
+        """Return a fresh hasher for the given parameters"""
+        params = (algorithm, digest_size, key, salt, person)
+        template = self.templates.get(params)
+        if template is None:
+            hasher_class = BLAKE2b if algorithm == 'blake2b' else BLAKE2s
+            template = hasher_class(digest_size, key, salt, person)
+            if len(self.templates) >= self.limit:
+                self.templates.pop(next(iter(self.templates)))
+            self.templates[params] = template
+        return template.copy()
+
+
+def handle_request(engines, request, fds):
+    """
+    Execute one request
+
+    Args:
+        engines: EngineCache of the worker
+        request: Decoded JSON request
+        fds: File descriptors received with the request (closed by the caller)
+
+    Returns:
+        JSON-serializable response dict
+    """
+    if not isinstance(request, dict):
+        return {'ok': False, 'error': 'Request must be a JSON object'}
+    op = request.get('op')
+    if op == 'ping':
+        return {'ok': True, 'pid': os.getpid()}
+    if op != 'hash':
+        return {'ok': False, 'error': f"Unknown operation '{op}'"}
+
+    algorithm = request.get('algorithm', 'blake2b')
+    if algorithm not in ('blake2b', 'blake2s'):
+        return {'ok': False, 'error': "Algorithm must be 'blake2b' or 'blake2s'"}
+    digest_size = request.get('digest_size') or (64 if algorithm == 'blake2b' else 32)
+    if not isinstance(digest_size, int) or isinstance(digest_size, bool):
+        return {'ok': False, 'error': 'digest_size must be an integer'}
+    params = {}
+    for name in ('key', 'salt', 'person'):
+        value = request.get(name, '')
+        if not isinstance(value, str):
+            return {'ok': False, 'error': f"{name} must be a hex string"}
+        params[name] = value
+    if 'path' in request and not isinstance(request['path'], str):
+        return {'ok': False, 'error': 'path must be a string'}
+    try:
+        hasher = engines.new_hasher(algorithm, digest_size,
+                                    bytes.fromhex(params['key']),
+                                    bytes.fromhex(params['salt']),
+                                    bytes.fromhex(params['person']))
+        if fds:
+            if stat.S_ISDIR(os.fstat(fds[0]).st_mode):
+                return {'ok': False, 'error': 'Is a directory'}
+            # Read through a duplicate so the caller can close the received fd
+            f = os.fdopen(os.dup(fds[0]), 'rb')
+        elif 'path' in request:
+            f = open(request['path'], 'rb')
+        else:
+            return {'ok': False, 'error': 'Request needs a file descriptor or a path'}
+        with f:
+            # Small files should not pay for a full-size read buffer
+            chunk_size, _ = fit_buffers(os.fstat(f.fileno()), DEFAULT_CHUNK_SIZE)
+            # Count the bytes while hashing: pipes and FIFOs cannot tell()
+            final = []
+            hash_stream(f, hasher, chunk_size, progress=final.append)
+        return {'ok': True, 'digest': hasher.hexdigest(), 'size': final[-1].bytes_hashed}
+    except (OSError, ValueError) as e:
+        return {'ok': False, 'error': str(e)}
+
+
+def serve_connection(conn, engines):
+    """Answer requests on one client connection until it closes"""
+    with conn:
+        while True:
+            try:
+                message, fds, _, _ = socket.recv_fds(conn, MAX_MESSAGE, 1)
+            except OSError:
+                return
+            if not message:
+                return
+            try:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    response = {'ok': False, 'error': 'Malformed request'}
+                else:
+                    response = handle_request(engines, request, fds)
+            except Exception as e:
+                # A bad request must never take the worker down with it
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            finally:
+                for fd in fds:
+                    os.close(fd)
+            try:
+                conn.sendall(json.dumps(response).encode('utf-8'))
+            except OSError:
+                return
+
+
+def worker_loop(listener):
+    """Worker process: accept connections on the shared listening socket forever"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    engines = EngineCache()
+    # Warm up the engines used by the defaults
+    engines.new_hasher('blake2b', 64, b"", b"", b"").update(b"warm-up")
+    engines.new_hasher('blake2s', 32, b"", b"", b"").update(b"warm-up")
+    while True:
+        try:
+            conn, _ = listener.accept()
+        except InterruptedError:
+            continue
+        serve_connection(conn, engines)
+
+
+def serve(socket_path=DEFAULT_SOCKET_PATH, workers=None):
+    """
+    Run the daemon in the foreground until SIGINT/SIGTERM
+
+    Args:
+        socket_path: Filesystem path of the Unix socket
+        workers: Number of pre-forked worker processes (default: CPU count)
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if os.path.exists(socket_path):
+        # Refuse to steal the socket of a live daemon; remove a stale one
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+        else:
+            probe.close()
+            raise RuntimeError(f"A daemon is already listening on {socket_path}")
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    old_umask = os.umask(0o177)  # socket usable by the owner only
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    listener.listen(128)
+
+    context = multiprocessing.get_context('fork')
+
+    def spawn():
+        process = context.Process(target=worker_loop, args=(listener,), daemon=True)
+        process.start()
+        return process
+
+    processes = [spawn() for _ in range(workers)]
+    print(f"BLAKE2 daemon listening on {socket_path} with {workers} worker(s)", flush=True)
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while True:
+            # Replace workers that died so the daemon keeps accepting requests
+            multiprocessing.connection.wait([process.sentinel for process in processes])
+            for number, process in enumerate(processes):
+                if not process.is_alive():
+                    print(f"Worker {process.pid} exited with code {process.exitcode}; restarting",
+                          file=sys.stderr, flush=True)
+                    time.sleep(RESPAWN_DELAY)
+                    processes[number] = spawn()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BLAKE2 hashing daemon')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH,
+                        help=f'Unix socket path (default: {DEFAULT_SOCKET_PATH})')
+    parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+    try:
+        return serve(args.socket, args.workers)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
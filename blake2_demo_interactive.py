@@ -5,9 +5,80 @@ This script provides step-by-step demonstrations of BLAKE2 operations
 for educational purposes - perfect for exams and presentations!
 """
 
-import sys
+import math
+import os
+import random
 import struct
-from blake2_implementation import BLAKE2b, BLAKE2s
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from blake2_implementation import BLAKE2b, BLAKE2s, blake2b_batch, blake2s_batch
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the statistics fall back to pure Python
+    np = None
+
+
+def _avalanche_worker(algorithm, message_size, digest_size, base_messages, seed):
+    """
+    Run single-bit-flip trials for a chunk of random base messages
+    
+    Every input bit of each base message is flipped once, so one chunk yields
+    base_messages * message_size * 8 trials.
+    
+    Returns:
+        (flip_matrix, distance_histogram) where flip_matrix[i][j] counts how
+        often flipping input bit i flipped output bit j, and
+        distance_histogram[d] counts trials with Hamming distance d
+    """
+    rng = random.Random(seed)
+    batch_hash = blake2b_batch if algorithm == 'blake2b' else blake2s_batch
+    input_bits = message_size * 8
+    output_bits = digest_size * 8
+    
+    messages = []
+    for _ in range(base_messages):
+        base = rng.randbytes(message_size)
+        messages.append(base)
+        for bit in range(input_bits):
+            flipped = bytearray(base)
+            flipped[bit // 8] ^= 1 << (bit % 8)
+            messages.append(bytes(flipped))
+    digests = batch_hash(messages, digest_size=digest_size)
+    
+    group = input_bits + 1
+    if np is not None:
+        raw = np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(base_messages, group, digest_size)
+        diff = raw[:, 1:, :] ^ raw[:, :1, :]
+        bits = np.unpackbits(diff, axis=2, bitorder='little')
+        flip_matrix = bits.sum(axis=0, dtype=np.int64)
+        distances = bits.sum(axis=2, dtype=np.int64).ravel()
+        histogram = np.bincount(distances, minlength=output_bits + 1)
+        return flip_matrix, histogram
+    
+    flip_matrix = [[0] * output_bits for _ in range(input_bits)]
+    histogram = [0] * (output_bits + 1)
+    for start in range(0, len(digests), group):
+        base_value = int.from_bytes(digests[start], 'little')
+        for bit in range(input_bits):
+            diff = base_value ^ int.from_bytes(digests[start + 1 + bit], 'little')
+            histogram[diff.bit_count()] += 1
+            row = flip_matrix[bit]
+            while diff:
+                low = diff & -diff
+                row[low.bit_length() - 1] += 1
+                diff ^= low
+    return flip_matrix, histogram
+
+
+def _chi_squared_p_value(chi2, dof):
+    """Upper-tail p-value of a chi-squared statistic (Wilson-Hilferty approximation)"""
+    if dof <= 0:
+        return 1.0
+    z = ((chi2 / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
 
 class BLAKE2Demo:
     """Interactive demonstration of BLAKE2 internals"""
@@ -289,6 +360,91 @@ class BLAKE2Demo:
         print(f"\nBit differences: {different_bits} out of {total_bits} ({percentage:.1f}%)")
         print("Good avalanche effect: ~50% of bits should change")
     
+    def demo_avalanche_statistics(self, trials=20000, algorithm='blake2b', message_size=8,
+                                  digest_size=32, workers=None):
+        """
+        Large-scale strict avalanche criterion test
+        
+        Runs single-bit-flip trials across a process pool and builds the
+        per-input-bit, per-output-bit flip probability matrix. An ideal hash
+        flips every output bit with probability 1/2, which is checked with
+        chi-squared tests on the matrix and on the Hamming distance histogram.
+        
+        Args:
+            trials: Approximate number of single-bit-flip trials
+            algorithm: 'blake2b' or 'blake2s'
+            message_size: Size of the random base messages in bytes
+            digest_size: Digest size in bytes
+            workers: Number of worker processes (default: CPU count)
+        """
+        self.print_section("AVALANCHE STATISTICS (STRICT AVALANCHE CRITERION)")
+        
+        input_bits = message_size * 8
+        output_bits = digest_size * 8
+        workers = workers or os.cpu_count() or 1
+        base_messages = max(1, -(-trials // input_bits))
+        chunk = max(1, -(-base_messages // (workers * 4)))
+        chunks = [min(chunk, base_messages - start) for start in range(0, base_messages, chunk)]
+        trials = base_messages * input_bits
+        
+        print(f"Algorithm: {algorithm.upper()}, message: {message_size} bytes, digest: {digest_size} bytes")
+        print(f"Trials: {trials:,} over {workers} worker process(es)"
+              f" ({'NumPy' if np is not None else 'pure Python'} bit counting)")
+        
+        seed = random.SystemRandom().getrandbits(64)
+        start = time.perf_counter()
+        flip_matrix = [[0] * output_bits for _ in range(input_bits)]
+        histogram = [0] * (output_bits + 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_avalanche_worker, algorithm, message_size, digest_size, count, seed + i)
+                       for i, count in enumerate(chunks)]
+            for future in futures:
+                chunk_matrix, chunk_histogram = future.result()
+                for i in range(input_bits):
+                    row = flip_matrix[i]
+                    for j, value in enumerate(chunk_matrix[i]):
+                        row[j] += int(value)
+                for d, value in enumerate(chunk_histogram):
+                    histogram[d] += int(value)
+        elapsed = time.perf_counter() - start
+        
+        # Each matrix cell is a binomial count over base_messages flips
+        expected = base_messages / 2
+        probabilities = [[count / base_messages for count in row] for row in flip_matrix]
+        matrix_chi2 = sum((count - expected) ** 2 / expected * 2
+                          for row in flip_matrix for count in row)
+        matrix_dof = input_bits * output_bits
+        worst = max(abs(p - 0.5) for row in probabilities for p in row)
+        
+        # Hamming distances should follow Binomial(output_bits, 1/2)
+        hist_chi2 = 0.0
+        hist_dof = -1
+        for d, observed in enumerate(histogram):
+            expected_count = trials * math.comb(output_bits, d) / 2 ** output_bits
+            if expected_count >= 5:
+                hist_chi2 += (observed - expected_count) ** 2 / expected_count
+                hist_dof += 1
+        mean_distance = sum(d * c for d, c in enumerate(histogram)) / trials
+        
+        print(f"\nMean Hamming distance: {mean_distance:.3f} of {output_bits} bits "
+              f"({mean_distance / output_bits * 100:.2f}%)")
+        print(f"Flip probability range: {min(map(min, probabilities)):.4f} - "
+              f"{max(map(max, probabilities)):.4f} (max deviation {worst:.4f})")
+        print(f"SAC matrix chi-squared:  {matrix_chi2:.1f} (dof {matrix_dof}, "
+              f"p = {_chi_squared_p_value(matrix_chi2, matrix_dof):.4f})")
+        print(f"Distance chi-squared:    {hist_chi2:.1f} (dof {hist_dof}, "
+              f"p = {_chi_squared_p_value(hist_chi2, hist_dof):.4f})")
+        print(f"\nThroughput: {trials / elapsed:,.0f} trials/second ({elapsed:.2f} s)")
+        print("p-values should be roughly uniform; values near 0 indicate bias")
+        
+        return {
+            'trials': trials,
+            'flip_probabilities': probabilities,
+            'matrix_chi2': matrix_chi2,
+            'distance_chi2': hist_chi2,
+            'trials_per_second': trials / elapsed,
+        }
+    
     def demo_variable_output_size(self):
         """Demonstrate variable output sizes"""
         self.print_section("VARIABLE OUTPUT SIZE DEMONSTRATION")
@@ -322,6 +478,7 @@ class BLAKE2Demo:
             ("Complete Hash Examples", self.demo_full_hash_example),
             ("Keyed Hashing (MAC)", self.demo_keyed_hashing),
             ("Avalanche Effect", self.demo_avalanche_effect),
+            ("Avalanche Statistics", self.demo_avalanche_statistics),
             ("Variable Output Size", self.demo_variable_output_size),
             ("Run All Demos", self.run_all_demos)
         ]
@@ -376,6 +533,14 @@ def main():
         # Auto-run all demos
         demo = BLAKE2Demo()
         demo.run_all_demos()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--avalanche-stats':
+        # Non-interactive statistical run:
+        # --avalanche-stats [TRIALS] [WORKERS] [blake2b|blake2s]
+        trials = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        algorithm = sys.argv[4] if len(sys.argv) > 4 else 'blake2b'
+        demo = BLAKE2Demo()
+        demo.demo_avalanche_statistics(trials=trials, algorithm=algorithm, workers=workers)
     else:
         # Interactive menu
         demo = BLAKE2Demo()
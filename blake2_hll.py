@@ -0,0 +1,340 @@
+"""
+Mergeable HyperLogLog Distinct Counting on Keyed BLAKE2b
+Estimates the number of distinct items in a stream with 2**precision small
+registers. Items are hashed in batches through MacContext (the key block is
+absorbed once per sketch), sketches with the same key and precision merge by
+taking register maxima, and serialize to a compact 6-bit packed form.
+
+Sketch format (little-endian):
+  - magic b"B2HLL", version byte, precision byte, 8-byte key fingerprint
+  - 2**precision registers of 6 bits, four registers per three bytes,
+    most significant bits first
+Usage: python blake2_hll.py {count,merge,estimate,evaluate} [options]
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+
+from blake2_implementation import MacContext
+from blake2_partition import encode_keys, key_batches, DEFAULT_BATCH_SIZE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+HLL_MAGIC = b"B2HLL"
+HLL_VERSION = 1
+HLL_PERSON = b"hll-v1"
+# Public default key: sketches built with it merge with anyone else's
+DEFAULT_KEY = b"blake2-hll-default-key"
+DEFAULT_PRECISION = 14
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+_HEADER_SIZE = len(HLL_MAGIC) + 2 + 8
+
+
+def _alpha(registers):
+    if registers == 16:
+        return 0.673
+    if registers == 32:
+        return 0.697
+    if registers == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / registers)
+
+
+def key_fingerprint(key):
+    """
+    8-byte fingerprint stored in sketches so that mismatched keys are refused on merge
+
+    It is a truncated MAC of a fixed label under the key, so the stored bytes
+    reveal only 64 bits about the key; a low-entropy key can still be guessed
+    from a sketch, so private sketches need a random key.
+    """
+    return MacContext(key).sign(b"hll-fingerprint")[:8]
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch with batched keyed BLAKE2b hashing
+
+    The standard error of count() is about 1.04 / sqrt(2**precision), e.g.
+    0.8% at the default precision of 14 (16 KiB of registers, 12 KiB
+    serialized).
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, key=DEFAULT_KEY, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            precision: log2 of the register count (4-18)
+            key: Hash key (1-64 bytes); only sketches with the same key merge.
+                A private key keeps adversaries from crafting inputs that
+                inflate or deflate the estimate.
+            batch_size: Items hashed per batch
+        """
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"Precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.precision = precision
+        self.batch_size = batch_size
+        self.fingerprint = key_fingerprint(key)
+        self._context = MacContext(key, 'blake2b', 8, person=HLL_PERSON)
+        size = 1 << precision
+        self.registers = np.zeros(size, dtype=np.uint8) if np is not None else bytearray(size)
+
+    def _hash64(self, encoded):
+        tags = self._context.sign_many(encoded)
+        if np is not None:
+            return np.frombuffer(b"".join(tags), dtype='<u8')
+        return [int.from_bytes(tag, 'little') for tag in tags]
+
+    def _add_hashes(self, values):
+        p = self.precision
+        width = 64 - p
+        if np is not None:
+            values = np.asarray(values, dtype=np.uint64)
+            index = (values >> np.uint64(width)).astype(np.intp)
+            rest = values & np.uint64((1 << width) - 1)
+            # Vectorized bit_length by binary search over the remaining bits
+            length = np.zeros(len(values), dtype=np.uint8)
+            for shift in (32, 16, 8, 4, 2, 1):
+                high = rest >= np.uint64(1 << shift)
+                rest[high] >>= np.uint64(shift)
+                length[high] += shift
+            length += (rest > 0).astype(np.uint8)
+            np.maximum.at(self.registers, index, (width + 1 - length).astype(np.uint8))
+            return
+        registers = self.registers
+        mask = (1 << width) - 1
+        for value in values:
+            index = value >> width
+            rank = width + 1 - (value & mask).bit_length()
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def add(self, item):
+        """Add one item (bytes, str or int)"""
+        self._add_hashes(self._hash64(encode_keys([item])))
+
+    def update(self, items):
+        """Add an iterable of items, hashing batch_size at a time"""
+        for batch in key_batches(items, self.batch_size):
+            self._add_hashes(self._hash64(encode_keys(batch)))
+
+    def count(self):
+        """Estimated number of distinct items added"""
+        registers = 1 << self.precision
+        if np is not None:
+            harmonic = float(np.ldexp(1.0, -self.registers.astype(np.int32)).sum())
+            zeros = int(np.count_nonzero(self.registers == 0))
+        else:
+            harmonic = sum(math.ldexp(1.0, -rank) for rank in self.registers)
+            zeros = self.registers.count(0)
+        estimate = _alpha(registers) * registers * registers / harmonic
+        if estimate <= 2.5 * registers and zeros:
+            # Linear counting is more accurate while many registers are empty
+            return round(registers * math.log(registers / zeros))
+        return round(estimate)
+
+    __len__ = count
+
+    def _check_compatible(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge precision {other.precision} into precision {self.precision}")
+        if other.fingerprint != self.fingerprint:
+            raise ValueError("Cannot merge sketches built with different keys")
+
+    def merge(self, other):
+        """Fold another sketch into this one (the union of both streams); returns self"""
+        self._check_compatible(other)
+        if np is not None:
+            np.maximum(self.registers, other.registers, out=self.registers)
+        else:
+            self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def copy(self):
+        clone = HyperLogLog.__new__(HyperLogLog)
+        clone.__dict__.update(self.__dict__)
+        clone.registers = self.registers.copy()
+        return clone
+
+    def __or__(self, other):
+        return self.copy().merge(other)
+
+    def __ior__(self, other):
+        return self.merge(other)
+
+    def to_bytes(self):
+        """Compact serialization (6 bits per register)"""
+        header = HLL_MAGIC + bytes([HLL_VERSION, self.precision]) + self.fingerprint
+        if np is not None:
+            groups = self.registers.reshape(-1, 4).astype(np.uint32)
+            packed = groups[:, 0] << 18 | groups[:, 1] << 12 | groups[:, 2] << 6 | groups[:, 3]
+            body = np.stack([packed >> 16, packed >> 8, packed], axis=1).astype(np.uint8).tobytes()
+            return header + body
+        body = bytearray()
+        registers = self.registers
+        for i in range(0, len(registers), 4):
+            packed = registers[i] << 18 | registers[i + 1] << 12 | registers[i + 2] << 6 | registers[i + 3]
+            body += packed.to_bytes(3, 'big')
+        return header + bytes(body)
+
+    @classmethod
+    def from_bytes(cls, data, key=DEFAULT_KEY):
+        """
+        Load a sketch written by to_bytes
+
+        Args:
+            data: Serialized sketch
+            key: Key the sketch was built with (needed to add more items)
+
+        Raises:
+            ValueError: if data is not a sketch or was built with another key
+        """
+        if len(data) < _HEADER_SIZE or data[:len(HLL_MAGIC)] != HLL_MAGIC:
+            raise ValueError("Not a HyperLogLog sketch")
+        version, precision = data[len(HLL_MAGIC)], data[len(HLL_MAGIC) + 1]
+        if version != HLL_VERSION:
+            raise ValueError(f"Unsupported sketch version {version}")
+        sketch = cls(precision, key)
+        if data[len(HLL_MAGIC) + 2:_HEADER_SIZE] != sketch.fingerprint:
+            raise ValueError("Sketch was built with a different key")
+        body = data[_HEADER_SIZE:]
+        if len(body) != (1 << precision) * 3 // 4:
+            raise ValueError("Truncated HyperLogLog sketch")
+        if np is not None:
+            raw = np.frombuffer(body, dtype=np.uint8).reshape(-1, 3).astype(np.uint32)
+            packed = raw[:, 0] << 16 | raw[:, 1] << 8 | raw[:, 2]
+            sketch.registers = np.stack([packed >> 18, packed >> 12, packed >> 6, packed],
+                                        axis=1).astype(np.uint8).ravel() & np.uint8(0x3f)
+        else:
+            registers = bytearray()
+            for i in range(0, len(body), 3):
+                packed = int.from_bytes(body[i:i + 3], 'big')
+                registers += bytes([packed >> 18, packed >> 12 & 0x3f, packed >> 6 & 0x3f, packed & 0x3f])
+            sketch.registers = registers
+        return sketch
+
+
+def union(sketches):
+    """New sketch for the union of several compatible sketches"""
+    sketches = iter(sketches)
+    try:
+        result = next(sketches).copy()
+    except StopIteration:
+        raise ValueError("union() needs at least one sketch") from None
+    for sketch in sketches:
+        result.merge(sketch)
+    return result
+
+
+def evaluate(cardinalities=(100, 1000, 10000), precision=12, shards=4, seed=1):
+    """
+    Measure estimate accuracy and hashing throughput
+
+    Each stream of distinct items (with every item repeated once) is split
+    round-robin over shards that are counted separately and merged.
+
+    Returns:
+        Dict with items_per_second, the standard error expected for the
+        precision and, per cardinality, the merged estimate and relative error
+    """
+    rng = random.Random(seed)
+    results = []
+    items_hashed = 0
+    elapsed = 0.0
+    for cardinality in cardinalities:
+        base = rng.getrandbits(48)
+        items = [f"user:{base + i}" for i in range(cardinality)] * 2
+        rng.shuffle(items)
+        parts = [HyperLogLog(precision) for _ in range(shards)]
+        start = time.perf_counter()
+        for number, part in enumerate(parts):
+            part.update(items[number::shards])
+        elapsed += time.perf_counter() - start
+        items_hashed += len(items)
+        estimate = union(parts).count()
+        results.append({'cardinality': cardinality, 'estimate': estimate,
+                        'relative_error': (estimate - cardinality) / cardinality})
+    return {
+        'items_per_second': items_hashed / elapsed if elapsed > 0 else float('inf'),
+        'expected_error': 1.04 / math.sqrt(1 << precision),
+        'results': results,
+    }
+
+
+def _read_sketch(path, key):
+    with open(path, 'rb') as f:
+        return HyperLogLog.from_bytes(f.read(), key)
+
+
+def _write_sketch(sketch, path):
+    with open(path, 'wb') as f:
+        f.write(sketch.to_bytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HyperLogLog distinct counting with keyed BLAKE2b')
+    parser.add_argument('-k', '--key', help='Hash key (UTF-8); sketches only merge under the same key')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    count_parser = subparsers.add_parser('count', help='Estimate distinct lines of files (or stdin)')
+    count_parser.add_argument('files', nargs='*')
+    count_parser.add_argument('-p', '--precision', type=int, default=DEFAULT_PRECISION,
+                              help=f'log2 of the register count (default: {DEFAULT_PRECISION})')
+    count_parser.add_argument('-o', '--output', help='Save the sketch here')
+    count_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Items per batch')
+
+    merge_parser = subparsers.add_parser('merge', help='Merge saved sketches')
+    merge_parser.add_argument('sketches', nargs='+')
+    merge_parser.add_argument('-o', '--output', help='Save the merged sketch here')
+
+    estimate_parser = subparsers.add_parser('estimate', help='Print the estimate of saved sketches')
+    estimate_parser.add_argument('sketches', nargs='+')
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='Measure accuracy and throughput')
+    evaluate_parser.add_argument('-p', '--precision', type=int, default=12)
+    evaluate_parser.add_argument('-n', '--cardinalities', type=int, nargs='+', default=[100, 1000, 10000])
+
+    args = parser.parse_args()
+    key = args.key.encode('utf-8') if args.key else DEFAULT_KEY
+
+    try:
+        if args.command == 'count':
+            sketch = HyperLogLog(args.precision, key, args.batch_size)
+            for path in args.files or [None]:
+                source = open(path, 'r', encoding='utf-8') if path else sys.stdin
+                with source:
+                    sketch.update(line.rstrip("\r\n") for line in source)
+            if args.output:
+                _write_sketch(sketch, args.output)
+            print(sketch.count())
+        elif args.command == 'merge':
+            merged = union(_read_sketch(path, key) for path in args.sketches)
+            if args.output:
+                _write_sketch(merged, args.output)
+            print(merged.count())
+        elif args.command == 'estimate':
+            for path in args.sketches:
+                print(f"{_read_sketch(path, key).count()}\t{path}")
+        else:
+            result = evaluate(args.cardinalities, args.precision)
+            print(f"HyperLogLog (precision {args.precision}, expected error "
+                  f"{result['expected_error']:.2%})")
+            print(f"  hashing: {result['items_per_second']:10.0f} items/s")
+            for row in result['results']:
+                print(f"  {row['cardinality']:>10}: estimate {row['estimate']:>10}  "
+                      f"error {row['relative_error']:+.2%}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
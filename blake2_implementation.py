@@ -4,13 +4,23 @@ This module implements both BLAKE2b and BLAKE2s hash functions without using ext
 Based on RFC 7693: The BLAKE2 Cryptographic Hash and Message Authentication Code (MAC)
 """
 
+import hmac
 import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
 
 
 class BLAKE2b:
     """
     BLAKE2b implementation optimized for 64-bit platforms
     Produces digests of any size between 1 and 64 bytes
+    
+    Thread safety: separate instances share no mutable state and can be used
+    from different threads freely. A single instance must only be used by one
+    thread at a time; overlapping update()/digest() calls raise RuntimeError
+    instead of silently corrupting the state. Use copy() to hand a snapshot of
+    the state to another thread.
     """
     
     # BLAKE2b initialization vectors (first 64 bits of fractional parts of sqrt of first 8 primes)
@@ -37,6 +47,11 @@ class BLAKE2b:
         [14, 10, 4, 8, 9, 15, 13, 6, 1, 12, 0, 2, 11, 7, 5, 3]
     ]
     
+    # The byte counter t is 128 bits wide (v[12] low word, v[13] high word)
+    MAX_INPUT = 2**128 - 1
+    
+    block_size = 128
+    
     def __init__(self, digest_size=64, key=b"", salt=b"", person=b""):
         """
         Initialize BLAKE2b hasher
@@ -63,6 +78,7 @@ class BLAKE2b:
         self.buffer = b""
         self.counter = 0
         self.finalized = False
+        self._guard = threading.Lock()
         
         # Initialize state
         self.h = list(self.IV)
@@ -75,10 +91,10 @@ class BLAKE2b:
             param_word = struct.unpack('<Q', param_block[i*8:(i+1)*8])[0]
             self.h[i] ^= param_word
             
-        # If keyed, process key as first block
+        # If keyed, the padded key is the first block; it stays buffered so that
+        # it becomes the final block when the message is empty
         if self.key:
-            key_block = self.key + b'\x00' * (128 - len(self.key))
-            self._compress(key_block, 128, False)
+            self.buffer = self.key + b'\x00' * (128 - len(self.key))
     
     def _create_parameter_block(self):
         """Create the 64-byte parameter block for BLAKE2b"""
@@ -167,20 +183,53 @@ class BLAKE2b:
     
     def update(self, data):
         """Add data to be hashed"""
+        if not self._guard.acquire(blocking=False):
+            raise RuntimeError(f"{type(self).__name__} instance used from several threads at once")
+        try:
+            self._update(data)
+        finally:
+            self._guard.release()
+    
+    def _update(self, data):
+        """Absorb data; the caller holds the usage guard"""
         if self.finalized:
             raise ValueError("Cannot update finalized hash")
             
-        self.buffer += data
+        # Blocks are compressed straight out of the caller's buffer, so memory
+        # use stays constant however much data is passed in one call
+        data = memoryview(data).cast('B')
+        if self.counter + len(self.buffer) + len(data) > self.MAX_INPUT:
+            raise OverflowError("BLAKE2b input must be less than 2**128 bytes")
         
-        # Process complete 128-byte blocks
-        while len(self.buffer) >= 128:
-            block = self.buffer[:128]
-            self.buffer = self.buffer[128:]
+        offset = 0
+        if self.buffer and len(self.buffer) + len(data) > 128:
+            # Complete the partially filled block first
+            offset = 128 - len(self.buffer)
+            block = self.buffer + bytes(data[:offset])
+            self.buffer = b""
             self.counter += 128
             self._compress(block, self.counter, False)
+        
+        # Process complete 128-byte blocks, always keeping the last block
+        # buffered because it has to be compressed with the final flag
+        while len(data) - offset > 128:
+            self.counter += 128
+            self._compress(data[offset:offset + 128], self.counter, False)
+            offset += 128
+        
+        self.buffer += bytes(data[offset:])
     
     def digest(self):
         """Get the final hash digest"""
+        if not self._guard.acquire(blocking=False):
+            raise RuntimeError(f"{type(self).__name__} instance used from several threads at once")
+        try:
+            return self._digest()
+        finally:
+            self._guard.release()
+    
+    def _digest(self):
+        """Finalize and return the digest; the caller holds the usage guard"""
         if self.finalized:
             return self._digest_value
             
@@ -203,12 +252,31 @@ class BLAKE2b:
     def hexdigest(self):
         """Get the final hash digest as hexadecimal string"""
         return self.digest().hex()
+    
+    def copy(self):
+        """Return an independent clone of the current hashing state"""
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.h = list(self.h)
+        clone._guard = threading.Lock()
+        return clone
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_guard']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._guard = threading.Lock()
 
 
 class BLAKE2s:
     """
     BLAKE2s implementation optimized for 8-32 bit platforms
     Produces digests of any size between 1 and 32 bytes
+    
+    Follows the same thread-safety rules as BLAKE2b.
     """
     
     # BLAKE2s initialization vectors (first 32 bits of fractional parts of sqrt of first 8 primes)
@@ -231,6 +299,11 @@ class BLAKE2s:
         [10, 2, 8, 4, 7, 6, 1, 5, 15, 11, 9, 14, 3, 12, 13, 0]
     ]
     
+    # The byte counter t is 64 bits wide (v[12] low word, v[13] high word)
+    MAX_INPUT = 2**64 - 1
+    
+    block_size = 64
+    
     def __init__(self, digest_size=32, key=b"", salt=b"", person=b""):
         """
         Initialize BLAKE2s hasher
@@ -257,6 +330,7 @@ class BLAKE2s:
         self.buffer = b""
         self.counter = 0
         self.finalized = False
+        self._guard = threading.Lock()
         
         # Initialize state
         self.h = list(self.IV)
@@ -269,10 +343,10 @@ class BLAKE2s:
             param_word = struct.unpack('<I', param_block[i*4:(i+1)*4])[0]
             self.h[i] ^= param_word
             
-        # If keyed, process key as first block
+        # If keyed, the padded key is the first block; it stays buffered so that
+        # it becomes the final block when the message is empty
         if self.key:
-            key_block = self.key + b'\x00' * (64 - len(self.key))
-            self._compress(key_block, 64, False)
+            self.buffer = self.key + b'\x00' * (64 - len(self.key))
     
     def _create_parameter_block(self):
         """Create the 32-byte parameter block for BLAKE2s"""
@@ -351,20 +425,53 @@ class BLAKE2s:
     
     def update(self, data):
         """Add data to be hashed"""
+        if not self._guard.acquire(blocking=False):
+            raise RuntimeError(f"{type(self).__name__} instance used from several threads at once")
+        try:
+            self._update(data)
+        finally:
+            self._guard.release()
+    
+    def _update(self, data):
+        """Absorb data; the caller holds the usage guard"""
         if self.finalized:
             raise ValueError("Cannot update finalized hash")
             
-        self.buffer += data
+        # Blocks are compressed straight out of the caller's buffer, so memory
+        # use stays constant however much data is passed in one call
+        data = memoryview(data).cast('B')
+        if self.counter + len(self.buffer) + len(data) > self.MAX_INPUT:
+            raise OverflowError("BLAKE2s input must be less than 2**64 bytes")
         
-        # Process complete 64-byte blocks
-        while len(self.buffer) >= 64:
-            block = self.buffer[:64]
-            self.buffer = self.buffer[64:]
+        offset = 0
+        if self.buffer and len(self.buffer) + len(data) > 64:
+            # Complete the partially filled block first
+            offset = 64 - len(self.buffer)
+            block = self.buffer + bytes(data[:offset])
+            self.buffer = b""
             self.counter += 64
             self._compress(block, self.counter, False)
+        
+        # Process complete 64-byte blocks, always keeping the last block
+        # buffered because it has to be compressed with the final flag
+        while len(data) - offset > 64:
+            self.counter += 64
+            self._compress(data[offset:offset + 64], self.counter, False)
+            offset += 64
+        
+        self.buffer += bytes(data[offset:])
     
     def digest(self):
         """Get the final hash digest"""
+        if not self._guard.acquire(blocking=False):
+            raise RuntimeError(f"{type(self).__name__} instance used from several threads at once")
+        try:
+            return self._digest()
+        finally:
+            self._guard.release()
+    
+    def _digest(self):
+        """Finalize and return the digest; the caller holds the usage guard"""
         if self.finalized:
             return self._digest_value
             
@@ -387,6 +494,23 @@ class BLAKE2s:
     def hexdigest(self):
         """Get the final hash digest as hexadecimal string"""
         return self.digest().hex()
+    
+    def copy(self):
+        """Return an independent clone of the current hashing state"""
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.h = list(self.h)
+        clone._guard = threading.Lock()
+        return clone
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_guard']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._guard = threading.Lock()
 
 
 def blake2b(data=b"", digest_size=64, key=b"", salt=b"", person=b""):
@@ -427,6 +551,432 @@ def blake2s(data=b"", digest_size=32, key=b"", salt=b"", person=b""):
     return hasher.digest()
 
 
+def _absorb_key(hasher):
+    """
+    Return a copy of a fresh keyed hasher with its key block already compressed
+    
+    Only valid for hashing non-empty messages: with an empty message the key
+    block must be compressed as the final block instead.
+    """
+    absorbed = hasher.copy()
+    block_size = len(absorbed.buffer)
+    absorbed._compress(absorbed.buffer, block_size, False)
+    absorbed.counter = block_size
+    absorbed.buffer = b""
+    return absorbed
+
+
+def _hash_batch(hasher_class, messages, digest_size, key, salt, person):
+    """Hash many messages from one precomputed initial state"""
+    initial = hasher_class(digest_size, key, salt, person)
+    absorbed = _absorb_key(initial) if key else initial
+    
+    digests = []
+    for message in messages:
+        hasher = (absorbed if len(message) else initial).copy()
+        hasher.update(message)
+        digests.append(hasher.digest())
+    return digests
+
+
+def blake2b_batch(messages, digest_size=64, key=b"", salt=b"", person=b""):
+    """
+    Hash a batch of messages with BLAKE2b using shared parameters
+    
+    The parameter block (and the key block, when keyed) is processed once
+    for the whole batch instead of once per message.
+    
+    Args:
+        messages: Iterable of messages to hash
+        digest_size: Output size in bytes (1-64)
+        key: Key for keyed hashing (max 64 bytes)
+        salt: Salt value (max 16 bytes)
+        person: Personalization string (max 16 bytes)
+    
+    Returns:
+        List of digests as bytes, in input order
+    """
+    return _hash_batch(BLAKE2b, messages, digest_size, key, salt, person)
+
+
+def blake2s_batch(messages, digest_size=32, key=b"", salt=b"", person=b""):
+    """
+    Hash a batch of messages with BLAKE2s using shared parameters
+    
+    Args:
+        messages: Iterable of messages to hash
+        digest_size: Output size in bytes (1-32)
+        key: Key for keyed hashing (max 32 bytes)
+        salt: Salt value (max 8 bytes)
+        person: Personalization string (max 8 bytes)
+    
+    Returns:
+        List of digests as bytes, in input order
+    """
+    return _hash_batch(BLAKE2s, messages, digest_size, key, salt, person)
+
+
+def _tuned_workers(name):
+    """Worker count from the host tuning profile, falling back to the CPU count"""
+    # Imported here because blake2_tune benchmarks this module
+    from blake2_tune import tuned
+    return tuned(name)
+
+
+class ThreadedHasher:
+    """
+    Thread pool for hashing many independent inputs
+    
+    Each input is hashed by a fresh hasher on a worker thread, so no hasher
+    instance is ever shared. On free-threaded CPython builds the workers run
+    in parallel on separate cores; with the GIL they are serialized but
+    still avoid process spawning and pickling.
+    """
+    
+    def __init__(self, algorithm='blake2b', workers=None, digest_size=None, key=b"", salt=b"", person=b""):
+        """
+        Initialize thread pool
+        
+        Args:
+            algorithm: 'blake2b' or 'blake2s'
+            workers: Number of threads (default: the tuning profile, see blake2_tune.py)
+            digest_size: Output size in bytes (defaults to the algorithm maximum)
+            key: Key for keyed hashing
+            salt: Salt value
+            person: Personalization string
+        """
+        if algorithm == 'blake2b':
+            hasher_class = BLAKE2b
+        elif algorithm == 'blake2s':
+            hasher_class = BLAKE2s
+        else:
+            raise ValueError("Algorithm must be 'blake2b' or 'blake2s'")
+        if digest_size is None:
+            digest_size = 64 if algorithm == 'blake2b' else 32
+        
+        self.algorithm = algorithm
+        self.workers = workers or _tuned_workers('thread_workers')
+        self._params = (hasher_class, digest_size, key, salt, person)
+        # Validate the parameters up front rather than on a worker thread
+        hasher_class(digest_size, key, salt, person)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='blake2')
+    
+    def submit(self, data):
+        """Hash one input in the background, returning a Future of the digest"""
+        hasher_class, digest_size, key, salt, person = self._params
+        return self._pool.submit(lambda: _hash_batch(hasher_class, [data], digest_size, key, salt, person)[0])
+    
+    def hash_many(self, messages, batch_size=64):
+        """
+        Hash many inputs across the pool
+        
+        Args:
+            messages: Sequence of inputs
+            batch_size: Inputs per task, amortizing scheduling overhead
+        
+        Returns:
+            List of digests as bytes, in input order
+        """
+        hasher_class, digest_size, key, salt, person = self._params
+        messages = list(messages)
+        futures = [
+            self._pool.submit(_hash_batch, hasher_class, messages[i:i + batch_size],
+                              digest_size, key, salt, person)
+            for i in range(0, len(messages), batch_size)
+        ]
+        digests = []
+        for future in futures:
+            digests.extend(future.result())
+        return digests
+    
+    def close(self):
+        """Shut the pool down, waiting for submitted work to finish"""
+        self._pool.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def hash_many_threaded(messages, algorithm='blake2b', workers=None, digest_size=None,
+                       key=b"", salt=b"", person=b""):
+    """
+    Hash many independent inputs on a temporary thread pool
+    
+    Args:
+        messages: Sequence of inputs
+        algorithm: 'blake2b' or 'blake2s'
+        workers: Number of threads (default: the tuning profile, see blake2_tune.py)
+        digest_size: Output size in bytes (defaults to the algorithm maximum)
+        key: Key for keyed hashing
+        salt: Salt value
+        person: Personalization string
+    
+    Returns:
+        List of digests as bytes, in input order
+    """
+    with ThreadedHasher(algorithm, workers, digest_size, key, salt, person) as pool:
+        return pool.hash_many(messages)
+
+
+def _hash_shared(name, offset, length, params):
+    """HashPool worker: hash a slice of a shared memory segment through a memoryview"""
+    algorithm, digest_size, key, salt, person = params
+    hasher_class = BLAKE2b if algorithm == 'blake2b' else BLAKE2s
+    # Pool workers share the parent's resource tracker, so attaching here
+    # does not hand the segment's cleanup to this process
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        view = segment.buf[offset:offset + length]
+        try:
+            hasher = hasher_class(digest_size, key, salt, person)
+            hasher.update(view)
+            return hasher.digest()
+        finally:
+            view.release()
+    finally:
+        segment.close()
+
+
+class HashPool:
+    """
+    Process pool that hashes in-memory buffers through shared memory
+    
+    Each submitted buffer is copied once into a multiprocessing.shared_memory
+    segment; workers hash it (or slices of it) through memoryviews, so the
+    data is never pickled. Segments are unlinked as soon as their last task
+    finishes, and submit() blocks while max_outstanding bytes are in flight.
+    """
+    
+    def __init__(self, algorithm='blake2b', workers=None, digest_size=None, key=b"", salt=b"", person=b"",
+                 max_outstanding=256 * 1024 * 1024):
+        """
+        Initialize process pool
+        
+        Args:
+            algorithm: 'blake2b' or 'blake2s'
+            workers: Number of processes (default: the tuning profile, see blake2_tune.py)
+            digest_size: Output size in bytes (defaults to the algorithm maximum)
+            key: Key for keyed hashing
+            salt: Salt value
+            person: Personalization string
+            max_outstanding: Bytes of shared memory allowed in flight; a
+                larger single buffer is still accepted when nothing else is
+        """
+        if algorithm == 'blake2b':
+            hasher_class = BLAKE2b
+        elif algorithm == 'blake2s':
+            hasher_class = BLAKE2s
+        else:
+            raise ValueError("Algorithm must be 'blake2b' or 'blake2s'")
+        if digest_size is None:
+            digest_size = 64 if algorithm == 'blake2b' else 32
+        # Validate the parameters up front rather than in a worker
+        hasher_class(digest_size, key, salt, person)
+        
+        self.algorithm = algorithm
+        self.workers = workers or _tuned_workers('process_workers')
+        self.max_outstanding = max_outstanding
+        self._params = (algorithm, digest_size, key, salt, person)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._budget = threading.Condition()
+        self._outstanding = 0
+        self._segments = {}
+        self._closed = False
+    
+    def _reserve(self, size):
+        with self._budget:
+            while self._outstanding and self._outstanding + size > self.max_outstanding:
+                self._budget.wait()
+            self._outstanding += size
+    
+    def _release(self, name, size):
+        """Drop one task's reference to a segment; unlink it after the last one"""
+        with self._budget:
+            entry = self._segments.get(name)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1]:
+                return
+            del self._segments[name]
+            self._outstanding -= size
+            self._budget.notify_all()
+        entry[0].close()
+        entry[0].unlink()
+    
+    def _share(self, data, tasks):
+        """Copy data into a new segment referenced by the given number of tasks"""
+        if self._closed:
+            raise RuntimeError("HashPool is closed")
+        view = memoryview(data).cast('B')
+        size = len(view)
+        self._reserve(size)
+        try:
+            # Zero-length segments are not allowed
+            segment = shared_memory.SharedMemory(create=True, size=max(1, size))
+        except BaseException:
+            with self._budget:
+                self._outstanding -= size
+                self._budget.notify_all()
+            raise
+        segment.buf[:size] = view
+        with self._budget:
+            self._segments[segment.name] = [segment, tasks]
+        return segment.name, size
+    
+    def _submit_slice(self, name, size, offset, length):
+        future = self._pool.submit(_hash_shared, name, offset, length, self._params)
+        future.add_done_callback(lambda _: self._release(name, size))
+        return future
+    
+    def submit(self, data):
+        """
+        Hash one buffer in a worker process
+        
+        Args:
+            data: bytes-like object (bytes, bytearray, memoryview, NumPy array)
+        
+        Returns:
+            Future resolving to the digest as bytes
+        """
+        name, size = self._share(data, 1)
+        return self._submit_slice(name, size, 0, size)
+    
+    def submit_slices(self, data, slice_size):
+        """
+        Hash consecutive slices of one buffer as independent messages
+        
+        The buffer is copied into shared memory once; every slice is hashed
+        by its own task.
+        
+        Args:
+            data: bytes-like object
+            slice_size: Bytes per slice (the last slice may be shorter)
+        
+        Returns:
+            List of futures, one digest per slice, in buffer order
+        """
+        if slice_size < 1:
+            raise ValueError("slice_size must be positive")
+        length = memoryview(data).nbytes
+        offsets = list(range(0, length, slice_size)) or [0]
+        name, size = self._share(data, len(offsets))
+        return [self._submit_slice(name, size, offset, min(slice_size, length - offset))
+                for offset in offsets]
+    
+    def hash_many(self, buffers):
+        """Hash many buffers, returning their digests in input order"""
+        return [future.result() for future in [self.submit(data) for data in buffers]]
+    
+    def close(self):
+        """Shut the pool down, waiting for submitted work and freeing all segments"""
+        self._closed = True
+        self._pool.shutdown(wait=True)
+        with self._budget:
+            leftover = list(self._segments.values())
+            self._segments.clear()
+            self._outstanding = 0
+        for segment, _ in leftover:
+            segment.close()
+            segment.unlink()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MacContext:
+    """
+    Keyed BLAKE2 MAC with the key block absorbed once
+    
+    The padded key block is compressed a single time when the context is
+    created; every message is then signed from a copy of that post-key state,
+    saving one compression per message compared to blake2b(data, key=key).
+    A context is never mutated after construction, so one instance can be
+    shared freely.
+    """
+    
+    def __init__(self, key, algorithm='blake2b', digest_size=None, salt=b"", person=b""):
+        """
+        Initialize MAC context
+        
+        Args:
+            key: Secret key (1-64 bytes for BLAKE2b, 1-32 bytes for BLAKE2s)
+            algorithm: 'blake2b' or 'blake2s'
+            digest_size: Tag size in bytes (defaults to the algorithm maximum)
+            salt: Salt value
+            person: Personalization string
+        """
+        if not key:
+            raise ValueError("MAC key must not be empty")
+        if algorithm == 'blake2b':
+            hasher_class = BLAKE2b
+        elif algorithm == 'blake2s':
+            hasher_class = BLAKE2s
+        else:
+            raise ValueError("Algorithm must be 'blake2b' or 'blake2s'")
+        if digest_size is None:
+            digest_size = 64 if algorithm == 'blake2b' else 32
+            
+        self.algorithm = algorithm
+        self.digest_size = digest_size
+        
+        # State before the key block is compressed, needed for empty messages
+        # where the key block itself is the final block
+        self._initial_state = hasher_class(digest_size, key, salt, person)
+        
+        # State after the key block is compressed as a non-final block
+        self._keyed_state = _absorb_key(self._initial_state)
+    
+    def sign(self, message):
+        """Compute the MAC tag of a message as bytes"""
+        if not len(message):
+            return self._initial_state.copy().digest()
+        hasher = self._keyed_state.copy()
+        hasher.update(message)
+        return hasher.digest()
+    
+    def hexsign(self, message):
+        """Compute the MAC tag of a message as a hexadecimal string"""
+        return self.sign(message).hex()
+    
+    def verify(self, message, tag):
+        """
+        Check a MAC tag in constant time
+        
+        Args:
+            message: Message that was signed
+            tag: Expected tag as bytes or hexadecimal string
+        
+        Returns:
+            True if the tag is valid
+        """
+        if isinstance(tag, str):
+            try:
+                tag = bytes.fromhex(tag)
+            except ValueError:
+                return False
+        return hmac.compare_digest(self.sign(message), tag)
+    
+    def sign_many(self, messages):
+        """Sign an iterable of messages, returning a list of tags in input order"""
+        return [self.sign(message) for message in messages]
+    
+    def verify_many(self, messages, tags):
+        """
+        Verify a batch of messages against their tags
+        
+        Returns:
+            List of booleans, one per (message, tag) pair
+        """
+        return [self.verify(message, tag) for message, tag in zip(messages, tags, strict=True)]
+
+
 # Test functions to verify implementation
 def test_blake2_implementation():
     """Test the BLAKE2 implementation with known test vectors"""
@@ -479,7 +1029,10 @@ def test_blake2_implementation():
     hasher_b3 = BLAKE2b(64, key=key)
     hasher_b3.update(b"The quick brown fox jumps over the lazy dog")
     result_b3 = hasher_b3.hexdigest()
-    print(f"BLAKE2b with key: {result_b3}")
+    expected_b3 = "52ffea3cc17dedf8f05dcdfee7cea1fe4c12eb5254d552ac19e0ca35184cf8ec47b2507df2dc516256263f7eb41dfb692e6e3155e45bc2c671a5d8fc2654601f"
+    print(f"BLAKE2b with key: {'PASS' if result_b3 == expected_b3 else 'FAIL'}")
+    print(f"Expected: {expected_b3}")
+    print(f"Got:      {result_b3}")
     print()
     
     # Test BLAKE2s with salt
@@ -487,8 +1040,17 @@ def test_blake2_implementation():
     hasher_s3 = BLAKE2s(32, salt=salt)
     hasher_s3.update(b"Hello, World!")
     result_s3 = hasher_s3.hexdigest()
-    print(f"BLAKE2s with salt: {result_s3}")
+    expected_s3 = "ba7f1744eb0b5ff34b6a56259c08417b7e786ea125acbbf6c7575c99030daeac"
+    print(f"BLAKE2s with salt: {'PASS' if result_s3 == expected_s3 else 'FAIL'}")
+    print(f"Expected: {expected_s3}")
+    print(f"Got:      {result_s3}")
+    
+    return all([
+        result_b == expected_b, result_s == expected_s,
+        result_b2 == expected_b2, result_s2 == expected_s2,
+        result_b3 == expected_b3, result_s3 == expected_s3,
+    ])
 
 
 if __name__ == "__main__":
-    test_blake2_implementation()
+    exit(0 if test_blake2_implementation() else 1)
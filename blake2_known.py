@@ -0,0 +1,325 @@
+"""
+Known-File Digest Index
+Builds a sorted, fixed-width, memory-mapped index of known-good BLAKE2b
+digests from manifests, with an optional fanout table that maps the leading
+digest bits straight to a bucket, and looks up single digests or large
+batches without loading the database into memory.
+Usage: python blake2_known.py {build,lookup,check} ...
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from blake2_stream import hash_file
+from blake2_manifest import parse_line, _external_sort, DEFAULT_DIGEST_SIZE, DEFAULT_RUN_SIZE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+KNOWN_MAGIC = b"B2KNOWN1"
+KNOWN_VERSION = 1
+# magic, version, digest size, fanout bits, record count
+HEADER = struct.Struct('<8sHHIQ')
+FANOUT = struct.Struct('<Q')
+DEFAULT_FANOUT_BITS = 16
+MAX_FANOUT_BITS = 24
+# Files hashed per batch lookup in check_files
+CHECK_BATCH = 1024
+
+
+def read_digests(path):
+    """
+    Yield digests from a manifest
+
+    Accepts blake2_manifest text manifests ("hex size path") as well as
+    b2sum-style lines ("hex  path") and bare hex digests, one per line.
+    """
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='\n') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip() or line.startswith('#'):
+                continue
+            try:
+                if line.count(' ') >= 2 and line.split(' ', 2)[1].isdigit():
+                    yield parse_line(line)[0]
+                else:
+                    yield bytes.fromhex(line.split()[0])
+            except ValueError:
+                raise ValueError(f"{path}:{number}: not a manifest line") from None
+
+
+def build_known_index(digests, index_path, digest_size=DEFAULT_DIGEST_SIZE, fanout_bits=DEFAULT_FANOUT_BITS,
+                      run_size=DEFAULT_RUN_SIZE):
+    """
+    Write a known-digest index
+
+    Digests are sorted externally (run_size at a time in memory) and
+    de-duplicated; the file is a header, the fanout table (2**fanout_bits + 1
+    cumulative counts, empty when fanout_bits is 0) and the sorted records.
+
+    Args:
+        digests: Iterable of digest bytes, all digest_size long
+        index_path: Output file
+        digest_size: Digest width in bytes
+        fanout_bits: Leading digest bits resolved through the fanout table
+        run_size: Digests sorted in memory at a time
+
+    Returns:
+        Number of distinct digests
+    """
+    if not 1 <= digest_size <= 64:
+        raise ValueError("Digest size must be between 1 and 64 bytes")
+    if not 0 <= fanout_bits <= min(MAX_FANOUT_BITS, digest_size * 8):
+        raise ValueError(f"Fanout bits must be between 0 and {min(MAX_FANOUT_BITS, digest_size * 8)}")
+
+    def checked():
+        for digest in digests:
+            if len(digest) != digest_size:
+                raise ValueError(f"Digest of {len(digest)} bytes in a {digest_size}-byte index")
+            yield digest
+
+    buckets = 1 << fanout_bits
+    counts = [0] * buckets if fanout_bits else []
+    prefix_bytes = (fanout_bits + 7) // 8
+    shift = prefix_bytes * 8 - fanout_bits
+    table_size = (buckets + 1) * FANOUT.size if fanout_bits else 0
+    directory = os.path.dirname(os.path.abspath(index_path))
+    count = 0
+    previous = None
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.known-', delete=False) as out:
+        try:
+            out.seek(HEADER.size + table_size)
+            for digest in _external_sort(checked(), run_size, directory):
+                if digest == previous:
+                    continue
+                previous = digest
+                out.write(digest)
+                if fanout_bits:
+                    counts[int.from_bytes(digest[:prefix_bytes], 'big') >> shift] += 1
+                count += 1
+            out.seek(0)
+            out.write(HEADER.pack(KNOWN_MAGIC, KNOWN_VERSION, digest_size, fanout_bits, count))
+            if fanout_bits:
+                total = 0
+                table = bytearray(table_size)
+                for bucket, bucket_count in enumerate(counts):
+                    FANOUT.pack_into(table, bucket * FANOUT.size, total)
+                    total += bucket_count
+                FANOUT.pack_into(table, buckets * FANOUT.size, total)
+                out.write(table)
+            out.flush()
+            os.fsync(out.fileno())
+        except BaseException:
+            os.unlink(out.name)
+            raise
+    os.replace(out.name, index_path)
+    return count
+
+
+class _Records:
+    """Sequence view of the sorted records, for bisect"""
+
+    def __init__(self, view, start, size, count):
+        self.view, self.start, self.size, self.count = view, start, size, count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        offset = self.start + number * self.size
+        return self.view[offset:offset + self.size]
+
+
+class KnownDigestIndex:
+    """Read-only, memory-mapped known-digest index"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError(f"{path}: not a known-digest index")
+            magic, version, self.digest_size, self.fanout_bits, self.count = HEADER.unpack(header)
+            if magic != KNOWN_MAGIC or version != KNOWN_VERSION:
+                raise ValueError(f"{path}: not a version {KNOWN_VERSION} known-digest index")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._prefix_bytes = (self.fanout_bits + 7) // 8
+        self._shift = self._prefix_bytes * 8 - self.fanout_bits
+        table_size = ((1 << self.fanout_bits) + 1) * FANOUT.size if self.fanout_bits else 0
+        self._start = HEADER.size + table_size
+        if len(self._map) != self._start + self.count * self.digest_size:
+            self._map.close()
+            raise ValueError(f"{path}: truncated known-digest index")
+        self._records = _Records(self._map, self._start, self.digest_size, self.count)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _check(self, digest):
+        if len(digest) != self.digest_size:
+            raise ValueError(f"Digest of {len(digest)} bytes for a {self.digest_size}-byte index")
+
+    def bucket(self, digest):
+        """(low, high) record range that can hold digest"""
+        if not self.fanout_bits:
+            return 0, self.count
+        prefix = int.from_bytes(digest[:self._prefix_bytes], 'big') >> self._shift
+        return struct.unpack_from('<QQ', self._map, HEADER.size + prefix * FANOUT.size)
+
+    def lookup(self, digest):
+        """True if digest (bytes or hex) is in the index"""
+        if isinstance(digest, str):
+            digest = bytes.fromhex(digest)
+        self._check(digest)
+        low, high = self.bucket(digest)
+        position = bisect.bisect_left(self._records, digest, low, high)
+        return position < high and self._records[position] == digest
+
+    __contains__ = lookup
+
+    def lookup_many(self, digests):
+        """
+        Batch lookup
+
+        With NumPy every query is located by one vectorized search over the
+        mapped records; otherwise queries are visited in sorted order so each
+        search starts where the previous one ended.
+
+        Args:
+            digests: Sequence of digests (bytes or hex)
+
+        Returns:
+            List of booleans in input order
+        """
+        queries = [bytes.fromhex(digest) if isinstance(digest, str) else bytes(digest) for digest in digests]
+        for query in queries:
+            self._check(query)
+        if not queries or not self.count:
+            return [False] * len(queries)
+
+        if np is not None:
+            records = np.frombuffer(self._map, dtype=f'S{self.digest_size}', count=self.count,
+                                    offset=self._start)
+            wanted = np.array(queries, dtype=f'S{self.digest_size}')
+            positions = np.searchsorted(records, wanted)
+            found = positions < self.count
+            found[found] = records[positions[found]] == wanted[found]
+            return found.tolist()
+
+        results = [False] * len(queries)
+        low = 0
+        for number in sorted(range(len(queries)), key=queries.__getitem__):
+            query = queries[number]
+            bucket_low, high = self.bucket(query)
+            low = bisect.bisect_left(self._records, query, max(low, bucket_low), high)
+            results[number] = low < high and self._records[low] == query
+        return results
+
+
+def check_files(paths, index, batch=CHECK_BATCH):
+    """
+    Hash files and look their digests up in one pass
+
+    Files are hashed with BLAKE2b at the index's digest size and looked up in
+    batches of batch files.
+
+    Yields:
+        (path, hex digest, known) in input order; digest and known are None
+        (and known the error message) for unreadable files
+    """
+    pending = []
+
+    def flush():
+        hashed = [item for item in pending if item[1] is not None]
+        known = iter(index.lookup_many([digest for _, digest, _ in hashed]))
+        for path, digest, error in pending:
+            yield (path, digest, next(known)) if digest is not None else (path, None, error)
+        pending.clear()
+
+    for path in paths:
+        try:
+            digest, _ = hash_file(path, 'blake2b', index.digest_size)
+            pending.append((path, digest, None))
+        except OSError as e:
+            pending.append((path, None, str(e)))
+        if len(pending) >= batch:
+            yield from flush()
+    yield from flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Known-file BLAKE2b digest index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build an index from manifests')
+    build_parser.add_argument('manifests', nargs='+', help='Text manifests, b2sum output or hex digest lists')
+    build_parser.add_argument('-o', '--output', required=True, help='Index file')
+    build_parser.add_argument('-s', '--size', type=int, default=DEFAULT_DIGEST_SIZE, help='Digest size in bytes')
+    build_parser.add_argument('--fanout-bits', type=int, default=DEFAULT_FANOUT_BITS,
+                              help=f'Prefix bits of the fanout table (0 disables it, default: {DEFAULT_FANOUT_BITS})')
+    build_parser.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                              help='Digests sorted in memory at a time')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Look up hex digests (or "-" to read them from stdin)')
+    lookup_parser.add_argument('index')
+    lookup_parser.add_argument('digests', nargs='+')
+
+    check_parser = subparsers.add_parser('check', help='Hash files and report whether each one is known')
+    check_parser.add_argument('index')
+    check_parser.add_argument('files', nargs='+')
+    check_parser.add_argument('--unknown', action='store_true', help='Only print unknown files')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            digests = (digest for manifest in args.manifests for digest in read_digests(manifest))
+            count = build_known_index(digests, args.output, args.size, args.fanout_bits, args.run_size)
+            print(f"Indexed {count} distinct digests into {args.output}")
+            return 0
+
+        with KnownDigestIndex(args.index) as index:
+            status = 0
+            if args.command == 'lookup':
+                if args.digests == ['-']:
+                    queries = [line.split()[0] for line in sys.stdin if line.strip()]
+                else:
+                    queries = args.digests
+                for digest, known in zip(queries, index.lookup_many(queries)):
+                    print(f"{'known  ' if known else 'unknown'}  {digest}")
+                    if not known:
+                        status = 1
+                return status
+
+            for path, digest, known in check_files(args.files, index):
+                if digest is None:
+                    print(f"Error: {path}: {known}", file=sys.stderr)
+                    status = 1
+                elif not known:
+                    print(f"✗ unknown  {digest}  {path}")
+                    status = 1
+                elif not args.unknown:
+                    print(f"✓ known    {digest}  {path}")
+            return status
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,480 @@
+"""
+Directory Manifests and Streaming Manifest Diffs
+A manifest lists the BLAKE2b digest and size of every file in a tree, as text
+("<hex digest> <size> <path>" per line) and as a sorted binary index that is
+read through mmap. Two indexes are diffed by merge-joins in bounded memory:
+by path for modified files, and by digest for added, removed and moved files.
+Usage: python blake2_manifest.py {create,index,diff} [options]
+"""
+
+import argparse
+import heapq
+import mmap
+import os
+import shutil
+import stat
+import struct
+import sys
+import tempfile
+from collections import namedtuple
+
+from blake2_implementation import BLAKE2b
+from blake2_cache import HashCache, DEFAULT_CACHE_PATH, params_fingerprint
+from blake2_stream import hash_file_stable
+
+
+DEFAULT_DIGEST_SIZE = 32
+DEFAULT_RUN_SIZE = 1000000
+INDEX_SUFFIX = '.idx'
+
+# Index layout (little-endian):
+#   header  magic, version, digest size, entry count, section offsets
+#   records one fixed-width record per entry, sorted by path bytes:
+#           string offset (Q), path length (I), file size (Q), digest
+#   order   entry numbers (Q) sorted by (digest, path)
+#   strings concatenated UTF-8 paths (surrogateescape for undecodable names)
+INDEX_MAGIC = b"B2MANIDX"
+INDEX_VERSION = 1
+HEADER = struct.Struct('<8sHHQQQQ')
+RECORD = struct.Struct('<QIQ')
+ORDER = struct.Struct('<Q')
+
+Change = namedtuple('Change', ['status', 'path', 'new_path'])
+
+
+def encode_path(path):
+    return path.encode('utf-8', 'surrogateescape')
+
+
+def decode_path(raw):
+    return raw.decode('utf-8', 'surrogateescape')
+
+
+def format_line(digest, size, path):
+    """Text manifest line; backslashes and newlines in the path are escaped"""
+    escaped = path.replace('\\', '\\\\').replace('\n', '\\n')
+    return f"{digest.hex()} {size} {escaped}\n"
+
+
+def parse_line(line):
+    """Inverse of format_line: returns (digest bytes, size, path)"""
+    digest, size, escaped = line.rstrip('\n').split(' ', 2)
+    path = []
+    chars = iter(escaped)
+    for char in chars:
+        if char == '\\':
+            char = '\n' if next(chars, '') == 'n' else '\\'
+        path.append(char)
+    return bytes.fromhex(digest), int(size), ''.join(path)
+
+
+def scan_tree(root, digest_size=DEFAULT_DIGEST_SIZE, cache=None):
+    """
+    Hash every regular file below root
+
+    Args:
+        root: Directory to scan; symbolic links are not followed
+        digest_size: BLAKE2b digest size in bytes
+        cache: Optional HashCache consulted before hashing
+
+    Yields:
+        (digest, size, relative path with '/' separators)
+    """
+    params = params_fingerprint(digest_size)
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(directory, name)
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            digest = cache.lookup(st, 'blake2b', params) if cache else None
+            if digest is None:
+                hasher = BLAKE2b(digest_size)
+                st = hash_file_stable(path, hasher)
+                if st is None:
+                    # Modified while being read: hash the settled contents once more
+                    hasher = BLAKE2b(digest_size)
+                    st = hash_file_stable(path, hasher) or os.stat(path)
+                digest = hasher.hexdigest()
+                if cache:
+                    cache.store(st, 'blake2b', params, digest, path)
+            yield bytes.fromhex(digest), st.st_size, relative
+
+
+def read_manifest(path):
+    """Yield (digest, size, path) from a text manifest"""
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='\n') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                yield parse_line(line)
+
+
+def _write_run(records, tmpdir):
+    """Write sorted, length-prefixed records to a temporary run file"""
+    records.sort()
+    run = tempfile.TemporaryFile(dir=tmpdir)
+    for record in records:
+        run.write(struct.pack('<I', len(record)))
+        run.write(record)
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    while True:
+        prefix = run.read(4)
+        if not prefix:
+            return
+        yield run.read(struct.unpack('<I', prefix)[0])
+
+
+def _external_sort(records, run_size, tmpdir):
+    """
+    Sort byte strings with at most run_size of them in memory
+
+    Yields:
+        The records in ascending byte order
+    """
+    runs = []
+    batch = []
+    try:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= run_size:
+                runs.append(_write_run(batch, tmpdir))
+                batch = []
+        if not runs:
+            batch.sort()
+            yield from batch
+            return
+        if batch:
+            runs.append(_write_run(batch, tmpdir))
+        yield from heapq.merge(*(_read_run(run) for run in runs))
+    finally:
+        for run in runs:
+            run.close()
+
+
+def build_index(entries, index_path, digest_size=DEFAULT_DIGEST_SIZE, run_size=DEFAULT_RUN_SIZE):
+    """
+    Write a binary index for manifest entries given in any order
+
+    Sorting is external (runs of run_size entries on disk), so memory stays
+    bounded for manifests with tens of millions of entries.
+
+    Args:
+        entries: Iterable of (digest, size, path)
+        index_path: Output file
+
+    Returns:
+        Number of entries
+
+    Raises:
+        ValueError: on a digest of the wrong size or a duplicate path
+    """
+    tmpdir = os.path.dirname(os.path.abspath(index_path))
+
+    def path_records():
+        # NUL cannot appear in a path and sorts first, so byte order of these
+        # records is byte order of the paths
+        for digest, size, path in entries:
+            if len(digest) != digest_size:
+                raise ValueError(f"Digest of {path!r} is {len(digest)} bytes, expected {digest_size}")
+            yield encode_path(path) + b"\0" + struct.pack('>Q', size) + digest
+
+    try:
+        count = _write_index(path_records(), index_path + '.tmp', digest_size, run_size, tmpdir)
+    except BaseException:
+        if os.path.exists(index_path + '.tmp'):
+            os.unlink(index_path + '.tmp')
+        raise
+    os.replace(index_path + '.tmp', index_path)
+    return count
+
+
+def _write_index(path_records, out_path, digest_size, run_size, tmpdir):
+    count = 0
+    strings_size = 0
+    previous = None
+    with open(out_path, 'w+b') as out, \
+            tempfile.TemporaryFile(dir=tmpdir) as strings, \
+            tempfile.TemporaryFile(dir=tmpdir) as digest_keys:
+        out.write(bytes(HEADER.size))
+        for record in _external_sort(path_records, run_size, tmpdir):
+            raw_path, rest = record.split(b"\0", 1)
+            if raw_path == previous:
+                raise ValueError(f"Duplicate path in manifest: {decode_path(raw_path)!r}")
+            previous = raw_path
+            size = struct.unpack('>Q', rest[:8])[0]
+            digest = rest[8:]
+            out.write(RECORD.pack(strings_size, len(raw_path), size) + digest)
+            strings.write(raw_path)
+            strings_size += len(raw_path)
+            # Entry numbers follow path order, so (digest, number) orders by (digest, path)
+            digest_keys.write(digest + struct.pack('>Q', count))
+            count += 1
+
+        order_offset = out.tell()
+        digest_keys.seek(0)
+        key_size = digest_size + 8
+        keys = iter(lambda: digest_keys.read(key_size), b"")
+        for key in _external_sort(keys, run_size, tmpdir):
+            out.write(ORDER.pack(struct.unpack('>Q', key[digest_size:])[0]))
+
+        strings_offset = out.tell()
+        strings.seek(0)
+        shutil.copyfileobj(strings, out)
+
+        out.seek(0)
+        out.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, digest_size, count,
+                              HEADER.size, order_offset, strings_offset))
+    return count
+
+
+class ManifestIndex:
+    """Read-only, memory-mapped view of a binary manifest index"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError(f"{path}: not a manifest index")
+            magic, version, self.digest_size, self.count, self._records, self._order, \
+                self._strings = HEADER.unpack(header)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ValueError(f"{path}: not a version {INDEX_VERSION} manifest index")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+        self._record_size = RECORD.size + self.digest_size
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def raw_path(self, number):
+        start = self._records + number * self._record_size
+        offset, length, _ = RECORD.unpack_from(self._map, start)
+        return self._map[self._strings + offset:self._strings + offset + length]
+
+    def entry(self, number):
+        """(raw path bytes, size, digest) of entry number, in path order"""
+        start = self._records + number * self._record_size
+        offset, length, size = RECORD.unpack_from(self._map, start)
+        digest = self._map[start + RECORD.size:start + self._record_size]
+        return self._map[self._strings + offset:self._strings + offset + length], size, digest
+
+    def __iter__(self):
+        for number in range(self.count):
+            yield self.entry(number)
+
+    def by_digest(self):
+        """Yield (digest, raw path) in (digest, path) order"""
+        for position in range(self.count):
+            number = ORDER.unpack_from(self._map, self._order + position * ORDER.size)[0]
+            raw_path, _, digest = self.entry(number)
+            yield digest, raw_path
+
+    def find(self, raw_path):
+        """Entry number of a path (bytes), or -1; binary search over the mapped records"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.raw_path(middle) < raw_path:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.raw_path(low) == raw_path:
+            return low
+        return -1
+
+
+def _digest_groups(index):
+    """Yield (digest, [raw paths]) for each distinct digest, in digest order"""
+    group_digest, paths = None, []
+    for digest, raw_path in index.by_digest():
+        if digest != group_digest and paths:
+            yield group_digest, paths
+            paths = []
+        group_digest = digest
+        paths.append(raw_path)
+    if paths:
+        yield group_digest, paths
+
+
+def diff_indexes(old, new):
+    """
+    Stream the differences between two manifest indexes
+
+    Memory is bounded by the largest group of files sharing one digest; both
+    indexes are only read sequentially apart from path lookups.
+
+    Args:
+        old, new: ManifestIndex instances with the same digest size
+
+    Yields:
+        Change(status, path, new_path) with status 'modified' (path changed
+        contents), 'moved' (path gone, same contents at new_path), 'removed'
+        or 'added' (the other path is None). Modified files come first in path
+        order, then moves, removals and additions in digest order.
+    """
+    if old.digest_size != new.digest_size:
+        raise ValueError(f"Digest sizes differ ({old.digest_size} vs {new.digest_size} bytes)")
+
+    # Merge-join by path: same path with a different digest
+    old_entries, new_entries = iter(old), iter(new)
+    old_entry, new_entry = next(old_entries, None), next(new_entries, None)
+    while old_entry is not None and new_entry is not None:
+        if old_entry[0] < new_entry[0]:
+            old_entry = next(old_entries, None)
+        elif old_entry[0] > new_entry[0]:
+            new_entry = next(new_entries, None)
+        else:
+            if old_entry[2] != new_entry[2]:
+                yield Change('modified', decode_path(old_entry[0]), decode_path(new_entry[0]))
+            old_entry, new_entry = next(old_entries, None), next(new_entries, None)
+
+    # Merge-join by digest: paths present on only one side, paired up as moves
+    old_groups, new_groups = _digest_groups(old), _digest_groups(new)
+    old_group, new_group = next(old_groups, None), next(new_groups, None)
+    while old_group is not None or new_group is not None:
+        if new_group is None or (old_group is not None and old_group[0] < new_group[0]):
+            gone = [path for path in old_group[1] if new.find(path) < 0]
+            arrived = []
+            old_group = next(old_groups, None)
+        elif old_group is None or new_group[0] < old_group[0]:
+            gone = []
+            arrived = [path for path in new_group[1] if old.find(path) < 0]
+            new_group = next(new_groups, None)
+        elif old_group[1] == new_group[1]:
+            # Unchanged files, the common case: no lookups needed
+            gone = arrived = []
+            old_group, new_group = next(old_groups, None), next(new_groups, None)
+        else:
+            gone = [path for path in old_group[1] if new.find(path) < 0]
+            arrived = [path for path in new_group[1] if old.find(path) < 0]
+            old_group, new_group = next(old_groups, None), next(new_groups, None)
+
+        for source, target in zip(gone, arrived):
+            yield Change('moved', decode_path(source), decode_path(target))
+        for source in gone[len(arrived):]:
+            yield Change('removed', decode_path(source), None)
+        for target in arrived[len(gone):]:
+            yield Change('added', None, decode_path(target))
+
+
+def index_manifest(manifest_path, index_path=None, run_size=DEFAULT_RUN_SIZE):
+    """
+    Build the binary index of a text manifest
+
+    The digest size is taken from the first entry.
+
+    Returns:
+        (index path, number of entries)
+    """
+    index_path = index_path or manifest_path + INDEX_SUFFIX
+    entries = read_manifest(manifest_path)
+    first = next(entries, None)
+    if first is None:
+        return index_path, build_index([], index_path, DEFAULT_DIGEST_SIZE, run_size)
+
+    def all_entries():
+        yield first
+        yield from entries
+
+    return index_path, build_index(all_entries(), index_path, len(first[0]), run_size)
+
+
+def open_index(path, run_size=DEFAULT_RUN_SIZE):
+    """Open an index, building PATH.idx from a text manifest first if it is missing or stale"""
+    with open(path, 'rb') as f:
+        if f.read(len(INDEX_MAGIC)) == INDEX_MAGIC:
+            return ManifestIndex(path)
+    index_path = path + INDEX_SUFFIX
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+        index_manifest(path, index_path, run_size)
+    return ManifestIndex(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BLAKE2b directory manifests and manifest diffs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = subparsers.add_parser('create', help='Hash a directory tree into a manifest')
+    create_parser.add_argument('directory')
+    create_parser.add_argument('-o', '--output', required=True, help='Text manifest (index: OUTPUT.idx)')
+    create_parser.add_argument('-s', '--size', type=int, default=DEFAULT_DIGEST_SIZE,
+                               help='Digest size in bytes')
+    create_parser.add_argument('--cache', nargs='?', const=os.environ.get('BLAKE2_CACHE', DEFAULT_CACHE_PATH),
+                               metavar='PATH', help='Reuse digests of unchanged files from the hash cache')
+
+    index_parser = subparsers.add_parser('index', help='Build the binary index of a text manifest')
+    index_parser.add_argument('manifest')
+    index_parser.add_argument('-o', '--output', help='Index file (default: MANIFEST.idx)')
+
+    diff_parser = subparsers.add_parser('diff', help='Compare two manifests (text or index)')
+    diff_parser.add_argument('old')
+    diff_parser.add_argument('new')
+    diff_parser.add_argument('--summary', action='store_true', help='Only print counts')
+
+    for sub in (index_parser, diff_parser):
+        sub.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                         help='Entries sorted in memory at a time while indexing')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'create':
+            if not 1 <= args.size <= 64:
+                print("Error: BLAKE2b digest size must be between 1 and 64 bytes")
+                return 1
+            cache = HashCache(args.cache) if args.cache else None
+            try:
+                with open(args.output, 'w', encoding='utf-8', errors='surrogateescape',
+                          newline='\n') as out:
+                    for digest, size, path in scan_tree(args.directory, args.size, cache):
+                        out.write(format_line(digest, size, path))
+            finally:
+                if cache:
+                    cache.close()
+            index_path, count = index_manifest(args.output)
+            print(f"Files:    {count}")
+            print(f"Manifest: {args.output}")
+            print(f"Index:    {index_path}")
+            return 0
+
+        if args.command == 'index':
+            output, count = index_manifest(args.manifest, args.output, args.run_size)
+            print(f"Indexed {count} entries into {output}")
+            return 0
+
+        counts = {'modified': 0, 'moved': 0, 'removed': 0, 'added': 0}
+        markers = {'modified': 'M', 'removed': 'D', 'added': 'A'}
+        with open_index(args.old, args.run_size) as old, open_index(args.new, args.run_size) as new:
+            for change in diff_indexes(old, new):
+                counts[change.status] += 1
+                if args.summary:
+                    continue
+                if change.status == 'moved':
+                    print(f"R {change.path} -> {change.new_path}")
+                else:
+                    print(f"{markers[change.status]} {change.path or change.new_path}")
+        print(', '.join(f"{count} {status}" for status, count in counts.items()),
+              file=sys.stdout if args.summary else sys.stderr)
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
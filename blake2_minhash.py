@@ -0,0 +1,421 @@
+"""
+MinHash / LSH Near-Duplicate Detection with BLAKE2b
+Documents are reduced to sets of character (or word) shingles. Each shingle is
+hashed once with salted BLAKE2b (the salt selects the hash family, person
+b"minhash-v1" separates it from other uses); permutation i maps that 64-bit
+value through a bijective mixer keyed by a per-permutation seed, itself drawn
+from salted BLAKE2b. An LSH banding index over the signatures retrieves
+candidate near-duplicates.
+Usage: python blake2_minhash.py {build,query,evaluate} [options]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import struct
+import sys
+import time
+
+from blake2_implementation import BLAKE2b
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MINHASH_PERSON = b"minhash-v1"
+SEED_PERSON = b"minhash-seeds-v1"
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_BATCH_DOCS = 64
+EMPTY_VALUE = (1 << 64) - 1   # signature value of a document without shingles
+
+_MASK64 = (1 << 64) - 1
+_MIX1 = 0xbf58476d1ce4e5b9
+_MIX2 = 0x94d049bb133111eb
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _mix64(value):
+    """splitmix64 finalizer: a bijection on 64-bit integers"""
+    value = ((value ^ (value >> 30)) * _MIX1) & _MASK64
+    value = ((value ^ (value >> 27)) * _MIX2) & _MASK64
+    return value ^ (value >> 31)
+
+
+class MinHasher:
+    """
+    MinHash signatures from salted BLAKE2b
+
+    A shingle's base value is 64-bit BLAKE2b(shingle, salt=LE64(seed),
+    person=b"minhash-v1"); permutation i is mix64(base XOR s_i), where s_i is
+    BLAKE2b(LE32(i), salt=LE64(seed), person=b"minhash-seeds-v1"). One
+    compression per shingle therefore serves all num_perm permutations.
+    """
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE, words=False, seed=0):
+        """
+        Args:
+            num_perm: Signature length
+            shingle_size: Characters (or words) per shingle
+            words: Shingle on words instead of characters
+            seed: Hash family; signatures are only comparable within one family
+        """
+        if num_perm < 1:
+            raise ValueError("num_perm must be positive")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.words = words
+        self.seed = seed
+        salt = struct.pack('<Q', seed)
+        self._template = BLAKE2b(8, salt=salt, person=MINHASH_PERSON)
+        seeds = []
+        for i in range(num_perm):
+            hasher = BLAKE2b(8, salt=salt, person=SEED_PERSON)
+            hasher.update(struct.pack('<I', i))
+            seeds.append(int.from_bytes(hasher.digest(), 'little'))
+        self._seeds = np.array(seeds, dtype=np.uint64) if np is not None else seeds
+
+    def shingles(self, text):
+        """Set of UTF-8 encoded shingles of a normalized (lowercased, whitespace-collapsed) text"""
+        text = _WHITESPACE.sub(' ', text.lower()).strip()
+        if self.words:
+            tokens = text.split(' ') if text else []
+            size = self.shingle_size
+            return {' '.join(tokens[i:i + size]).encode('utf-8')
+                    for i in range(max(1, len(tokens) - size + 1))} if tokens else set()
+        if len(text) <= self.shingle_size:
+            return {text.encode('utf-8')} if text else set()
+        return {text[i:i + self.shingle_size].encode('utf-8')
+                for i in range(len(text) - self.shingle_size + 1)}
+
+    def _base_values(self, shingles):
+        """One salted BLAKE2b value per shingle, from a copy of the initial state"""
+        digests = []
+        for shingle in shingles:
+            hasher = self._template.copy()
+            hasher.update(shingle)
+            digests.append(hasher.digest())
+        if np is not None:
+            return np.frombuffer(b"".join(digests), dtype='<u8')
+        return [int.from_bytes(digest, 'little') for digest in digests]
+
+    def _permuted(self, base):
+        """num_perm permuted values per shingle: a (shingles x num_perm) matrix"""
+        values = base[:, None] ^ self._seeds[None, :]
+        values ^= values >> np.uint64(30)
+        values *= np.uint64(_MIX1)
+        values ^= values >> np.uint64(27)
+        values *= np.uint64(_MIX2)
+        values ^= values >> np.uint64(31)
+        return values
+
+    def signatures(self, texts):
+        """
+        MinHash signatures of a batch of texts
+
+        All shingles of the batch are hashed together, then permuted and
+        reduced per document (with NumPy, by one minimum.reduceat per batch).
+
+        Returns:
+            List of signatures: NumPy uint64 arrays, or lists of ints without NumPy
+        """
+        shingle_sets = [sorted(self.shingles(text)) for text in texts]
+        flat = [shingle for shingles in shingle_sets for shingle in shingles]
+        base = self._base_values(flat)
+        empty = [EMPTY_VALUE] * self.num_perm
+
+        signatures = []
+        if np is not None:
+            counts = [len(shingles) for shingles in shingle_sets]
+            offsets = np.cumsum([0] + counts[:-1])
+            nonempty = [i for i, count in enumerate(counts) if count]
+            reduced = np.minimum.reduceat(self._permuted(base), offsets[nonempty], axis=0) if nonempty else []
+            rows = dict(zip(nonempty, reduced))
+            for i in range(len(texts)):
+                signatures.append(rows[i] if i in rows else np.array(empty, dtype=np.uint64))
+            return signatures
+
+        start = 0
+        for shingles in shingle_sets:
+            values = base[start:start + len(shingles)]
+            start += len(shingles)
+            if values:
+                signatures.append([min(_mix64(value ^ seed) for value in values) for seed in self._seeds])
+            else:
+                signatures.append(list(empty))
+        return signatures
+
+    def signature(self, text):
+        """MinHash signature of one text"""
+        return self.signatures([text])[0]
+
+
+def jaccard_estimate(signature_a, signature_b):
+    """Estimated Jaccard similarity: the fraction of equal signature positions"""
+    if np is not None:
+        return float(np.mean(np.asarray(signature_a) == np.asarray(signature_b)))
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / len(signature_a)
+
+
+def _signature_bytes(signature):
+    if np is not None:
+        return np.asarray(signature, dtype='<u8').tobytes()
+    return struct.pack(f'<{len(signature)}Q', *signature)
+
+
+def _signature_from_bytes(raw):
+    if np is not None:
+        return np.frombuffer(raw, dtype='<u8')
+    return list(struct.unpack(f'<{len(raw) // 8}Q', raw))
+
+
+class LSHIndex:
+    """
+    Banded LSH index over MinHash signatures
+
+    With b bands of r rows, two documents of Jaccard similarity s become
+    candidates with probability 1 - (1 - s**r)**b, a threshold near
+    (1/b)**(1/r).
+    """
+
+    def __init__(self, minhasher, bands=DEFAULT_BANDS):
+        if minhasher.num_perm % bands:
+            raise ValueError("num_perm must be divisible by the number of bands")
+        self.minhasher = minhasher
+        self.bands = bands
+        self.rows = minhasher.num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    @property
+    def threshold(self):
+        """Similarity at which the candidate probability is about one half"""
+        return (1.0 / self.bands) ** (1.0 / self.rows)
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        raw = _signature_bytes(signature)
+        width = self.rows * 8
+        return [raw[band * width:(band + 1) * width] for band in range(self.bands)]
+
+    def add(self, doc_id, signature):
+        """Index a signature under a document id"""
+        if doc_id in self._signatures:
+            raise ValueError(f"Document id already indexed: {doc_id!r}")
+        self._signatures[doc_id] = signature
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, []).append(doc_id)
+
+    def add_texts(self, documents, batch_size=DEFAULT_BATCH_DOCS):
+        """Index (doc_id, text) pairs, computing signatures in batches"""
+        batch = []
+        for item in documents:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                self._add_batch(batch)
+                batch = []
+        if batch:
+            self._add_batch(batch)
+
+    def _add_batch(self, batch):
+        for (doc_id, _), signature in zip(batch, self.minhasher.signatures([text for _, text in batch])):
+            self.add(doc_id, signature)
+
+    def candidates(self, signature):
+        """Ids sharing at least one band bucket with the signature"""
+        found = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            found.update(buckets.get(key, ()))
+        return found
+
+    def query(self, signature, threshold=None):
+        """
+        Near-duplicates of a signature
+
+        Args:
+            signature: MinHash signature from the index's MinHasher
+            threshold: Minimum estimated Jaccard similarity (default: none)
+
+        Returns:
+            List of (doc_id, estimated similarity), most similar first
+        """
+        results = []
+        for doc_id in self.candidates(signature):
+            similarity = jaccard_estimate(signature, self._signatures[doc_id])
+            if threshold is None or similarity >= threshold:
+                results.append((doc_id, similarity))
+        results.sort(key=lambda item: (-item[1], str(item[0])))
+        return results
+
+    def query_text(self, text, threshold=None):
+        return self.query(self.minhasher.signature(text), threshold)
+
+    def save(self, path):
+        """
+        Write the index: a JSON header line, then one "id<TAB>hex signature"
+        line per document; buckets are rebuilt on load
+        """
+        header = {'format': 'blake2-minhash-lsh', 'version': 1, 'num_perm': self.minhasher.num_perm,
+                  'bands': self.bands, 'shingle_size': self.minhasher.shingle_size,
+                  'words': self.minhasher.words, 'seed': self.minhasher.seed}
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header) + "\n")
+            for doc_id, signature in self._signatures.items():
+                f.write(f"{json.dumps(doc_id)}\t{_signature_bytes(signature).hex()}\n")
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('format') != 'blake2-minhash-lsh' or header.get('version') != 1:
+                raise ValueError(f"{path}: not a MinHash LSH index")
+            minhasher = MinHasher(header['num_perm'], header['shingle_size'], header['words'], header['seed'])
+            index = cls(minhasher, header['bands'])
+            for line in f:
+                doc_id, signature = line.rstrip("\n").split("\t")
+                index.add(json.loads(doc_id), _signature_from_bytes(bytes.fromhex(signature)))
+        return index
+
+
+def iter_documents(paths, lines=False):
+    """Yield (doc_id, text): whole files, or with lines=True every non-empty line as 'path:number'"""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            if not lines:
+                yield path, f.read()
+                continue
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield f"{path}:{number}", line
+
+
+def _mutate(rng, text, fraction):
+    """Replace a fraction of the words of text with random words"""
+    words = text.split()
+    for _ in range(int(len(words) * fraction)):
+        words[rng.randrange(len(words))] = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz')
+                                                   for _ in range(rng.randint(2, 8)))
+    return ' '.join(words)
+
+
+def evaluate(documents=300, duplicates=150, words=60, minhasher=None, bands=DEFAULT_BANDS,
+             threshold=0.5, seed=1):
+    """
+    Measure throughput and candidate recall/precision on a synthetic corpus
+
+    Random documents are indexed; queries are mutated copies of some of them
+    (and unrelated documents). Ground truth is the exact Jaccard similarity
+    of shingle sets against threshold.
+
+    Returns:
+        Dict with docs_per_second, recall, precision and the candidate counts
+    """
+    rng = random.Random(seed)
+    minhasher = minhasher or MinHasher()
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 8)))
+                  for _ in range(2000)]
+    corpus = [' '.join(rng.choice(vocabulary) for _ in range(words)) for _ in range(documents)]
+
+    index = LSHIndex(minhasher, bands)
+    start = time.perf_counter()
+    index.add_texts(enumerate(corpus))
+    elapsed = time.perf_counter() - start
+
+    queries = [_mutate(rng, corpus[rng.randrange(documents)], rng.uniform(0.0, 0.6))
+               for _ in range(duplicates)]
+    queries += [' '.join(rng.choice(vocabulary) for _ in range(words)) for _ in range(duplicates // 3)]
+    corpus_shingles = [minhasher.shingles(text) for text in corpus]
+
+    true_positives = false_positives = false_negatives = 0
+    for signature, text in zip(minhasher.signatures(queries), queries):
+        shingles = minhasher.shingles(text)
+        relevant = {i for i, other in enumerate(corpus_shingles)
+                    if len(shingles & other) / max(1, len(shingles | other)) >= threshold}
+        found = {doc_id for doc_id, _ in index.query(signature, threshold)}
+        true_positives += len(found & relevant)
+        false_positives += len(found - relevant)
+        false_negatives += len(relevant - found)
+
+    return {
+        'docs_per_second': documents / elapsed if elapsed > 0 else float('inf'),
+        'recall': true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 1.0,
+        'precision': true_positives / (true_positives + false_positives) if true_positives + false_positives else 1.0,
+        'true_positives': true_positives,
+        'false_positives': false_positives,
+        'false_negatives': false_negatives,
+        'lsh_threshold': index.threshold,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MinHash/LSH near-duplicate detection with BLAKE2b')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Index documents')
+    build_parser.add_argument('files', nargs='+')
+    build_parser.add_argument('-o', '--output', required=True, help='Index file')
+    build_parser.add_argument('--lines', action='store_true', help='Treat every line as a document')
+    build_parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM)
+    build_parser.add_argument('--bands', type=int, default=DEFAULT_BANDS)
+    build_parser.add_argument('--shingle-size', type=int, default=DEFAULT_SHINGLE_SIZE)
+    build_parser.add_argument('--words', action='store_true', help='Word shingles instead of characters')
+    build_parser.add_argument('--seed', type=int, default=0, help='Hash family')
+
+    query_parser = subparsers.add_parser('query', help='Find near-duplicates of documents')
+    query_parser.add_argument('index')
+    query_parser.add_argument('files', nargs='+')
+    query_parser.add_argument('--lines', action='store_true', help='Treat every line as a document')
+    query_parser.add_argument('-t', '--threshold', type=float, help='Minimum estimated similarity')
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='Measure throughput and recall/precision')
+    evaluate_parser.add_argument('-n', '--documents', type=int, default=300)
+    evaluate_parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM)
+    evaluate_parser.add_argument('--bands', type=int, default=DEFAULT_BANDS)
+    evaluate_parser.add_argument('-t', '--threshold', type=float, default=0.5)
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            index = LSHIndex(MinHasher(args.num_perm, args.shingle_size, args.words, args.seed), args.bands)
+            start = time.perf_counter()
+            index.add_texts(iter_documents(args.files, args.lines))
+            elapsed = time.perf_counter() - start
+            index.save(args.output)
+            print(f"Indexed {len(index)} document(s) in {elapsed:.2f} s "
+                  f"({len(index) / elapsed if elapsed > 0 else 0:.1f} docs/s)")
+            print(f"LSH threshold: ~{index.threshold:.2f} ({index.bands} bands x {index.rows} rows)")
+            return 0
+
+        if args.command == 'query':
+            index = LSHIndex.load(args.index)
+            for doc_id, text in iter_documents(args.files, args.lines):
+                matches = index.query_text(text, args.threshold)
+                print(f"{doc_id}: {len(matches)} match(es)")
+                for match_id, similarity in matches:
+                    print(f"  {similarity:.3f}  {match_id}")
+            return 0
+
+        result = evaluate(args.documents, minhasher=MinHasher(args.num_perm), bands=args.bands,
+                          threshold=args.threshold)
+        print(f"Indexing:  {result['docs_per_second']:.1f} docs/s")
+        print(f"LSH threshold: ~{result['lsh_threshold']:.2f}, similarity threshold {args.threshold}")
+        print(f"Recall:    {result['recall']:.3f} ({result['false_negatives']} missed)")
+        print(f"Precision: {result['precision']:.3f} ({result['false_positives']} false positives)")
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
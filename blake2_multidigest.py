@@ -0,0 +1,277 @@
+"""
+Single-Pass Multi-Digest Hashing
+Reads an input once and fans every chunk out to any number of BLAKE2b/BLAKE2s
+hashers (different sizes, keys, salts, personalizations), serially or on
+parallel threads or processes, returning all digests as one record.
+Digest specs look like "blake2b-512", "blake2s-256" or
+"blake2b-256:key=secret:name=mac" (sizes in bits).
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+from blake2_implementation import BLAKE2b, BLAKE2s
+from blake2_stream import hash_stream_readahead, fit_buffers, DEFAULT_CHUNK_SIZE, DEFAULT_READAHEAD_BUFFERS
+
+
+DigestSpec = namedtuple('DigestSpec', ['name', 'algorithm', 'digest_size', 'key', 'salt', 'person'])
+DigestSpec.__doc__ = """One configured digest: algorithm, size in bytes and BLAKE2 parameters"""
+
+MultiDigest = namedtuple('MultiDigest', ['bytes_hashed', 'elapsed', 'mode', 'digests'])
+MultiDigest.__doc__ = """Result of one pass: byte count, seconds, mode and {name: hex digest}"""
+
+MODES = ('serial', 'thread', 'process')
+
+
+def parse_spec(text):
+    """
+    Parse a digest spec: ALGORITHM[-BITS][:key=K][:salt=S][:person=P][:name=N]
+
+    Key, salt and personalization are UTF-8 strings. The default name is the
+    spec without its parameters, with '-keyed' appended for keyed specs, so
+    keys never appear in output.
+
+    Raises:
+        ValueError: for an unknown algorithm, size or option
+    """
+    head, *options = text.split(':')
+    algorithm, _, bits = head.partition('-')
+    algorithm = algorithm.lower()
+    if algorithm not in ('blake2b', 'blake2s'):
+        raise ValueError(f"Unknown algorithm in digest spec '{text}'")
+    maximum = 64 if algorithm == 'blake2b' else 32
+    if bits:
+        if not bits.isdigit() or int(bits) % 8 or not 8 <= int(bits) <= maximum * 8:
+            raise ValueError(f"Digest size in '{text}' must be a multiple of 8 bits up to {maximum * 8}")
+        digest_size = int(bits) // 8
+    else:
+        digest_size = maximum
+
+    params = {'key': b"", 'salt': b"", 'person': b""}
+    name = None
+    for option in options:
+        field, sep, value = option.partition('=')
+        if not sep or field not in ('key', 'salt', 'person', 'name'):
+            raise ValueError(f"Unknown option '{option}' in digest spec")
+        if field == 'name':
+            name = value
+        else:
+            params[field] = value.encode('utf-8')
+    if name is None:
+        name = f"{algorithm}-{digest_size * 8}" + ('-keyed' if params['key'] else '')
+    return DigestSpec(name, algorithm, digest_size, params['key'], params['salt'], params['person'])
+
+
+def new_hasher(spec):
+    hasher_class = BLAKE2b if spec.algorithm == 'blake2b' else BLAKE2s
+    return hasher_class(spec.digest_size, spec.key, spec.salt, spec.person)
+
+
+def _normalize_specs(specs):
+    specs = [parse_spec(spec) if isinstance(spec, str) else spec for spec in specs]
+    if not specs:
+        raise ValueError("At least one digest spec is required")
+    names = [spec.name for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError("Digest names must be unique (use :name=...)")
+    for spec in specs:
+        new_hasher(spec)  # validate parameters before any work starts
+    return specs
+
+
+class _FanOut:
+    """update() target that feeds one chunk to several hashers"""
+
+    def __init__(self, hashers):
+        self.hashers = hashers
+        self.block_size = hashers[0].block_size
+
+    def update(self, data):
+        for hasher in self.hashers:
+            hasher.update(data)
+
+
+def _lane_worker(specs, inbox, acks, results, lane, slot_size, ring=None, ring_name=None):
+    """
+    Thread or process lane: hash every announced ring slot with its hashers
+
+    A lane acknowledges each slot even after an error, so the reader never
+    waits forever; the error is reported with the results.
+    """
+    segment = None
+    if ring_name is not None:
+        segment = shared_memory.SharedMemory(name=ring_name)
+        ring = segment.buf
+    error = None
+    try:
+        hashers = [new_hasher(spec) for spec in specs]
+        while True:
+            message = inbox.get()
+            if message is None:
+                break
+            slot, count = message
+            if error is None:
+                view = ring[slot * slot_size:slot * slot_size + count]
+                try:
+                    for hasher in hashers:
+                        hasher.update(view)
+                except Exception as e:
+                    error = str(e)
+                finally:
+                    view.release()
+            acks.put(slot)
+        digests = None if error else [hasher.hexdigest() for hasher in hashers]
+        results.put((lane, digests, error))
+    finally:
+        if segment is not None:
+            ring = None
+            segment.close()
+
+
+def _parallel_pass(stream, specs, mode, workers, buffer_size, buffers):
+    """Read stream once into a ring shared with the lanes; returns (byte count, {name: hex})"""
+    lanes = [specs[i::workers] for i in range(workers)]
+    buffers = max(2, buffers)
+
+    if mode == 'thread':
+        storage = bytearray(buffer_size * buffers)
+        ring = memoryview(storage)
+        segment = None
+        make_queue = queue.Queue
+        start_lane = lambda args: threading.Thread(target=_lane_worker, args=args, kwargs={'ring': ring},
+                                                   daemon=True)
+    else:
+        segment = shared_memory.SharedMemory(create=True, size=buffer_size * buffers)
+        ring = segment.buf
+        context = multiprocessing.get_context()
+        make_queue = context.Queue
+        start_lane = lambda args: context.Process(target=_lane_worker, args=args,
+                                                  kwargs={'ring_name': segment.name}, daemon=True)
+
+    inboxes = [make_queue() for _ in lanes]
+    acks = make_queue()
+    results = make_queue()
+    workers_started = []
+    readinto = getattr(stream, 'readinto', None)
+    try:
+        for lane, lane_specs in enumerate(lanes):
+            worker = start_lane((lane_specs, inboxes[lane], acks, results, lane, buffer_size))
+            worker.start()
+            workers_started.append(worker)
+
+        free = list(range(buffers))
+        pending = [0] * buffers
+        total = 0
+        while True:
+            while not free:
+                slot = acks.get()
+                pending[slot] -= 1
+                if not pending[slot]:
+                    free.append(slot)
+            slot = free.pop()
+            target = ring[slot * buffer_size:(slot + 1) * buffer_size]
+            try:
+                if readinto is not None:
+                    count = readinto(target)
+                else:
+                    chunk = stream.read(buffer_size)
+                    count = len(chunk)
+                    target[:count] = chunk
+            finally:
+                target.release()
+            if not count:
+                break
+            total += count
+            pending[slot] = len(lanes)
+            for inbox in inboxes:
+                inbox.put((slot, count))
+
+        for inbox in inboxes:
+            inbox.put(None)
+        collected = {}
+        errors = []
+        for _ in lanes:
+            lane, digests, error = results.get()
+            if error:
+                errors.append(error)
+            else:
+                collected.update(zip((spec.name for spec in lanes[lane]), digests))
+        if errors:
+            raise ValueError(f"Hashing failed: {errors[0]}")
+        return total, {spec.name: collected[spec.name] for spec in specs}
+    finally:
+        for inbox in inboxes:
+            inbox.put(None)
+        for worker in workers_started:
+            worker.join()
+        ring.release()
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+
+
+def multi_digest_stream(stream, specs, mode='serial', workers=None, buffer_size=DEFAULT_CHUNK_SIZE,
+                        buffers=DEFAULT_READAHEAD_BUFFERS):
+    """
+    Compute several digests of a stream in a single read
+
+    Args:
+        stream: Binary file-like object supporting readinto() or read()
+        specs: Digest specs (strings for parse_spec, or DigestSpec)
+        mode: 'serial' (one thread feeds every hasher, reads run ahead on a
+            background thread), 'thread' or 'process' (hashers are spread
+            over parallel lanes that read each chunk from a shared ring)
+        workers: Parallel lanes (default: one per digest, capped at the CPU
+            count for processes)
+        buffer_size: Bytes per chunk
+        buffers: Chunks in the ring
+
+    Returns:
+        MultiDigest record
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    specs = _normalize_specs(specs)
+    start = time.perf_counter()
+
+    if mode == 'serial':
+        hashers = [new_hasher(spec) for spec in specs]
+        _, stats = hash_stream_readahead(stream, _FanOut(hashers), buffer_size, buffers)
+        total = stats.bytes_hashed
+        digests = {spec.name: hasher.hexdigest() for spec, hasher in zip(specs, hashers)}
+    else:
+        limit = len(specs) if mode == 'thread' else min(len(specs), os.cpu_count() or 1)
+        workers = max(1, min(workers or limit, len(specs)))
+        total, digests = _parallel_pass(stream, specs, mode, workers, buffer_size, buffers)
+
+    return MultiDigest(total, time.perf_counter() - start, mode, digests)
+
+
+def multi_digest_file(path, specs, mode='serial', workers=None, buffer_size=DEFAULT_CHUNK_SIZE,
+                      buffers=DEFAULT_READAHEAD_BUFFERS):
+    """multi_digest_stream over a file; see there"""
+    with open(path, 'rb', buffering=0) as f:
+        # Small files should not pay for full-size buffers or a reader thread
+        buffer_size, buffers = fit_buffers(os.fstat(f.fileno()), buffer_size, buffers)
+        return multi_digest_stream(f, specs, mode, workers, buffer_size, buffers)
+
+
+def multi_digest_bytes(data, specs):
+    """All digests of an in-memory input, as {name: hex digest}"""
+    specs = _normalize_specs(specs)
+    hashers = [new_hasher(spec) for spec in specs]
+    _FanOut(hashers).update(data)
+    return {spec.name: hasher.hexdigest() for spec, hasher in zip(specs, hashers)}
+
+
+def record_to_json(record, source=None):
+    """JSON form of a MultiDigest record"""
+    document = {'source': source} if source is not None else {}
+    document.update(record._asdict())
+    return json.dumps(document, indent=2)
@@ -0,0 +1,241 @@
+"""
+Per-Record Integrity Hashing for Line-Delimited Files
+Streams a JSONL (or any line-delimited) file and computes a keyed BLAKE2b tag for
+every record on a worker pool, keeping output in line order. A running digest
+over all tags gives one value that vouches for the whole file.
+Usage: python blake2_records.py {sign,verify} [options]
+"""
+
+import argparse
+import hmac
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from blake2_implementation import BLAKE2b, MacContext
+
+
+DEFAULT_TAG_SIZE = 32
+DEFAULT_BATCH_LINES = 2000
+
+# Personalization of the running digest, separating it from per-record tags
+CHAIN_PERSON = b"records-digest"
+
+_worker_context = None
+
+
+def _init_worker(key, digest_size):
+    """Pool initializer: absorb the key once per worker process"""
+    global _worker_context
+    _worker_context = MacContext(key, 'blake2b', digest_size)
+
+
+def _sign_batch(records):
+    """Worker: tag a batch of records with the per-process MacContext"""
+    return _worker_context.sign_many(records)
+
+
+def _record(line):
+    """Strip the line terminator; the record itself is hashed byte for byte"""
+    if line.endswith(b"\n"):
+        line = line[:-1]
+        if line.endswith(b"\r"):
+            line = line[:-1]
+    return line
+
+
+def _read_batches(stream, batch_lines):
+    """Yield lists of records, batch_lines at a time, without reading the whole stream"""
+    batch = []
+    for line in stream:
+        batch.append(_record(line))
+        if len(batch) >= batch_lines:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def running_digest_hasher(key, digest_size=DEFAULT_TAG_SIZE):
+    """Hasher for the running digest: keyed BLAKE2b over all tags in line order"""
+    return BLAKE2b(digest_size, key=key, person=CHAIN_PERSON)
+
+
+def iter_record_tags(stream, key, digest_size=DEFAULT_TAG_SIZE, workers=None,
+                     batch_lines=DEFAULT_BATCH_LINES):
+    """
+    Tag every record of a binary line stream
+
+    Batches are hashed on a process pool; at most 2 * workers batches are in
+    flight, so memory stays bounded however large the file is.
+
+    Args:
+        stream: Binary file object yielding lines
+        key: MAC key (1-64 bytes)
+        digest_size: Tag size in bytes
+        workers: Worker processes (default: CPU count; 1 hashes in-process)
+        batch_lines: Records per worker task
+
+    Yields:
+        (line_number, tag) in line order, line numbers starting at 1
+    """
+    workers = workers or os.cpu_count() or 1
+    line_number = 0
+
+    if workers == 1:
+        context = MacContext(key, 'blake2b', digest_size)
+        for batch in _read_batches(stream, batch_lines):
+            for tag in context.sign_many(batch):
+                line_number += 1
+                yield line_number, tag
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(key, digest_size)) as pool:
+        pending = deque()
+        batches = _read_batches(stream, batch_lines)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * workers:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                else:
+                    pending.append(pool.submit(_sign_batch, batch))
+            if pending:
+                for tag in pending.popleft().result():
+                    line_number += 1
+                    yield line_number, tag
+
+
+def sign_records(path, tags_path, key, digest_size=DEFAULT_TAG_SIZE, workers=None,
+                 batch_lines=DEFAULT_BATCH_LINES):
+    """
+    Write one hex tag per record of path to tags_path
+
+    Returns:
+        (record count, running digest as hex)
+    """
+    running = running_digest_hasher(key, digest_size)
+    count = 0
+    with open(path, 'rb') as source, open(tags_path, 'w') as tags:
+        for count, tag in iter_record_tags(source, key, digest_size, workers, batch_lines):
+            running.update(tag)
+            tags.write(tag.hex() + "\n")
+    return count, running.hexdigest()
+
+
+def verify_records(path, key, tags_path=None, expected_digest=None, digest_size=DEFAULT_TAG_SIZE,
+                   workers=None, batch_lines=DEFAULT_BATCH_LINES):
+    """
+    Check records against a tags file and/or a stored running digest
+
+    Args:
+        path: Line-delimited data file
+        key: MAC key used for signing
+        tags_path: File written by sign_records (per-line check)
+        expected_digest: Running digest as hex (whole-file check)
+
+    Returns:
+        Dict with 'count', 'digest', 'digest_ok' (None if not checked),
+        'failed_lines' (record lines whose tag differs or is missing) and
+        'extra_tags' (tags left over after the last record)
+    """
+    running = running_digest_hasher(key, digest_size)
+    failed_lines = []
+    count = 0
+    tags = open(tags_path, 'r') if tags_path else None
+    try:
+        with open(path, 'rb') as source:
+            for count, tag in iter_record_tags(source, key, digest_size, workers, batch_lines):
+                running.update(tag)
+                if tags is not None:
+                    expected = tags.readline().strip()
+                    try:
+                        matches = hmac.compare_digest(tag, bytes.fromhex(expected))
+                    except ValueError:
+                        matches = False
+                    if not matches:
+                        failed_lines.append(count)
+        extra_tags = sum(1 for line in tags if line.strip()) if tags is not None else 0
+    finally:
+        if tags is not None:
+            tags.close()
+
+    digest = running.hexdigest()
+    digest_ok = None
+    if expected_digest is not None:
+        digest_ok = hmac.compare_digest(digest, expected_digest.strip().lower())
+
+    return {
+        'count': count,
+        'digest': digest,
+        'digest_ok': digest_ok,
+        'failed_lines': failed_lines,
+        'extra_tags': extra_tags,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-record keyed BLAKE2b for line-delimited files')
+    parser.add_argument('-k', '--key', required=True, help='MAC key (UTF-8, up to 64 bytes)')
+    parser.add_argument('-s', '--size', type=int, default=DEFAULT_TAG_SIZE, help='Tag size in bytes')
+    parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--batch-lines', type=int, default=DEFAULT_BATCH_LINES, help='Records per task')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sign_parser = subparsers.add_parser('sign', help='Write per-record tags and print the running digest')
+    sign_parser.add_argument('file')
+    sign_parser.add_argument('-o', '--output', help='Tags file (default: FILE.b2tags)')
+
+    verify_parser = subparsers.add_parser('verify', help='Report lines whose tag does not match')
+    verify_parser.add_argument('file')
+    verify_parser.add_argument('-t', '--tags', help='Tags file written by sign')
+    verify_parser.add_argument('-d', '--digest', help='Expected running digest')
+
+    args = parser.parse_args()
+    key = args.key.encode('utf-8')
+    if not 1 <= len(key) <= 64:
+        print("Error: Key must be between 1 and 64 bytes")
+        return 1
+
+    try:
+        if args.command == 'sign':
+            output = args.output or args.file + '.b2tags'
+            count, digest = sign_records(args.file, output, key, args.size, args.workers, args.batch_lines)
+            print(f"Records: {count}")
+            print(f"Tags:    {output}")
+            print(f"Digest:  {digest}")
+            return 0
+
+        if not args.tags and not args.digest:
+            print("Error: verify needs --tags and/or --digest")
+            return 1
+        result = verify_records(args.file, key, args.tags, args.digest, args.size,
+                                args.workers, args.batch_lines)
+        print(f"Records: {result['count']}")
+        print(f"Digest:  {result['digest']}")
+        ok = True
+        if result['digest_ok'] is not None:
+            print("✓ Running digest matches" if result['digest_ok'] else "✗ Running digest does not match")
+            ok = ok and result['digest_ok']
+        if args.tags:
+            if result['failed_lines']:
+                ok = False
+                shown = ', '.join(map(str, result['failed_lines'][:50]))
+                more = len(result['failed_lines']) - 50
+                print(f"✗ {len(result['failed_lines'])} record(s) failed, lines: {shown}"
+                      + (f" (+{more} more)" if more > 0 else ""))
+            if result['extra_tags']:
+                ok = False
+                print(f"✗ {result['extra_tags']} tag(s) without a matching record (file truncated?)")
+            if ok:
+                print("✓ All records verified")
+        return 0 if ok else 1
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
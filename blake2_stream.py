@@ -0,0 +1,472 @@
+"""
+Constant-Memory Streaming for BLAKE2
+Hashes arbitrarily long streams (device images, tape archives, pipes) through a
+single reusable buffer and reports progress periodically.
+A read-ahead variant overlaps disk reads with compression on a background thread.
+Includes a synthetic pattern stream for validating very long inputs without disk.
+"""
+
+import hashlib
+import os
+import queue
+import stat
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from blake2_implementation import BLAKE2b, BLAKE2s
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20          # 1 MiB per read
+DEFAULT_PROGRESS_INTERVAL = 1 << 30   # report every 1 GiB
+DEFAULT_READAHEAD_BUFFERS = 4         # ring size of the read-ahead reader
+
+
+StreamProgress = namedtuple('StreamProgress', ['bytes_hashed', 'blocks', 'elapsed', 'rate'])
+StreamProgress.__doc__ = """Progress snapshot: bytes and compressed blocks so far, seconds elapsed, bytes/second"""
+
+PipelineStats = namedtuple('PipelineStats', ['bytes_hashed', 'elapsed', 'io_wait', 'compute',
+                                             'read_time', 'reader_stall'])
+PipelineStats.__doc__ = """Read-ahead timings in seconds: io_wait is time the hasher waited for data,
+compute is time spent in update(), read_time is time the reader spent in reads
+and reader_stall is time it waited for a free buffer (hashing was the bottleneck)"""
+
+
+class SyntheticStream:
+    """
+    Read-only file-like object producing a repeating byte pattern
+
+    Serves reads from a prebuilt template with memoryview slicing, so even
+    very long streams (beyond 2**64 bytes) cost no disk and no allocation
+    per read. The default pattern is all zero bytes.
+    """
+
+    def __init__(self, length, pattern=b"\x00"):
+        """
+        Args:
+            length: Total number of bytes the stream produces
+            pattern: Non-empty byte pattern repeated from offset 0
+        """
+        if length < 0:
+            raise ValueError("Stream length must not be negative")
+        if not pattern:
+            raise ValueError("Pattern must not be empty")
+        self.length = length
+        self.pattern = bytes(pattern)
+        self.position = 0
+        self._template = memoryview(b"")
+
+    def _ensure_template(self, size):
+        """Build a template long enough to serve size bytes from any phase"""
+        needed = size + len(self.pattern)
+        if len(self._template) < needed:
+            repeats = -(-needed // len(self.pattern))
+            self._template = memoryview(self.pattern * repeats)
+
+    def readinto(self, buffer):
+        """Fill buffer with the next bytes of the pattern; returns the count"""
+        view = memoryview(buffer).cast('B')
+        count = min(len(view), self.length - self.position)
+        if count <= 0:
+            return 0
+        self._ensure_template(count)
+        phase = self.position % len(self.pattern)
+        view[:count] = self._template[phase:phase + count]
+        self.position += count
+        return count
+
+    def read(self, size=-1):
+        """Read up to size bytes (all remaining bytes if size is negative)"""
+        if size is None or size < 0:
+            size = self.length - self.position
+        buffer = bytearray(min(size, self.length - self.position))
+        count = self.readinto(buffer)
+        return bytes(buffer[:count])
+
+    def readable(self):
+        return True
+
+
+def hash_stream(stream, hasher, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                progress_interval=DEFAULT_PROGRESS_INTERVAL):
+    """
+    Feed a whole stream into a hasher using one reusable buffer
+
+    Memory use is bounded by chunk_size regardless of the stream length.
+
+    Args:
+        stream: Binary file-like object supporting readinto() or read()
+        hasher: BLAKE2b or BLAKE2s instance (any object with update())
+        chunk_size: Bytes per read
+        progress: Optional callable receiving a StreamProgress snapshot every
+            progress_interval bytes and once at the end
+        progress_interval: Bytes between progress reports
+
+    Returns:
+        The hasher, ready for digest()/hexdigest()
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    block_size = hasher.block_size
+    readinto = getattr(stream, 'readinto', None)
+
+    total = 0
+    reported = -1
+    next_report = progress_interval
+    start = time.perf_counter()
+
+    def report():
+        nonlocal reported
+        reported = total
+        elapsed = time.perf_counter() - start
+        progress(StreamProgress(total, -(-total // block_size), elapsed,
+                                total / elapsed if elapsed > 0 else 0.0))
+
+    while True:
+        if readinto is not None:
+            count = readinto(buffer)
+            if not count:
+                break
+            hasher.update(view[:count])
+        else:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            count = len(chunk)
+            hasher.update(chunk)
+
+        total += count
+        if progress and total >= next_report:
+            report()
+            next_report = (total // progress_interval + 1) * progress_interval
+
+    if progress and reported != total:
+        report()
+    return hasher
+
+
+def hash_stream_readahead(stream, hasher, buffer_size=DEFAULT_CHUNK_SIZE, buffers=DEFAULT_READAHEAD_BUFFERS,
+                          progress=None, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+    """
+    Feed a whole stream into a hasher while a background thread reads ahead
+
+    The reader thread fills a ring of reusable bytearrays with readinto()
+    (which releases the GIL) while this thread hashes filled buffers through
+    memoryviews, so disk and CPU work overlap. Memory use is bounded by
+    buffers * buffer_size.
+
+    Args:
+        stream: Binary file-like object supporting readinto() or read()
+        hasher: BLAKE2b or BLAKE2s instance (any object with update())
+        buffer_size: Bytes per buffer
+        buffers: Number of buffers in the ring; with 1 the calling thread
+            reads inline, which still reports the I/O versus compute split
+        progress: Optional callable receiving StreamProgress snapshots
+        progress_interval: Bytes between progress reports
+
+    Returns:
+        (hasher, PipelineStats)
+    """
+    buffers = max(1, buffers)
+    ring = [bytearray(buffer_size) for _ in range(buffers)]
+    views = [memoryview(buffer) for buffer in ring]
+    readinto = getattr(stream, 'readinto', None)
+    reader_times = [0.0, 0.0]  # read_time, reader_stall
+
+    def fill(index):
+        if readinto is not None:
+            return readinto(ring[index])
+        chunk = stream.read(buffer_size)
+        ring[index][:len(chunk)] = chunk
+        return len(chunk)
+
+    free = queue.Queue()
+    filled = queue.Queue()
+    for index in range(buffers):
+        free.put(index)
+
+    def reader():
+        try:
+            while True:
+                start = time.perf_counter()
+                index = free.get()
+                reader_times[1] += time.perf_counter() - start
+                if index is None:
+                    return
+                start = time.perf_counter()
+                count = fill(index)
+                reader_times[0] += time.perf_counter() - start
+                filled.put((index, count))
+                if not count:
+                    return
+        except BaseException as e:
+            filled.put((None, e))
+
+    def read_inline():
+        start = time.perf_counter()
+        count = fill(0)
+        reader_times[0] += time.perf_counter() - start
+        return 0, count
+
+    thread = None
+    if buffers > 1:
+        thread = threading.Thread(target=reader, name='blake2-readahead', daemon=True)
+    next_buffer = filled.get if thread else read_inline
+
+    total = 0
+    io_wait = compute = 0.0
+    next_report = progress_interval
+    reported = -1
+    start = time.perf_counter()
+
+    def report():
+        nonlocal reported
+        reported = total
+        elapsed = time.perf_counter() - start
+        progress(StreamProgress(total, -(-total // hasher.block_size), elapsed,
+                                total / elapsed if elapsed > 0 else 0.0))
+
+    if thread:
+        thread.start()
+    finished = False
+    try:
+        while True:
+            waited = time.perf_counter()
+            index, count = next_buffer()
+            io_wait += time.perf_counter() - waited
+            if index is None:
+                raise count
+            if not count:
+                break
+
+            hashed = time.perf_counter()
+            hasher.update(views[index][:count])
+            compute += time.perf_counter() - hashed
+            if thread:
+                free.put(index)
+
+            total += count
+            if progress and total >= next_report:
+                report()
+                next_report = (total // progress_interval + 1) * progress_interval
+        finished = True
+    finally:
+        if thread:
+            # Wake the reader if it is waiting for a buffer. After an error it
+            # may be blocked in a read from a pipe or terminal that never
+            # returns, so it is left to exit on its own (it is a daemon thread)
+            free.put(None)
+            if finished:
+                thread.join()
+
+    if progress and reported != total:
+        report()
+    return hasher, PipelineStats(total, time.perf_counter() - start, io_wait, compute,
+                                 reader_times[0], reader_times[1])
+
+
+def fit_buffers(file_stat, buffer_size, buffers=1):
+    """
+    Shrink read buffers to a small regular file
+
+    Devices, FIFOs and pipes report st_size 0 and keep the requested sizes.
+
+    Args:
+        file_stat: os.stat_result of the open file
+        buffer_size: Requested bytes per read
+        buffers: Requested read-ahead ring size
+
+    Returns:
+        (buffer_size, buffers); one buffer when the whole file fits in it
+    """
+    if not stat.S_ISREG(file_stat.st_mode):
+        return buffer_size, buffers
+    buffer_size = max(4096, min(buffer_size, file_stat.st_size + 1))
+    return buffer_size, 1 if file_stat.st_size < buffer_size else buffers
+
+
+def hash_file_stable(path, hasher, progress=None, buffers=DEFAULT_READAHEAD_BUFFERS,
+                     buffer_size=DEFAULT_CHUNK_SIZE, on_stats=None):
+    """
+    Stream a file into a hasher, noting whether it changed while being read
+
+    Args:
+        path: File to hash
+        hasher: BLAKE2b or BLAKE2s instance
+        progress: Optional StreamProgress callback
+        buffers: Read-ahead ring size; 1 reads on the calling thread
+        buffer_size: Bytes per read
+        on_stats: Optional callable receiving the read-ahead PipelineStats
+
+    Returns:
+        os.stat_result taken before reading, or None if the file was modified
+        during the read
+    """
+    with open(path, 'rb', buffering=0) as f:
+        before = os.fstat(f.fileno())
+        # Small files should not pay for full-size buffers or a reader thread
+        buffer_size, buffers = fit_buffers(before, buffer_size, buffers)
+        _, stats = hash_stream_readahead(f, hasher, buffer_size, buffers, progress)
+        if on_stats:
+            on_stats(stats)
+        after = os.fstat(f.fileno())
+    if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+        return None
+    return before
+
+
+def hash_file(path, algorithm='blake2b', digest_size=None, key=b"", salt=b"", person=b"",
+              buffer_size=None, buffers=None, progress=None):
+    """
+    Hash a file with the read-ahead reader
+
+    Args:
+        path: File to hash
+        algorithm: 'blake2b' or 'blake2s'
+        digest_size: Output size in bytes (default: 64 for BLAKE2b, 32 for BLAKE2s)
+        key, salt, person: BLAKE2 parameters
+        buffer_size: Bytes per read-ahead buffer (default: the tuning profile)
+        buffers: Buffers in the ring; 1 reads and hashes on the calling thread
+            (default: the tuning profile)
+
+    Returns:
+        (hex digest, PipelineStats)
+    """
+    if buffer_size is None or buffers is None:
+        # Imported here because blake2_tune benchmarks this module
+        from blake2_tune import tuned
+        buffer_size = buffer_size or tuned('buffer_size')
+        buffers = buffers or tuned('buffers')
+    hasher_class = BLAKE2b if algorithm == 'blake2b' else BLAKE2s
+    hasher = hasher_class(digest_size or (64 if algorithm == 'blake2b' else 32), key, salt, person)
+    with open(path, 'rb', buffering=0) as f:
+        # Small files should not pay for full-size buffers or a reader thread
+        buffer_size, buffers = fit_buffers(os.fstat(f.fileno()), buffer_size, buffers)
+        _, stats = hash_stream_readahead(f, hasher, buffer_size, buffers, progress)
+    return hasher.hexdigest(), stats
+
+
+class TeeReader:
+    """
+    Readable wrapper that copies everything read from source into sinks
+
+    Used with hash_stream_readahead, the copy happens on the reader thread
+    (writes release the GIL) while the same buffer is hashed on the main one.
+    """
+
+    def __init__(self, source, *sinks):
+        self.source = source
+        self.sinks = sinks
+        self._readinto = getattr(source, 'readinto', None)
+
+    def readinto(self, buffer):
+        if self._readinto is not None:
+            count = self._readinto(buffer)
+        else:
+            chunk = self.source.read(len(buffer))
+            count = len(chunk)
+            buffer[:count] = chunk
+        if count:
+            view = memoryview(buffer)[:count]
+            for sink in self.sinks:
+                # Unbuffered (raw) sinks may accept only part of a write; many
+                # file-like wrappers return None after writing everything
+                written = 0
+                while written < count:
+                    accepted = sink.write(view[written:])
+                    written += count - written if accepted is None else accepted
+        return count
+
+    def readable(self):
+        return True
+
+
+def tee_stream(source, sinks, hasher, buffer_size=DEFAULT_CHUNK_SIZE, buffers=DEFAULT_READAHEAD_BUFFERS,
+               progress=None):
+    """
+    Copy a stream to one or more sinks and hash it in the same pass
+
+    Args:
+        source: Binary readable (e.g. a raw stdin FileIO)
+        sinks: Binary writables receiving every byte of source
+        hasher: BLAKE2b/BLAKE2s (or hashlib) instance
+        buffer_size: Bytes per reusable buffer
+        buffers: Buffers in the ring (1 copies and hashes on the calling thread)
+
+    Returns:
+        (hasher, PipelineStats)
+    """
+    return hash_stream_readahead(TeeReader(source, *sinks), hasher, buffer_size, buffers, progress)
+
+
+def format_pipeline_stats(stats):
+    """One-line summary of PipelineStats for sizing buffers per storage tier"""
+    busy = stats.io_wait + stats.compute
+    io_share = 100.0 * stats.io_wait / busy if busy > 0 else 0.0
+    rate = stats.bytes_hashed / stats.elapsed / 1e6 if stats.elapsed > 0 else 0.0
+    return (f"{stats.bytes_hashed:,} bytes in {stats.elapsed:.2f} s ({rate:.2f} MB/s): "
+            f"I/O wait {stats.io_wait:.2f} s ({io_share:.0f}%), compute {stats.compute:.2f} s "
+            f"({100.0 - io_share:.0f}%), reads {stats.read_time:.2f} s, "
+            f"reader stalled {stats.reader_stall:.2f} s")
+
+
+def print_progress(snapshot, file=None):
+    """Default progress printer for CLI use (writes to stderr)"""
+    print(f"  {snapshot.bytes_hashed:,} bytes, {snapshot.blocks:,} blocks, "
+          f"{snapshot.elapsed:.1f} s, {snapshot.rate / 1e6:.2f} MB/s",
+          file=file or sys.stderr)
+
+
+def validate_synthetic(length, pattern=b"\x00", algorithm='blake2b', chunk_size=DEFAULT_CHUNK_SIZE,
+                       progress=None, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+    """
+    Hash a synthetic stream with both this implementation and hashlib
+
+    Args:
+        length: Stream length in bytes
+        pattern: Byte pattern to repeat
+        algorithm: 'blake2b' or 'blake2s'
+
+    Returns:
+        (matches, our_hexdigest, reference_hexdigest)
+    """
+    hasher = BLAKE2b() if algorithm == 'blake2b' else BLAKE2s()
+    hash_stream(SyntheticStream(length, pattern), hasher, chunk_size, progress, progress_interval)
+    reference = hashlib.blake2b() if algorithm == 'blake2b' else hashlib.blake2s()
+    hash_stream(SyntheticStream(length, pattern), reference, chunk_size)
+    return hasher.hexdigest() == reference.hexdigest(), hasher.hexdigest(), reference.hexdigest()
+
+
+def parse_size(text):
+    """Parse a byte count with an optional K/M/G/T/P (binary) suffix, e.g. '4T'"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40, 'P': 1 << 50}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Validate BLAKE2 streaming on a synthetic pattern stream')
+    parser.add_argument('length', type=parse_size, help='Stream length, e.g. 64M or 2T')
+    parser.add_argument('-p', '--pattern', default='00', help='Repeated byte pattern as hex (default: 00)')
+    parser.add_argument('-a', '--algorithm', choices=['blake2b', 'blake2s'], default='blake2b')
+    parser.add_argument('--chunk-size', type=parse_size, default=DEFAULT_CHUNK_SIZE, help='Bytes per read')
+    parser.add_argument('--progress-interval', type=parse_size, default=DEFAULT_PROGRESS_INTERVAL,
+                        help='Bytes between progress reports (default: 1G)')
+    args = parser.parse_args()
+
+    print(f"Hashing {args.length:,} bytes of pattern {args.pattern} with {args.algorithm.upper()}")
+    matches, ours, reference = validate_synthetic(args.length, bytes.fromhex(args.pattern), args.algorithm,
+                                                  args.chunk_size, print_progress, args.progress_interval)
+    print(f"Custom:  {ours}")
+    print(f"hashlib: {reference}")
+    print("✓ Digests match" if matches else "✗ Digests differ")
+    return 0 if matches else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,277 @@
+"""
+Per-Host Tuning Profile
+Benchmarks the hashing paths of blake2_implementation.py (serial batches,
+thread and process pools) and file hashing (read-ahead buffer size and
+count), then saves the fastest settings as a
+JSON profile. The CLI, the library helpers and the Flask app read their
+defaults from it; a profile written under another Python version or CPU
+count is stale and is recalibrated automatically at CLI and app startup.
+
+The profile lives at $BLAKE2_TUNING, or DEFAULT_PROFILE_PATH; setting
+BLAKE2_TUNING=off disables it.
+Usage: python blake2_tune.py {calibrate,show} [options]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from blake2_implementation import HashPool, blake2b_batch, blake2s_batch, hash_many_threaded
+from blake2_stream import hash_file, DEFAULT_CHUNK_SIZE, DEFAULT_READAHEAD_BUFFERS
+
+
+PROFILE_VERSION = 2
+DEFAULT_PROFILE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'blake2_cli', 'tuning.json'
+)
+
+# Settings used when there is no (valid) profile
+DEFAULTS = {
+    'buffer_size': DEFAULT_CHUNK_SIZE,
+    'buffers': DEFAULT_READAHEAD_BUFFERS,
+    'batch_path': 'serial',
+    'thread_workers': os.cpu_count() or 1,
+    'process_workers': os.cpu_count() or 1,
+}
+
+# Candidate configurations: (sample bytes, (buffer size, buffers), batch messages)
+FULL_PLAN = (1 << 20, ((64 << 10, 1), (256 << 10, 1), (256 << 10, 4), (1 << 20, 1), (1 << 20, 4)), 200)
+QUICK_PLAN = (256 << 10, ((16 << 10, 1), (64 << 10, 1), (64 << 10, 2)), 50)
+# Timed runs per candidate; the median is kept
+REPEATS = 3
+# A thread or process pool must beat the serial batch by this factor to be chosen
+PARALLEL_MARGIN = 1.15
+
+_loaded = {}
+
+
+def profile_path():
+    """Active profile path, or None when tuning is disabled"""
+    path = os.environ.get('BLAKE2_TUNING', DEFAULT_PROFILE_PATH)
+    return None if path.lower() == 'off' else path
+
+
+def host_fingerprint():
+    """Properties that invalidate a profile when they change"""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count() or 1,
+    }
+
+
+def is_stale(profile):
+    return profile.get('version') != PROFILE_VERSION or profile.get('host') != host_fingerprint()
+
+
+def _measure(function, *args):
+    """Median seconds of REPEATS calls"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _worker_counts(cpus):
+    """Pool sizes worth trying; more workers than CPUs cannot speed up hashing"""
+    return sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+
+
+def _hash_many_processes(messages, workers):
+    """The process path as hash_many() runs it, pool startup included"""
+    with HashPool(workers=workers) as pool:
+        return pool.hash_many(messages)
+
+
+def calibrate(quick=False, verbose=False):
+    """
+    Benchmark the hashing paths and return a profile
+
+    Args:
+        quick: Use a small sample and fewer candidates (a few seconds)
+        verbose: Print every measurement
+
+    Returns:
+        Profile dict with the chosen settings, the host fingerprint and the
+        raw measurements in MiB/s or messages/s (medians of REPEATS runs)
+    """
+    sample_size, file_configs, messages = QUICK_PLAN if quick else FULL_PLAN
+    cpus = os.cpu_count() or 1
+    data = os.urandom(sample_size)
+    measurements = {'file': {}, 'batch': {}}
+
+    def report(group, name, rate, unit):
+        measurements[group][name] = round(rate, 2)
+        if verbose:
+            print(f"  {group:<6} {name:<16} {rate:10.2f} {unit}")
+
+    with tempfile.NamedTemporaryFile(prefix='blake2-tune-') as sample:
+        sample.write(data)
+        sample.flush()
+        for buffer_size, buffers in file_configs:
+            seconds = _measure(hash_file, sample.name, 'blake2b', None, b"", b"", b"", buffer_size, buffers)
+            report('file', f"{buffer_size}x{buffers}", sample_size / seconds / (1 << 20), 'MiB/s')
+
+    batch = [data[i * 1024:(i + 1) * 1024] for i in range(messages)]
+    report('batch', 'serial', messages / _measure(blake2b_batch, batch), 'msg/s')
+    for workers in _worker_counts(cpus):
+        report('batch', f"threads-{workers}", messages / _measure(hash_many_threaded, batch, 'blake2b', workers),
+               'msg/s')
+    if cpus > 1:
+        for workers in sorted({2, cpus}):
+            report('batch', f"processes-{workers}", messages / _measure(_hash_many_processes, batch, workers),
+                   'msg/s')
+
+    def best(group, prefix=''):
+        candidates = {name: rate for name, rate in measurements[group].items() if name.startswith(prefix)}
+        return max(candidates, key=candidates.get) if candidates else None
+
+    buffer_size, buffers = map(int, best('file').split('x'))
+    batch_best = best('batch')
+    # A pool only pays off when it is clearly faster than hashing in the caller
+    if measurements['batch'][batch_best] < measurements['batch']['serial'] * PARALLEL_MARGIN:
+        batch_best = 'serial'
+    threads = best('batch', 'threads-')
+    processes = best('batch', 'processes-')
+    return {
+        'version': PROFILE_VERSION,
+        'host': host_fingerprint(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'quick': quick,
+        'buffer_size': buffer_size,
+        'buffers': buffers,
+        'batch_path': batch_best.split('-')[0],
+        'thread_workers': int(threads.split('-')[1]),
+        'process_workers': int(processes.split('-')[1]) if processes else 1,
+        'measurements': measurements,
+    }
+
+
+def save_profile(profile, path=None):
+    """Write a profile atomically"""
+    path = path or profile_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, 'w') as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+    os.replace(temporary, path)
+    _loaded.pop(path, None)
+
+
+def load_profile(path=None, recalibrate=False):
+    """
+    Read the host profile
+
+    Args:
+        path: Profile file (default: profile_path())
+        recalibrate: When the saved profile is stale, run a quick calibration
+            and save it (used at CLI and app startup); otherwise a stale
+            profile is ignored
+
+    Returns:
+        Profile dict, or None if there is no usable profile
+    """
+    path = path or profile_path()
+    if path is None:
+        return None
+    if path in _loaded:
+        return _loaded[path]
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if is_stale(profile):
+        if not recalibrate:
+            return None
+        print("Host changed since the last calibration; recalibrating (quick)...", file=sys.stderr)
+        profile = calibrate(quick=True)
+        try:
+            save_profile(profile, path)
+        except OSError:
+            pass
+    _loaded[path] = profile
+    return profile
+
+
+def tuned(name, recalibrate=False):
+    """Profile value for a setting, or its built-in default"""
+    profile = load_profile(recalibrate=recalibrate)
+    if profile is not None and name in profile:
+        return profile[name]
+    return DEFAULTS[name]
+
+
+def hash_many(messages, algorithm='blake2b', digest_size=None, key=b"", salt=b"", person=b""):
+    """
+    Hash many independent inputs on the path that was fastest on this host
+
+    Returns:
+        List of digests as bytes, in input order
+    """
+    path = tuned('batch_path')
+    if path == 'processes':
+        with HashPool(algorithm, tuned('process_workers'), digest_size, key, salt, person) as pool:
+            return pool.hash_many(messages)
+    if path == 'threads':
+        return hash_many_threaded(messages, algorithm, tuned('thread_workers'), digest_size, key, salt, person)
+    batch = blake2b_batch if algorithm == 'blake2b' else blake2s_batch
+    return batch(messages, digest_size or (64 if algorithm == 'blake2b' else 32), key, salt, person)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate BLAKE2 hashing defaults for this host')
+    parser.add_argument('--profile', help=f'Profile path (default: $BLAKE2_TUNING or {DEFAULT_PROFILE_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    calibrate_parser = subparsers.add_parser('calibrate', help='Benchmark and save the profile')
+    calibrate_parser.add_argument('--quick', action='store_true', help='Smaller sample, fewer candidates')
+    subparsers.add_parser('show', help='Print the saved profile and whether it is current')
+
+    args = parser.parse_args()
+    path = args.profile or profile_path()
+    if path is None:
+        print("Error: Tuning is disabled (BLAKE2_TUNING=off)")
+        return 1
+
+    if args.command == 'calibrate':
+        fingerprint = host_fingerprint()
+        print(f"Calibrating on Python {fingerprint['python']}, {fingerprint['cpu_count']} CPU(s)")
+        profile = calibrate(args.quick, verbose=True)
+        try:
+            save_profile(profile, path)
+        except OSError as e:
+            print(f"Error: {e}")
+            return 1
+        print(f"\nFile buffers:    {profile['buffers']} x {profile['buffer_size']} bytes")
+        print(f"Batch path:      {profile['batch_path']} "
+              f"(threads: {profile['thread_workers']}, processes: {profile['process_workers']})")
+        print(f"Saved to {path}")
+        return 0
+
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: No profile at {path} ({e}); run 'python blake2_tune.py calibrate'")
+        return 1
+    print(json.dumps({name: value for name, value in profile.items() if name != 'measurements'}, indent=2))
+    if is_stale(profile):
+        print("✗ Stale: calibrated on a different host configuration")
+        return 1
+    print("✓ Current for this host")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
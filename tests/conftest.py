@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests must neither read nor recalibrate the per-host tuning profile
+os.environ['BLAKE2_TUNING'] = 'off'
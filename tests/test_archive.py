@@ -0,0 +1,103 @@
+import hashlib
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from blake2_archive import archive_format, hash_archive
+
+MEMBERS = {
+    'empty.txt': b"",
+    'small.txt': b"hello archive\n",
+    'dir/large.bin': bytes(range(256)) * 40,
+}
+
+
+def expected(algorithm='blake2b', **params):
+    return [(name, len(data), getattr(hashlib, algorithm)(data, **params).hexdigest())
+            for name, data in MEMBERS.items()]
+
+
+def results(path, **kwargs):
+    members = list(hash_archive(str(path), **kwargs))
+    assert all(member.error is None for member in members)
+    return [(member.name, member.size, member.digest) for member in members]
+
+
+def write_tar(path, mode):
+    with tarfile.open(path, mode) as archive:
+        directory = tarfile.TarInfo('dir')
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def write_zip(path):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('dir/', b"")
+        for name, data in MEMBERS.items():
+            archive.writestr(name, data)
+
+
+@pytest.mark.parametrize("mode, fmt", [('w', 'tar'), ('w:gz', 'tar.gz'), ('w:bz2', 'tar.bz2'), ('w:xz', 'tar.xz')])
+def test_tar_members(tmp_path, mode, fmt):
+    path = tmp_path / "archive.tar"
+    write_tar(path, mode)
+    assert archive_format(str(path)) == fmt
+    # A tiny ring forces buffer reuse across members
+    assert results(path, buffer_size=1024, buffers=2) == expected()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_zip_members(tmp_path, workers):
+    path = tmp_path / "archive.zip"
+    write_zip(path)
+    assert archive_format(str(path)) == 'zip'
+    assert results(path, workers=workers) == expected()
+
+
+def test_parameters_apply_to_every_member(tmp_path):
+    path = tmp_path / "archive.tar"
+    write_tar(path, 'w')
+    params = {'digest_size': 16, 'key': b"k", 'salt': b"s", 'person': b"p"}
+    assert results(path, algorithm='blake2s', **params) == expected('blake2s', **params)
+
+
+def test_empty_archives(tmp_path):
+    tar_path, zip_path = tmp_path / "empty.tar", tmp_path / "empty.zip"
+    tarfile.open(tar_path, 'w').close()
+    zipfile.ZipFile(zip_path, 'w').close()
+    assert results(tar_path) == []
+    assert results(zip_path) == []
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "plain.txt"
+    path.write_bytes(b"not an archive" * 100)
+    with pytest.raises(ValueError):
+        list(hash_archive(str(path)))
+
+
+def test_truncated_tar_raises(tmp_path):
+    path = tmp_path / "archive.tar.gz"
+    write_tar(path, 'w:gz')
+    path.write_bytes(path.read_bytes()[:-40])
+    with pytest.raises((tarfile.TarError, EOFError, OSError)):
+        list(hash_archive(str(path)))
+
+
+def test_corrupt_zip_member_reported_per_member(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('good.txt', b"good data")
+        archive.writestr('bad.txt', b"original contents")
+    raw = path.read_bytes()
+    path.write_bytes(raw.replace(b"original contents", b"tampered contents"))
+
+    members = {member.name: member for member in hash_archive(str(path), workers=1)}
+    assert members['good.txt'].digest == hashlib.blake2b(b"good data").hexdigest()
+    assert members['bad.txt'].digest is None and members['bad.txt'].error
@@ -0,0 +1,160 @@
+import hashlib
+import io
+import json
+
+import pytest
+
+from blake2_bulk import format_ndjson, format_sse, parse_manifest, verify_upload
+
+BOUNDARY = 'test-boundary'
+FILES = {
+    'a.bin': b"alpha contents\n" * 300,
+    'b.txt': b"bravo",
+    'empty.dat': b"",
+}
+
+
+def digest(data, size=32, algorithm='blake2b'):
+    return getattr(hashlib, algorithm)(data, digest_size=size).hexdigest()
+
+
+def b2sum(files, size=32):
+    return "".join(f"{digest(data, size)}  {name}\n" for name, data in files.items()).encode()
+
+
+def multipart(parts):
+    """parts: (field name, filename or None, bytes)"""
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else '')
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def file_parts(files):
+    return [(f"file{number}", name, data) for number, (name, data) in enumerate(files.items())]
+
+
+def run(parts, **kwargs):
+    kwargs.setdefault('workers', 2)
+    kwargs.setdefault('chunk_size', 1024)
+    return list(verify_upload(io.BytesIO(multipart(parts)), BOUNDARY, **kwargs))
+
+
+def test_manifest_first_all_ok():
+    records = run([('manifest', None, b2sum(FILES))] + file_parts(FILES))
+    results, summary = records[:-1], records[-1]['summary']
+    assert sorted((r['file'], r['status'], r['size']) for r in results) == \
+        sorted((name, 'ok', len(data)) for name, data in FILES.items())
+    assert summary == {'files': 3, 'passed': 3, 'mismatched': 0, 'unexpected': 0, 'unverifiable': 0,
+                       'missing': [], 'ok': True}
+
+
+def test_files_before_manifest_need_digest_size():
+    parts = file_parts(FILES) + [('manifest', 'SHA.b2sum', b2sum(FILES))]
+    assert run(parts) == [{'error': "manifest must precede files or digest_size must be given"}]
+
+    records = run(parts, digest_size=32)
+    assert records[-1]['summary']['ok'] is True
+    assert all(r['status'] == 'ok' for r in records[:-1])
+
+
+def test_mismatch_unexpected_and_missing():
+    manifest = b2sum(FILES)
+    upload = {'a.bin': FILES['a.bin'] + b"tampered", 'b.txt': FILES['b.txt'], 'extra.bin': b"extra"}
+    records = run([('manifest', None, manifest)] + file_parts(upload))
+    statuses = {r['file']: r['status'] for r in records[:-1]}
+    assert statuses == {'a.bin': 'mismatch', 'b.txt': 'ok', 'extra.bin': 'unexpected'}
+    summary = records[-1]['summary']
+    assert summary['missing'] == ['empty.dat']
+    assert (summary['mismatched'], summary['unexpected'], summary['ok']) == (1, 1, False)
+
+
+def test_digest_length_mismatch_is_unverifiable():
+    records = run([('manifest', None, b2sum(FILES))] + file_parts(FILES), digest_size=16)
+    assert {r['status'] for r in records[:-1]} == {'unverifiable'}
+    assert records[-1]['summary']['unverifiable'] == 3
+
+
+def test_blake2s_and_manifest_formats():
+    text_manifest = "".join(f"{digest(data, 32, 'blake2s')} {len(data)} {name}\n" for name, data in FILES.items())
+    json_manifest = json.dumps({name: digest(data, 32, 'blake2s').upper() for name, data in FILES.items()})
+    for manifest in (text_manifest, json_manifest):
+        records = run([('manifest', None, manifest.encode())] + file_parts(FILES), algorithm='blake2s')
+        assert records[-1]['summary']['ok'] is True
+
+
+def test_missing_manifest():
+    assert run(file_parts(FILES), digest_size=32)[-1] == {'error': "No manifest part in the upload"}
+    assert run([('comment', None, b"just a field")])[-1] == {'error': "No manifest part in the upload"}
+
+
+def test_malformed_manifest():
+    records = run([('manifest', None, b"zz-not-hex  a.bin\n")] + file_parts(FILES))
+    assert 'error' in records[-1]
+
+
+def test_empty_upload_with_manifest():
+    records = run([('manifest', None, b2sum({}))])
+    assert records == [{'summary': {'files': 0, 'passed': 0, 'mismatched': 0, 'unexpected': 0,
+                                    'unverifiable': 0, 'missing': [], 'ok': True}}]
+
+
+def test_max_files():
+    records = run([('manifest', None, b2sum(FILES))] + file_parts(FILES), max_files=2)
+    assert records[-1] == {'error': "Too many files (limit 2)"}
+
+
+@pytest.mark.parametrize("cut", [30, 200, 2000, -3])
+def test_truncated_body(cut):
+    body = multipart([('manifest', None, b2sum(FILES))] + file_parts(FILES))
+    records = list(verify_upload(io.BytesIO(body[:cut]), BOUNDARY, workers=2, chunk_size=256))
+    assert 'error' in records[-1]
+    assert not any('summary' in record for record in records)
+
+
+def test_parse_manifest():
+    hexdigest = "ab" * 32
+    assert parse_manifest(f"{hexdigest}  name with spaces.txt\n{hexdigest} *binary.bin\n# note\n") == \
+        {'name with spaces.txt': hexdigest, 'binary.bin': hexdigest}
+    with pytest.raises(ValueError):
+        parse_manifest("lonely-line")
+    with pytest.raises(ValueError):
+        parse_manifest('{"a": 5}')
+
+
+def test_formatters():
+    record = {'file': 'a', 'status': 'ok'}
+    assert json.loads(format_ndjson(record)) == record
+    assert format_sse(record).startswith("event: result\ndata: ")
+    assert format_sse({'summary': {}}).startswith("event: summary\n")
+    assert format_sse({'error': 'x'}).startswith("event: error\n")
+
+
+@pytest.fixture
+def client():
+    app = pytest.importorskip('app').app
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+def test_endpoint_ndjson_and_sse(client):
+    body = multipart([('manifest', None, b2sum(FILES))] + file_parts(FILES))
+    content_type = f'multipart/form-data; boundary={BOUNDARY}'
+
+    response = client.post('/api/verify/bulk', data=body, content_type=content_type)
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert records[-1]['summary']['ok'] is True
+
+    response = client.post('/api/verify/bulk?format=sse', data=body, content_type=content_type)
+    assert response.mimetype == 'text/event-stream'
+    assert response.get_data(as_text=True).count("event: result") == 3
+
+
+def test_endpoint_rejects_bad_requests(client):
+    assert client.post('/api/verify/bulk', data=b"{}", content_type='application/json').status_code == 400
+    content_type = f'multipart/form-data; boundary={BOUNDARY}'
+    assert client.post('/api/verify/bulk?algorithm=md5', data=b"", content_type=content_type).status_code == 400
+    assert client.post('/api/verify/bulk?algorithm=blake2s&digest_size=64', data=b"",
+                       content_type=content_type).status_code == 400
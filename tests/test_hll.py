@@ -0,0 +1,93 @@
+import pytest
+
+import blake2_hll
+from blake2_hll import HyperLogLog, union
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(blake2_hll, 'np', None)
+    elif blake2_hll.np is None:
+        pytest.skip("NumPy is not installed")
+    return request.param
+
+
+def sketch(items, precision=10, key=b"test-key"):
+    result = HyperLogLog(precision, key, batch_size=256)
+    result.update(items)
+    return result
+
+
+def test_empty_sketch(backend):
+    empty = HyperLogLog(8)
+    assert empty.count() == 0
+    assert HyperLogLog.from_bytes(empty.to_bytes()).count() == 0
+
+
+def test_estimate_and_duplicates(backend):
+    items = [f"item-{i}" for i in range(3000)]
+    estimate = sketch(items).count()
+    assert abs(estimate - 3000) / 3000 < 0.1
+    assert sketch(items + items[:1000]).count() == estimate
+
+
+def test_round_trip(backend):
+    original = sketch(range(2000), precision=8)
+    data = original.to_bytes()
+    assert len(data) == blake2_hll._HEADER_SIZE + 256 * 3 // 4
+    restored = HyperLogLog.from_bytes(data, b"test-key")
+    assert list(restored.registers) == list(original.registers)
+    assert restored.count() == original.count()
+    # A restored sketch keeps accepting items
+    restored.update(range(2000, 2100))
+    assert restored.count() >= original.count()
+
+
+def test_serialization_matches_across_backends(monkeypatch):
+    if blake2_hll.np is None:
+        pytest.skip("NumPy is not installed")
+    items = [b"a", "b", 3, b"\x00" * 40] + list(range(500))
+    with_numpy = sketch(items).to_bytes()
+    monkeypatch.setattr(blake2_hll, 'np', None)
+    assert sketch(items).to_bytes() == with_numpy
+
+
+def test_merge_equals_union_of_streams(backend):
+    first, second = range(0, 1500), range(1000, 2500)
+    merged = sketch(first) | sketch(second)
+    assert merged.to_bytes() == sketch(list(first) + list(second)).to_bytes()
+    assert union([sketch(first), sketch(second)]).to_bytes() == merged.to_bytes()
+    with pytest.raises(ValueError):
+        union([])
+
+
+def test_incompatible_sketches(backend):
+    with pytest.raises(ValueError):
+        sketch([1], precision=10).merge(sketch([1], precision=11))
+    with pytest.raises(ValueError):
+        sketch([1], key=b"one").merge(sketch([1], key=b"two"))
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(sketch([1], key=b"one").to_bytes(), b"two")
+
+
+@pytest.mark.parametrize("precision", [3, 19])
+def test_precision_limits(precision):
+    with pytest.raises(ValueError):
+        HyperLogLog(precision)
+
+
+def test_rejects_malformed_data(backend):
+    data = sketch(range(100), precision=6, key=blake2_hll.DEFAULT_KEY).to_bytes()
+    damaged = [
+        b"",
+        data[:blake2_hll._HEADER_SIZE - 1],
+        b"XXHLL" + data[5:],
+        data[:5] + bytes([2]) + data[6:],                  # version
+        data[:6] + bytes([40]) + data[7:],                 # precision
+        data[:-1],
+        data + b"\x00",
+    ]
+    for item in damaged:
+        with pytest.raises(ValueError):
+            HyperLogLog.from_bytes(item)
@@ -0,0 +1,116 @@
+import hashlib
+import pickle
+
+import pytest
+
+from blake2_implementation import BLAKE2b, BLAKE2s, MacContext, blake2b_batch, blake2s_batch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+ALGORITHMS = [(BLAKE2b, hashlib.blake2b, 64), (BLAKE2s, hashlib.blake2s, 32)]
+# Empty, partial, exactly one block and several blocks for either algorithm
+MESSAGES = [b"", b"abc", b"x" * 64, b"y" * 128, bytes(range(256)) * 2 + b"tail"]
+
+
+@pytest.mark.parametrize("hasher_class, reference, max_size", ALGORITHMS)
+def test_matches_hashlib(hasher_class, reference, max_size):
+    for message in MESSAGES:
+        hasher = hasher_class(max_size // 2, b"k", b"salt", b"person")
+        hasher.update(message)
+        expected = reference(message, digest_size=max_size // 2, key=b"k", salt=b"salt", person=b"person")
+        assert hasher.hexdigest() == expected.hexdigest()
+
+
+@pytest.mark.parametrize("algorithm, reference", [('blake2b', hashlib.blake2b), ('blake2s', hashlib.blake2s)])
+def test_mac_context(algorithm, reference):
+    mac = MacContext(b"secret", algorithm, 16, person=b"mac")
+    for message in MESSAGES:
+        tag = reference(message, digest_size=16, key=b"secret", person=b"mac").digest()
+        assert mac.sign(message) == tag
+        assert mac.verify(message, tag)
+        assert mac.verify(message, tag.hex())
+    assert not mac.verify(b"abc", mac.sign(b"abd"))
+    assert not mac.verify(b"abc", "not hex")
+    assert mac.sign_many(MESSAGES) == [mac.sign(message) for message in MESSAGES]
+    assert mac.verify_many(MESSAGES[:2], [mac.sign(b""), b"\x00" * 16]) == [True, False]
+
+
+def test_mac_context_rejects_empty_key_and_unknown_algorithm():
+    with pytest.raises(ValueError):
+        MacContext(b"")
+    with pytest.raises(ValueError):
+        MacContext(b"k", 'md5')
+
+
+@pytest.mark.parametrize("batch, reference, key", [
+    (blake2b_batch, hashlib.blake2b, b""), (blake2b_batch, hashlib.blake2b, b"key"),
+    (blake2s_batch, hashlib.blake2s, b""), (blake2s_batch, hashlib.blake2s, b"key"),
+])
+def test_batch_matches_single_hashes(batch, reference, key):
+    digests = batch(MESSAGES, 20, key=key, salt=b"s")
+    assert digests == [reference(message, digest_size=20, key=key, salt=b"s").digest()
+                       for message in MESSAGES]
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is not installed")
+def test_batch_accepts_numpy_arrays():
+    messages = [np.frombuffer(b"abc", dtype=np.uint8), np.zeros(0, dtype=np.uint8)]
+    assert blake2b_batch(messages, key=b"key") == [
+        hashlib.blake2b(b"abc", key=b"key").digest(), hashlib.blake2b(b"", key=b"key").digest()]
+
+
+@pytest.mark.parametrize("hasher_class, reference, max_size", ALGORITHMS)
+def test_copy_is_independent(hasher_class, reference, max_size):
+    hasher = hasher_class(max_size)
+    hasher.update(b"prefix-" * 30)
+    clone = hasher.copy()
+    clone.update(b"clone")
+    hasher.update(b"original")
+    assert hasher.digest() == reference(b"prefix-" * 30 + b"original").digest()
+    assert clone.digest() == reference(b"prefix-" * 30 + b"clone").digest()
+
+
+@pytest.mark.parametrize("hasher_class, reference, max_size", ALGORITHMS)
+def test_pickle_round_trip(hasher_class, reference, max_size):
+    hasher = hasher_class(max_size, b"key")
+    hasher.update(b"a" * 200)
+    restored = pickle.loads(pickle.dumps(hasher))
+    # The restored hasher gets a fresh usage guard
+    restored.update(b"b")
+    assert restored.digest() == reference(b"a" * 200 + b"b", key=b"key").digest()
+
+
+@pytest.mark.parametrize("hasher_class", [BLAKE2b, BLAKE2s])
+def test_concurrent_use_is_refused(hasher_class):
+    hasher = hasher_class()
+    hasher._guard.acquire()
+    try:
+        with pytest.raises(RuntimeError):
+            hasher.update(b"data")
+        with pytest.raises(RuntimeError):
+            hasher.digest()
+    finally:
+        hasher._guard.release()
+    hasher.update(b"data")
+    assert hasher.copy().digest() == hasher.digest()
+
+
+@pytest.mark.parametrize("hasher_class", [BLAKE2b, BLAKE2s])
+def test_input_limit(hasher_class):
+    hasher = hasher_class()
+    hasher.counter = hasher_class.MAX_INPUT - 10
+    hasher.update(b"x" * 10)
+    with pytest.raises(OverflowError):
+        hasher.update(b"x")
+
+
+def test_finalized_hasher_refuses_updates():
+    hasher = BLAKE2b()
+    digest = hasher.digest()
+    assert hasher.digest() == digest
+    with pytest.raises(ValueError):
+        hasher.update(b"late")
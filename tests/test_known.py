@@ -0,0 +1,112 @@
+import hashlib
+import os
+import random
+
+import pytest
+
+import blake2_known
+from blake2_known import KnownDigestIndex, build_known_index, check_files, read_digests
+
+
+def digests(count, size=32, seed=1):
+    rng = random.Random(seed)
+    return [rng.randbytes(size) for _ in range(count)]
+
+
+@pytest.fixture(params=['numpy', 'bisect'])
+def lookup_path(request, monkeypatch):
+    if request.param == 'bisect':
+        monkeypatch.setattr(blake2_known, 'np', None)
+    elif blake2_known.np is None:
+        pytest.skip("NumPy is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("fanout_bits", [0, 1, 8, 12])
+def test_round_trip(tmp_path, lookup_path, fanout_bits):
+    known = digests(500)
+    # Trailing zero bytes must not be confused with padding
+    known += [b"\x00" * 32, b"\x7f" + b"\x00" * 31, b"\xff" * 32]
+    unknown = digests(200, seed=2) + [b"\x7f" + b"\x00" * 30 + b"\x01"]
+    path = tmp_path / "known.idx"
+    # A small run size exercises the external merge
+    assert build_known_index(known + known[:50], str(path), 32, fanout_bits, run_size=64) == len(known)
+
+    with KnownDigestIndex(str(path)) as index:
+        assert len(index) == len(known)
+        assert all(index.lookup(digest) for digest in known)
+        assert not any(index.lookup(digest) for digest in unknown)
+        queries = unknown + known
+        assert index.lookup_many(queries) == [False] * len(unknown) + [True] * len(known)
+        assert index.lookup_many([digest.hex() for digest in known[:3]]) == [True] * 3
+
+
+def test_empty_index(tmp_path, lookup_path):
+    path = tmp_path / "empty.idx"
+    assert build_known_index([], str(path), 16, 8) == 0
+    with KnownDigestIndex(str(path)) as index:
+        assert len(index) == 0
+        assert not index.lookup(b"\x00" * 16)
+        assert index.lookup_many([b"\x00" * 16]) == [False]
+
+
+def test_rejects_wrong_digest_length(tmp_path):
+    with pytest.raises(ValueError):
+        build_known_index([b"\x00" * 31], str(tmp_path / "bad.idx"), 32)
+    assert not os.path.exists(tmp_path / "bad.idx")
+
+    path = tmp_path / "known.idx"
+    build_known_index(digests(10), str(path), 32)
+    with KnownDigestIndex(str(path)) as index:
+        with pytest.raises(ValueError):
+            index.lookup(b"\x00" * 16)
+        with pytest.raises(ValueError):
+            index.lookup_many([b"\x00" * 16])
+
+
+@pytest.mark.parametrize("digest_size, fanout_bits", [(0, 0), (65, 0), (1, 9), (32, 25)])
+def test_rejects_bad_parameters(tmp_path, digest_size, fanout_bits):
+    with pytest.raises(ValueError):
+        build_known_index([], str(tmp_path / "bad.idx"), digest_size, fanout_bits)
+
+
+def test_rejects_truncated_and_foreign_files(tmp_path):
+    path = tmp_path / "known.idx"
+    build_known_index(digests(100), str(path), 32, 4)
+    raw = path.read_bytes()
+
+    for damaged in (raw[:-1], raw[:10], b"B2KNOWN9" + raw[8:], b"not an index at all" * 10):
+        path.write_bytes(damaged)
+        with pytest.raises(ValueError):
+            KnownDigestIndex(str(path))
+
+
+def test_read_digests_formats(tmp_path):
+    values = digests(3)
+    manifest = tmp_path / "digests.txt"
+    manifest.write_text(
+        "# comment\n"
+        f"{values[0].hex()} 12 dir/file with spaces.txt\n"
+        f"{values[1].hex()}  b2sum-name.bin\n"
+        "\n"
+        f"{values[2].hex()}\n"
+    )
+    assert list(read_digests(str(manifest))) == values
+
+    manifest.write_text("not-hex  name\n")
+    with pytest.raises(ValueError):
+        list(read_digests(str(manifest)))
+
+
+def test_check_files(tmp_path):
+    good, other = tmp_path / "good.bin", tmp_path / "other.bin"
+    good.write_bytes(b"known contents")
+    other.write_bytes(b"something else")
+    path = tmp_path / "known.idx"
+    build_known_index([hashlib.blake2b(b"known contents", digest_size=32).digest()], str(path), 32)
+
+    with KnownDigestIndex(str(path)) as index:
+        results = list(check_files([str(good), str(tmp_path / "missing"), str(other)], index, batch=2))
+    assert results[0] == (str(good), hashlib.blake2b(b"known contents", digest_size=32).hexdigest(), True)
+    assert results[1][1] is None and results[1][2]
+    assert results[2][2] is False
@@ -0,0 +1,77 @@
+import hashlib
+
+import pytest
+
+from blake2_records import CHAIN_PERSON, sign_records, verify_records
+
+KEY = b"records-test-key"
+LINES = [b'{"id": %d, "value": "%s"}' % (i, b"x" * (i % 7)) for i in range(25)]
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "data.jsonl"
+    # Mixed terminators: the tag covers the record without its line ending
+    path.write_bytes(b"".join(line + (b"\r\n" if i % 3 == 0 else b"\n") for i, line in enumerate(LINES)))
+    return path
+
+
+def expected_tags(lines, size=32):
+    return [hashlib.blake2b(line, digest_size=size, key=KEY).digest() for line in lines]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sign_matches_hashlib(data_file, tmp_path, workers):
+    tags_path = tmp_path / "data.b2tags"
+    count, digest = sign_records(data_file, tags_path, KEY, workers=workers, batch_lines=4)
+    tags = expected_tags(LINES)
+    assert count == len(LINES)
+    assert tags_path.read_text().split() == [tag.hex() for tag in tags]
+    running = hashlib.blake2b(b"".join(tags), digest_size=32, key=KEY, person=CHAIN_PERSON)
+    assert digest == running.hexdigest()
+
+
+def test_verify_round_trip(data_file, tmp_path):
+    tags_path = tmp_path / "data.b2tags"
+    _, digest = sign_records(data_file, tags_path, KEY, workers=1)
+    result = verify_records(data_file, KEY, tags_path, digest, workers=1)
+    assert result == {'count': len(LINES), 'digest': digest, 'digest_ok': True,
+                      'failed_lines': [], 'extra_tags': 0}
+
+
+def test_verify_reports_tampered_line(data_file, tmp_path):
+    tags_path = tmp_path / "data.b2tags"
+    _, digest = sign_records(data_file, tags_path, KEY, workers=1)
+    data_file.write_bytes(data_file.read_bytes().replace(b'"id": 7,', b'"id": 8,'))
+    result = verify_records(data_file, KEY, tags_path, digest, workers=1)
+    assert result['failed_lines'] == [8]
+    assert result['digest_ok'] is False
+
+
+def test_verify_truncated_and_extra_tags(data_file, tmp_path):
+    tags_path = tmp_path / "data.b2tags"
+    sign_records(data_file, tags_path, KEY, workers=1)
+    tags = tags_path.read_text().splitlines()
+
+    tags_path.write_text("\n".join(tags[:20]) + "\n")
+    assert verify_records(data_file, KEY, tags_path, workers=1)['failed_lines'] == [21, 22, 23, 24, 25]
+
+    tags_path.write_text("\n".join(tags + ["00" * 32]) + "\n")
+    assert verify_records(data_file, KEY, tags_path, workers=1)['extra_tags'] == 1
+
+
+def test_verify_wrong_key(data_file, tmp_path):
+    tags_path = tmp_path / "data.b2tags"
+    sign_records(data_file, tags_path, KEY, workers=1)
+    result = verify_records(data_file, b"other-key", tags_path, workers=1)
+    assert result['failed_lines'] == list(range(1, len(LINES) + 1))
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_bytes(b"")
+    tags_path = tmp_path / "empty.b2tags"
+    count, digest = sign_records(path, tags_path, KEY, workers=1)
+    assert count == 0 and tags_path.read_text() == ""
+    assert digest == hashlib.blake2b(b"", digest_size=32, key=KEY, person=CHAIN_PERSON).hexdigest()
+    assert verify_records(path, KEY, tags_path, digest, workers=1)['digest_ok'] is True
@@ -0,0 +1,169 @@
+import io
+import os
+import random
+import struct
+
+import pytest
+
+from blake2_sync import (DELTA_HEADER, SIGNATURE_HEADER, Signature, apply_delta, weak_checksum,
+                         write_delta, write_signature)
+
+BLOCK = 256
+
+
+def make_signature(path, block_size=BLOCK, strong_size=8, workers=1):
+    out = io.BytesIO()
+    write_signature(str(path), out, block_size, strong_size, workers)
+    return out.getvalue()
+
+
+def make_delta(signature, new, **kwargs):
+    out = io.BytesIO()
+    stats = write_delta(Signature(signature), io.BytesIO(new), out, len(new), **kwargs)
+    return out.getvalue(), stats
+
+
+def patch(path, delta):
+    out = io.BytesIO()
+    with open(path, 'rb') as basis:
+        written = apply_delta(basis, io.BytesIO(delta), out)
+    assert written == len(out.getvalue())
+    return out.getvalue()
+
+
+@pytest.fixture
+def old_file(tmp_path):
+    path = tmp_path / "old.bin"
+    path.write_bytes(random.Random(1).randbytes(BLOCK * 20 + 100))
+    return path
+
+
+def edits(old):
+    yield old                                                   # unchanged
+    yield old[:1000] + b"inserted" + old[1000:]                 # shifts every later block
+    yield old[:500] + old[700:]                                 # deletion
+    yield old[BLOCK * 5:] + old[:BLOCK * 5]                     # reordered blocks
+    yield b""                                                   # emptied
+    yield random.Random(2).randbytes(3000)                      # unrelated
+    yield old + old[:BLOCK * 3]                                 # repeated blocks
+
+
+@pytest.mark.parametrize("case", range(7))
+def test_round_trip(old_file, case):
+    new = list(edits(old_file.read_bytes()))[case]
+    delta, stats = make_delta(make_signature(old_file), new, chunk_size=1000)
+    assert patch(old_file, delta) == new
+    assert stats.new_size == len(new)
+    assert stats.matched_bytes + stats.literal_bytes == len(new)
+    assert stats.delta_size == len(delta)
+
+
+def test_unchanged_file_is_all_copies(old_file):
+    old = old_file.read_bytes()
+    delta, stats = make_delta(make_signature(old_file), old)
+    assert stats.matched_bytes == BLOCK * 20
+    assert stats.literal_bytes == 100   # the unsigned tail
+    assert len(delta) < 200
+
+
+def test_parallel_signature_matches_serial(old_file, monkeypatch):
+    import blake2_sync
+    monkeypatch.setattr(blake2_sync, 'SIGNATURE_TASK_BLOCKS', 3)
+    serial = Signature(make_signature(old_file, workers=1))
+    parallel = Signature(make_signature(old_file, workers=2))
+    # Salts are random per signature, so compare the weak checksums and block count
+    assert len(serial) == len(parallel) == 20
+    assert serial.index.keys() == parallel.index.keys()
+
+
+def test_weak_checksum_rolls():
+    data = random.Random(3).randbytes(600)
+    a, b = weak_checksum(data[:BLOCK])
+    for position in range(1, 300):
+        outgoing = data[position - 1]
+        a = (a - outgoing + data[position + BLOCK - 1]) & 0xffff
+        b = (b - BLOCK * outgoing + a) & 0xffff
+        assert (a, b) == weak_checksum(data[position:position + BLOCK])
+
+
+def test_empty_files(tmp_path):
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    signature = make_signature(empty)
+    assert len(signature) == SIGNATURE_HEADER.size and len(Signature(signature)) == 0
+    for new in (b"", b"now with content" * 50):
+        delta, _ = make_delta(signature, new)
+        assert patch(empty, delta) == new
+
+
+def test_patch_with_wrong_basis(old_file, tmp_path):
+    delta, _ = make_delta(make_signature(old_file), old_file.read_bytes()[:3000] + b"edit")
+    other = tmp_path / "other.bin"
+    other.write_bytes(random.Random(9).randbytes(BLOCK * 20 + 100))
+    with pytest.raises(ValueError, match="wrong old file"):
+        patch(other, delta)
+    short = tmp_path / "short.bin"
+    short.write_bytes(b"x" * 10)
+    with pytest.raises(ValueError):
+        patch(short, delta)
+
+
+def test_truncated_delta(old_file):
+    delta, _ = make_delta(make_signature(old_file), old_file.read_bytes()[:2000] + b"edit" * 100)
+    for cut in range(len(delta)):
+        with pytest.raises(ValueError):
+            patch(old_file, delta[:cut])
+
+
+def test_corrupt_delta(old_file):
+    delta, _ = make_delta(make_signature(old_file), old_file.read_bytes())
+    with pytest.raises(ValueError):
+        patch(old_file, b"B2DELTA9" + delta[8:])
+    with pytest.raises(ValueError):
+        patch(old_file, delta[:DELTA_HEADER.size] + b"X" + delta[DELTA_HEADER.size + 1:])
+    zero_blocks = bytearray(delta)
+    struct.pack_into('<I', zero_blocks, 8, 0)
+    with pytest.raises(ValueError):
+        patch(old_file, bytes(zero_blocks))
+
+
+def test_malformed_signature(old_file):
+    signature = make_signature(old_file)
+    with pytest.raises(ValueError):
+        Signature(signature[:SIGNATURE_HEADER.size - 1])
+    with pytest.raises(ValueError):
+        Signature(signature[:-1])
+    with pytest.raises(ValueError):
+        Signature(b"B2SIGNAX" + signature[8:])
+    for offset, fmt in ((10, '<I'), (14, '<B')):   # block size 0, strong size 0
+        damaged = bytearray(signature)
+        struct.pack_into(fmt, damaged, offset, 0)
+        with pytest.raises(ValueError):
+            Signature(bytes(damaged))
+
+
+@pytest.mark.parametrize("block_size, strong_size", [(32, 8), (BLOCK, 3), (BLOCK, 65)])
+def test_signature_parameter_limits(old_file, block_size, strong_size):
+    with pytest.raises(ValueError):
+        write_signature(str(old_file), io.BytesIO(), block_size, strong_size, 1)
+
+
+def test_cli_round_trip(old_file, tmp_path, monkeypatch, capsys):
+    import sys
+    import blake2_sync
+    new = tmp_path / "new.bin"
+    new.write_bytes(old_file.read_bytes()[:4000] + b"changed" + old_file.read_bytes()[4000:])
+    paths = {name: str(tmp_path / name) for name in ("sig", "delta", "out")}
+    for argv in (['signature', str(old_file), '-o', paths['sig'], '-b', str(BLOCK), '-w', '1'],
+                 ['delta', paths['sig'], str(new), '-o', paths['delta']],
+                 ['patch', str(old_file), paths['delta'], '-o', paths['out']]):
+        monkeypatch.setattr(sys, 'argv', ['blake2_sync.py'] + argv)
+        assert blake2_sync.main() == 0
+    assert open(paths['out'], 'rb').read() == new.read_bytes()
+
+    monkeypatch.setattr(sys, 'argv', ['blake2_sync.py', 'patch', str(new), paths['delta'], '-o', paths['out']])
+    assert blake2_sync.main() == 1
+    assert "Error:" in capsys.readouterr().err
+    # A failed patch leaves the previous output untouched
+    assert open(paths['out'], 'rb').read() == new.read_bytes()
+    assert not [name for name in os.listdir(tmp_path) if '.tmp-' in name]